@@ -0,0 +1,170 @@
+# Current draw and battery runtime per sleep mode, from the battery logs of tests/test_log_power_usage.py
+#
+# Usage, from the repository root: python analyze_battery_log.py [--capacity=mAh] [--charge-rise=%] log...
+# Reads both the binary logs of datalogger.py (battery_log.bin) and the older text logs (battery_log_<mode>.txt,
+# lines of "mode,time,percent"), a sample at a time, so months of hourly samples take no more memory than a day's.
+#
+# Samples are split into runs of one sleep mode. A run is cut where the battery % rises by more than the charge
+# rise (the battery was charged) or the clock goes backwards (a cold boot resets it). For each mode, one straight
+# line is fitted to all its runs by least squares, each run with its own offset but the same slope: the % used per
+# hour, which times the battery capacity gives the average current. The fit is kept as running sums, updated with
+# each sample (Welford's method, so timestamps in the billions of seconds don't lose precision).
+
+import math
+import sys
+
+import datalogger
+from dice_app import BATTERY_CAPACITY_MAH
+
+CHARGE_RISE = 1.0  # % rise between two samples taken as the battery being charged (smaller rises are gauge noise)
+MODE_NAMES = {0: "S0 awake", 1: "S1 display off", 2: "S2 light sleep", 3: "S3 deep sleep"}  # (test_log_power_usage.py)
+
+
+class DischargeFit:
+    """Least-squares battery % against time for one mode, over any number of runs, in constant memory."""
+
+    def __init__(self):
+        self.samples = 0
+        self.runs = 0
+        self.seconds = 0.0
+        # co-moments of the finished runs, each about its own means
+        self.stt = 0.0
+        self.stp = 0.0
+        self.spp = 0.0
+        self._start_run()
+
+    def _start_run(self):
+        self.n = 0
+        self.t0 = 0.0
+        self.mean_t = 0.0
+        self.mean_p = 0.0
+        self.ctt = 0.0
+        self.ctp = 0.0
+        self.cpp = 0.0
+
+    def add(self, t, percent):
+        """Add a sample to the current run."""
+        if self.n == 0:
+            self.t0 = t
+        t -= self.t0  # (seconds into the run)
+        self.n += 1
+        dt = t - self.mean_t
+        dp = percent - self.mean_p
+        self.mean_t += dt / self.n
+        self.mean_p += dp / self.n
+        self.ctt += dt * (t - self.mean_t)
+        self.ctp += dt * (percent - self.mean_p)
+        self.cpp += dp * (percent - self.mean_p)
+        self.last_t = t
+
+    def end_run(self):
+        """Close the current run (one sample on its own says nothing about the slope, and is left out)."""
+        if self.n >= 2:
+            self.samples += self.n
+            self.runs += 1
+            self.seconds += self.last_t
+            self.stt += self.ctt
+            self.stp += self.ctp
+            self.spp += self.cpp
+        self._start_run()
+
+    def percent_per_hour(self):
+        """Fitted change in battery % per hour (negative while discharging), or None without enough data."""
+        if self.stt <= 0:
+            return None
+        return 3600 * self.stp / self.stt
+
+    def stderr_per_hour(self):
+        """Standard error of percent_per_hour(), or None if there are too few samples to tell."""
+        dof = self.samples - self.runs - 1
+        if self.stt <= 0 or dof <= 0:
+            return None
+        residual = max(0.0, self.spp - self.stp * self.stp / self.stt)
+        return 3600 * math.sqrt(residual / dof / self.stt)
+
+
+def read_samples(path):
+    """(mode, time, battery %) of each sample in the log at path, in order, one at a time."""
+    with open(path, "rb") as f:
+        binary = f.read(4) == b"DL1 "
+        f.seek(0)
+        if binary:
+            names, rows = datalogger.read(f)
+            mode, time, percent = (names.index(name) for name in ("mode", "time", "cell_percent"))
+            for row in rows:
+                yield int(row[mode]), float(row[time]), float(row[percent])
+            return
+        for line in f:
+            fields = line.split(b",")
+            try:
+                yield int(fields[0]), float(fields[1]), float(fields[2])
+            except (IndexError, ValueError):
+                continue  # (header, blank or damaged line)
+
+
+def analyze(paths, charge_rise=CHARGE_RISE):
+    """({mode: DischargeFit}, number of charge events) for the logs paths."""
+    fits = {}
+    charges = 0
+    for path in paths:
+        last = None
+        for mode, t, percent in read_samples(path):
+            if last is not None:
+                last_mode, last_t, last_percent = last
+                if percent > last_percent + charge_rise:
+                    charges += 1
+                    fits[last_mode].end_run()
+                elif t <= last_t or mode != last_mode:
+                    fits[last_mode].end_run()
+            fit = fits.get(mode)
+            if fit is None:
+                fit = fits[mode] = DischargeFit()
+            fit.add(t, percent)
+            last = (mode, t, percent)
+        for fit in fits.values():
+            fit.end_run()  # (runs don't carry on into the next file)
+    return fits, charges
+
+
+def format_hours(hours):
+    return f"{hours:.0f} h" if hours < 48 else f"{hours / 24:.0f} d"
+
+
+def report(fits, charges, capacity_mah):
+    """Table of the fitted current and runtime (from full) per mode."""
+    lines = [f"{'mode':16s} {'samples':>7s} {'runs':>4s} {'hours':>7s} {'%/hour':>18s} {'mA':>7s} {'runtime':>8s}"]
+    for mode in sorted(fits):
+        fit = fits[mode]
+        slope = fit.percent_per_hour()
+        name = MODE_NAMES.get(mode, f"mode {mode}")
+        if slope is None:
+            lines.append(f"{name:16s} {fit.samples:7d} {fit.runs:4d}   (not enough samples)")
+            continue
+        stderr = fit.stderr_per_hour()
+        spread = f" +/-{stderr:.4f}" if stderr is not None else ""
+        if slope < 0:
+            ma = f"{-slope / 100 * capacity_mah:7.2f}"
+            runtime = format_hours(100 / -slope)
+        else:
+            ma = "      -"
+            runtime = "-"  # (no discharge seen)
+        lines.append(f"{name:16s} {fit.samples:7d} {fit.runs:4d} {fit.seconds / 3600:7.1f} {slope:8.4f}{spread:10s} "
+                     f"{ma} {runtime:>8s}")
+    lines.append(f"({capacity_mah} mAh battery, {charges} charge event{'s' if charges != 1 else ''} cut out)")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    capacity_mah = BATTERY_CAPACITY_MAH
+    charge_rise = CHARGE_RISE
+    paths = []
+    for arg in sys.argv[1:]:
+        if arg.startswith("--capacity="):
+            capacity_mah = float(arg.split("=", 1)[1])
+        elif arg.startswith("--charge-rise="):
+            charge_rise = float(arg.split("=", 1)[1])
+        else:
+            paths.append(arg)
+    if not paths:
+        sys.exit("usage: python analyze_battery_log.py [--capacity=mAh] [--charge-rise=%] log...")
+    print(report(*analyze(paths, charge_rise), capacity_mah))
@@ -0,0 +1,79 @@
+# Time-based scheduler for the die roll animation
+#
+# Rotation and number changes are calculated from elapsed time (not from how many times the main loop ran),
+# so the roll looks the same on every die type and always ends on time. If rendering falls behind, frames
+# whose time slot has already passed are dropped rather than drawn late.
+
+
+def ease_out(p):
+    """Cubic ease-out: maps animation progress 0..1 to 0..1, fast at first and slowing to a stop."""
+    p = 1 - p
+    return 1 - p * p * p
+
+
+class RollAnimation:
+    """Frame timing for one die roll animation lasting duration seconds, at up to fps frames per second.
+
+    Over the animation the polygon spins through spin_degrees (eased to a stop), and the displayed number
+    changes number_changes times (also eased, so changes slow down as the die settles).
+    """
+
+    def __init__(self, duration=0.5, fps=30, spin_degrees=360, number_changes=10):
+        self.duration = duration
+        self.fps = fps
+        self.spin_degrees = spin_degrees
+        self.number_changes = number_changes
+        self.total_frames = -int(-duration * fps) + 1  # frame slots (rounded up), plus the final resting frame
+        self.running = False
+        self.t0 = 0
+        self.frame = -1
+        self.angle = 0  # rotation (degrees) of the current frame
+        self.number_slot = -1
+        self.new_number = False  # should the current frame show a new number?
+        self.frames_rendered = 0
+        self.frames_dropped = 0
+
+    def start(self, now):
+        """Start (or restart) the animation at time now (e.g. time.monotonic())."""
+        self.running = True
+        self.t0 = now
+        self.frame = -1
+        self.number_slot = -1
+        self.frames_rendered = 0
+        self.frames_dropped = 0
+
+    def update(self, now):
+        """Advance to time now. Returns True if a new frame is due (see angle, new_number), else False.
+
+        The final frame (angle = spin_degrees, new_number = True for the real result) is returned once
+        duration has elapsed, after which running is False.
+        """
+        if not self.running:
+            return False
+        t = now - self.t0
+        if t >= self.duration:
+            frame = self.total_frames - 1
+            self.running = False
+            self.angle = self.spin_degrees
+            self.new_number = True
+        else:
+            frame = int(t * self.fps)
+            if frame <= self.frame:
+                return False  # next frame not due yet
+            progress = ease_out(t / self.duration)
+            self.angle = int(progress * self.spin_degrees)
+            number_slot = int(progress * self.number_changes)
+            self.new_number = number_slot != self.number_slot
+            self.number_slot = number_slot
+        self.frames_dropped += frame - self.frame - 1
+        self.frame = frame
+        self.frames_rendered += 1
+        return True
+
+    def next_frame_time(self):
+        """Time at which update() will next have a frame to draw (the final frame is due at start + duration)."""
+        return self.t0 + min((self.frame + 1) / self.fps, self.duration)
+
+    def stats(self):
+        """Summary string of the last (or current) animation, for printing over serial."""
+        return f"{self.frames_rendered} frames rendered, {self.frames_dropped} dropped ({self.fps} fps target)"
@@ -0,0 +1,54 @@
+# Cached battery level: reads the fuel gauge at most once per TTL, and only while it is powered
+#
+# Each gauge read is an I2C transaction, and the battery level changes by maybe a percent every few minutes, so there
+# is no point reading it on every pass of the main loop. The level handed to the display also has some hysteresis,
+# so a reading that wobbles across an icon step doesn't make the icon flicker back and forth.
+
+
+class BatteryService:
+    """Battery % from gauge (hardware.BatteryGauge, or hardware_sim.SimGauge), which is on the I2C rail of power.
+
+    update(now) reads the gauge if the cached value is older than ttl seconds, and returns True if the level
+    (percent, clamped from 0 to 100) moved by at least hysteresis % since the last change it reported.
+    """
+
+    def __init__(self, gauge, power, ttl=5.0, hysteresis=1.0):
+        self.gauge = gauge
+        self.power = power
+        self.ttl = ttl
+        self.hysteresis = hysteresis
+        self.percent = None  # level as last reported (None until the first successful read)
+        self.raw_percent = None  # latest reading
+        self.read_time = None  # when latest reading was taken
+        self.reads = 0
+        self.errors = 0
+
+    def next_read_time(self):
+        """Time at which the cached reading expires (None: read at the next update)."""
+        if self.read_time is None:
+            return None
+        return self.read_time + self.ttl
+
+    def invalidate(self):
+        """Forget the age of the cached reading, so the next update() reads the gauge (e.g. after a long sleep)."""
+        self.read_time = None
+
+    def update(self, now):
+        """Read the gauge if the cache has expired. Returns True if percent changed (by at least hysteresis)."""
+        if not self.power.display_i2c:
+            return False  # gauge unpowered: keep the cached value
+        if self.read_time is not None and now < self.read_time + self.ttl:
+            return False
+        self.read_time = now
+        try:
+            pct = self.gauge.cell_percent
+        except OSError:
+            self.errors += 1  # (e.g. gauge not ready yet just after powering up the rail: try again after ttl)
+            return False
+        self.reads += 1
+        pct = max(0, min(100, pct))
+        self.raw_percent = pct
+        if self.percent is None or abs(pct - self.percent) >= self.hysteresis:
+            self.percent = pct
+            return True
+        return False
@@ -0,0 +1,51 @@
+# Precompile the die roller's modules to .mpy bytecode, so the device doesn't have to compile the source on every boot
+# (and every wake from deep sleep, which is a reboot)
+#
+# Usage, from the repository root: python build_mpy.py [path to mpy-cross]
+# Needs the mpy-cross matching the device's CircuitPython version (from https://adafruit-circuit-python.s3.amazonaws.com/index.html?prefix=bin/mpy-cross/),
+# then copy the mpy/ folder it writes onto the Feather next to code.py. code.py uses it if it is current (see there).
+#
+# mpy/manifest.txt lists each module with the size of the source it was compiled from. If the .py on the device
+# no longer matches (edited since the build), code.py ignores the bytecode and runs from source.
+
+import os
+import subprocess
+import sys
+
+# everything imported by diceroll.py (not code.py itself, which CircuitPython only runs from source)
+APP_MODULES = [
+    "diceroll",
+    "dice_app",
+    "hardware",
+    "animation",
+    "button_events",
+    "battery_service",
+    "power_estimator",
+    "state_record",
+    "result_font",
+    "probability",
+    "dice_expr",
+    "entropy",
+    "roll_history",
+    "roll_stats",
+    "polygon_math",
+]
+OUT_DIR = "mpy"
+
+mpy_cross = sys.argv[1] if len(sys.argv) > 1 else "mpy-cross"
+root = os.path.dirname(os.path.abspath(__file__))
+out = os.path.join(root, OUT_DIR)
+os.makedirs(out, exist_ok=True)
+
+manifest = []
+for name in APP_MODULES:
+    source = os.path.join(root, name + ".py")
+    target = os.path.join(out, name + ".mpy")
+    # -s: name used in tracebacks (as if run from source)
+    subprocess.run([mpy_cross, "-o", target, "-s", name + ".py", source], check=True)
+    manifest.append(f"{name} {os.path.getsize(source)}")
+    print(f"{name + '.py':20s} {os.path.getsize(source):6d} bytes -> {os.path.getsize(target):6d} bytes")
+
+with open(os.path.join(out, "manifest.txt"), "w") as f:
+    f.write("\n".join(manifest) + "\n")
+print(f"Wrote {len(APP_MODULES)} modules to {OUT_DIR}/: copy that folder onto the Feather")
@@ -0,0 +1,76 @@
+# Button event queue: turns raw press / release transitions into timestamped button events
+#
+# The buttons are scanned in the background (keypad module on the device, see hardware.Buttons), so no press is
+# missed however long a frame takes, and the main loop never has to wait for a button to be released. On each
+# update() we drain those transitions, and add long-press and auto-repeat events for buttons being held down.
+
+PRESS = 0
+RELEASE = 1
+LONG_PRESS = 2  # button held for long_press_time
+REPEAT = 3  # button still held, every repeat_interval after the long press
+
+EVENT_NAMES = ("PRESS", "RELEASE", "LONG_PRESS", "REPEAT")
+
+
+class ButtonEvents:
+    """Queue of (event type, button #, time) tuples from buttons (anything with get_event(now), see hardware.py)."""
+
+    def __init__(self, buttons, n_buttons=3, long_press_time=0.8, repeat_interval=0.4):
+        self.buttons = buttons
+        self.long_press_time = long_press_time
+        self.repeat_interval = repeat_interval
+        self.queue = []
+        self.press_time = [None] * n_buttons  # when each button currently held down was pressed (else None)
+        self.next_repeat = [None] * n_buttons  # when each held button's next LONG_PRESS / REPEAT event is due
+        self.long_pressed = [False] * n_buttons  # has each held button already had its LONG_PRESS event?
+
+    def update(self, now):
+        """Collect new button transitions, and any long-press / repeat events due by time now."""
+        new = []
+        raw = self.buttons.get_event(now)
+        while raw:
+            n, pressed, t = raw
+            if pressed:
+                self.press_time[n] = t
+                self.next_repeat[n] = t + self.long_press_time
+                self.long_pressed[n] = False
+                new.append((PRESS, n, t))
+            else:
+                self.press_time[n] = None
+                self.next_repeat[n] = None
+                new.append((RELEASE, n, t))
+            raw = self.buttons.get_event(now)
+        for n, due in enumerate(self.next_repeat):
+            if due is not None and due <= now:
+                new.append((REPEAT if self.long_pressed[n] else LONG_PRESS, n, due))
+                self.long_pressed[n] = True
+                # at most one repeat per update, so a slow frame doesn't release a burst of them
+                self.next_repeat[n] = max(due + self.repeat_interval, now)
+        if new:
+            # events from different scanners (and synthesized ones) may arrive out of order
+            new.sort(key=lambda event: event[2])
+            self.queue.extend(new)
+
+    def next_due(self):
+        """Time the next LONG_PRESS / REPEAT event is due for a held button, or None if no button is held."""
+        due = None
+        for t in self.next_repeat:
+            if t is not None and (due is None or t < due):
+                due = t
+        return due
+
+    def get(self):
+        """Return the oldest queued event (type, button #, time), or None if there are none."""
+        if self.queue:
+            return self.queue.pop(0)
+        return None
+
+    def held(self, n):
+        """Is button N currently held down?"""
+        return self.press_time[n] is not None
+
+    def any_held(self):
+        for t in self.press_time:
+            if t is not None:
+                return True
+        return False
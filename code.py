@@ -1,7 +1,65 @@
-import diceroll
+# Starts the die roller (diceroll.py), from precompiled bytecode in /mpy when there is a current build of it
+# (see build_mpy.py), falling back to the .py source otherwise. CircuitPython would otherwise compile every module
+# from source on each boot, including each wake from deep sleep.
+import gc
+import os
+import sys
+import supervisor
+
+BOOT_STATS = False  # print import time and free memory before / after importing the app, over serial
+MPY_DIR = "/mpy"
+
+
+def bytecode_modules():
+    """Modules in the bytecode build, if it was compiled from the same sources as the .py files here (compared by
+    size), else None."""
+    names = []
+    try:
+        with open(MPY_DIR + "/manifest.txt") as f:
+            for line in f:
+                name, size = line.split()
+                try:
+                    if os.stat(name + ".py")[6] != int(size):
+                        return None
+                except OSError:
+                    pass  # (no source on the device, only the bytecode)
+                names.append(name)
+    except OSError:
+        return None
+    return names
+
+
+mpy_modules = bytecode_modules()
+use_mpy = mpy_modules is not None
+if use_mpy:
+    sys.path.insert(0, MPY_DIR)
+gc.collect()
+mem0 = gc.mem_free()
+t0 = supervisor.ticks_ms()
+try:
+    import dice_app
+    import hardware
+except ValueError:  # "incompatible .mpy file": built by an mpy-cross for another CircuitPython version
+    if not use_mpy:
+        raise
+    sys.path.remove(MPY_DIR)
+    for name in mpy_modules:
+        sys.modules.pop(name, None)
+    use_mpy = False
+    import dice_app
+    import hardware
+t1 = supervisor.ticks_ms()
+mem1 = gc.mem_free()
+gc.collect()
+if BOOT_STATS:
+    print(f"imported app from {'bytecode' if use_mpy else 'source'} in {t1 - t0} ms, "
+          f"free memory {mem0} -> {mem1} ({gc.mem_free()} after gc)")
+
+import diceroll  # (runs the app)
 #import tests.test_polygon
 #import tests.test_log_power_usage
 #import tests.test_i2c
 #import tests.test_display
 #import tests.test_display_centering
 #import tests.test_power_usage
+#import tests.test_benchmark
@@ -0,0 +1,141 @@
+# Buffered binary log of fixed-size records, written to flash in blocks (for long battery tests, see
+# tests/test_log_power_usage.py), with a host-side decoder to CSV
+#
+# Each log() packs one record (a struct format, e.g. "<BIH") into a buffer, which can be in sleep memory so it
+# survives deep sleep. Only when the buffer is full, or on flush(), are all buffered records appended to the log file
+# in one write, so a wake just to log a sample needn't touch the filesystem at all, and the flash is written in
+# blocks rather than a line at a time. The price: records still in the buffer are lost with the power (sleep memory
+# only lasts through deep sleep), so the caller should flush() whenever losing them would matter. Whether the
+# filesystem is writable (see datalogger_boot.py) is checked once: if it isn't, or a write fails, records are quietly
+# dropped (and counted) rather than raising.
+#
+# Log file: a header line "DL1 <format> <field>,<field>,...\n", then the records back to back. A field named like
+# "cell_percent/100" (a power of ten) is stored as an integer in 1/100ths, and decoded back to a number with 2 decimals.
+# Buffer layout (little-endian): magic "LB", a checksum of the format, number of records buffered, records. A buffer
+# with the wrong magic or format (e.g. sleep memory after a cold boot) is taken as empty.
+#
+# On a PC: python datalogger.py battery_log.bin > battery_log.csv
+
+import struct
+
+from state_record import checksum
+
+MAGIC = "DL1"
+_BUFFER_MAGIC = b"LB"
+_BUFFER_HEADER = "<2sHH"
+BUFFER_HEADER_SIZE = struct.calcsize(_BUFFER_HEADER)
+
+
+def filesystem_writable(path="/"):
+    """Can CircuitPython write to the filesystem path is on? (Asks the mount: no file is opened.)"""
+    import storage
+
+    return not storage.getmount(path).readonly
+
+
+class Datalogger:
+    """Log of fmt records with field names fields to the file path, buffered capacity records at a time in memory
+    (at offset: e.g. alarm.sleep_memory, or a new bytearray if None). writable: whether the filesystem is writable
+    (checked with filesystem_writable() if None)."""
+
+    def __init__(self, path, fmt, fields, capacity=32, memory=None, offset=0, writable=None):
+        self.path = path
+        self.fmt = fmt
+        self.fields = fields
+        self.record_size = struct.calcsize(fmt)
+        self.capacity = capacity
+        if memory is None:
+            memory = bytearray(self.size())
+            offset = 0
+        self.memory = memory
+        self.offset = offset
+        self.key = checksum(fmt.encode(), len(fmt))
+        self.record = bytearray(self.record_size)  # (sleep memory can't be packed into directly)
+        self.header = bytearray(BUFFER_HEADER_SIZE)
+        magic, key, count = struct.unpack(_BUFFER_HEADER, bytes(memory[offset:offset + BUFFER_HEADER_SIZE]))
+        self.count = count if magic == _BUFFER_MAGIC and key == self.key and count <= capacity else 0
+        if writable is None:
+            try:
+                writable = filesystem_writable(path)
+            except (ImportError, OSError):
+                writable = False
+        self.writable = writable
+        self.flushes = 0
+        self.dropped = 0  # records lost to a filesystem that isn't writable
+
+    def size(self):
+        """Bytes of memory used by the buffer."""
+        return BUFFER_HEADER_SIZE + self.capacity * self.record_size
+
+    def _set_count(self, count):
+        self.count = count
+        struct.pack_into(_BUFFER_HEADER, self.header, 0, _BUFFER_MAGIC, self.key, count)
+        self.memory[self.offset:self.offset + BUFFER_HEADER_SIZE] = self.header
+
+    def log(self, *values):
+        """Buffer one record (writing out the buffer first if it is full)."""
+        if self.count >= self.capacity:
+            self.flush()
+        struct.pack_into(self.fmt, self.record, 0, *values)
+        start = self.offset + BUFFER_HEADER_SIZE + self.count * self.record_size
+        self.memory[start:start + self.record_size] = self.record
+        self._set_count(self.count + 1)
+
+    def flush(self):
+        """Append every buffered record to the log file (or drop them, if it can't be written)."""
+        if not self.count:
+            return
+        start = self.offset + BUFFER_HEADER_SIZE
+        if self.writable:
+            try:
+                with open(self.path, "ab") as f:
+                    if f.tell() == 0:
+                        f.write(f"{MAGIC} {self.fmt} {','.join(self.fields)}\n".encode())
+                    f.write(bytes(self.memory[start:start + self.count * self.record_size]))
+                self.flushes += 1
+            except OSError:
+                self.writable = False  # (read-only or full: stop trying)
+        if not self.writable:
+            self.dropped += self.count
+        self._set_count(0)
+
+
+def read(f):
+    """(field names, iterator over rows of values) of the log file open (binary) as f, read a record at a time."""
+    magic, fmt, fields = f.readline().decode().rstrip("\n").split(" ")
+    if magic != MAGIC:
+        raise ValueError(f"not a datalogger log (starts with {magic!r})")
+    fields = fields.split(",")
+    scales = [int(name.split("/")[1]) if "/" in name else 1 for name in fields]
+    size = struct.calcsize(fmt)
+
+    def rows():
+        while True:
+            record = f.read(size)
+            if len(record) < size:
+                return  # (end of the file, or a record cut short by losing power while writing it)
+            values = struct.unpack(fmt, record)
+            yield [v if scale == 1 else round(v / scale, len(str(scale)) - 1) for v, scale in zip(values, scales)]
+
+    return [name.split("/")[0] for name in fields], rows()
+
+
+def decode(data):
+    """(field names, list of rows of values) of a log file's contents."""
+    import io
+
+    names, rows = read(io.BytesIO(data))
+    return names, list(rows)
+
+
+if __name__ == "__main__":
+    import csv
+    import sys
+
+    if len(sys.argv) != 2:
+        sys.exit("usage: python datalogger.py <log file>  (writes CSV to stdout)")
+    with open(sys.argv[1], "rb") as f:
+        names, rows = read(f)
+        writer = csv.writer(sys.stdout, lineterminator="\n")
+        writer.writerow(names)
+        writer.writerows(rows)
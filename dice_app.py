@@ -0,0 +1,653 @@
+# Die roller application logic: buttons, roll animation, battery icon, dimming and sleep
+#
+# Hardware-independent: all board access goes through a hardware object (hardware.Device on the Feather,
+# or hardware_sim.SimDevice to run headless on a PC), so this also runs under ordinary CPython.
+
+# Project modules (copy to the device alongside this file)
+import dice_expr
+import entropy
+import polygon_math
+import probability
+from animation import RollAnimation
+from battery_service import BatteryService
+from power_estimator import PowerEstimator, ACTIVE, DIMMED, DISPLAY_OFF
+import state_record
+from button_events import ButtonEvents, PRESS, RELEASE, LONG_PRESS, REPEAT
+import roll_history
+from roll_history import RollHistory
+from roll_stats import RollStats
+
+TFT_BRIGHTNESS = 0.5
+TFT_DIM_BRIGHTNESS = 0.1
+INACTIVITY_DIM_TIME = 10
+INACTIVITY_SLEEP_TIME = 15
+INACTIVITY_DEEPSLEEP_TIME = 180  # the main power saving measure...
+
+# rot_step = angular resolution (degrees) of the precomputed polygon rotations (must evenly divide 360 / polygon_sides)
+# symbol_values = what each symbol counts for in the sum when rolling several dice
+# expr = a dice expression to roll instead of sides etc. (e.g. "3d6+2", "2d20kl1": see dice_expr.py)
+dice_types = [
+    {"sides": 3, "zero_index": False, "polygon_sides": 3, "poly_r0": 0, "rot_step": 10, "symbol_list": ["-", "O", "+"],
+     "symbol_values": [-1, 0, 1]},
+    {"sides": 6, "zero_index": False, "polygon_sides": 4, "poly_r0": 45, "rot_step": 10},
+    {"sides": 10, "zero_index": True, "polygon_sides": 5, "poly_r0": 54, "rot_step": 8},  # return 0-9, not 1-10
+    {"sides": 20, "zero_index": False, "polygon_sides": 6, "poly_r0": 0, "rot_step": 10},
+    {"sides": 100, "zero_index": True, "polygon_sides": 10, "poly_r0": 0, "rot_step": 12},
+    {"expr": "4d6kh3", "polygon_sides": 4, "poly_r0": 45, "rot_step": 10},  # best 3 of 4D6 (D&D ability scores)
+]
+DEFAULT_DICE_INDEX = 3  # D20
+# D2 cycles the number of dice rolled at once, from 1 to MAX_DICE_COUNT (at most hardware.POOL_MAX_DICE). Each extra
+#   die adds a polygon and a result to every animation frame: keep this where animation_frame(4xD20) in
+#   tests/test_benchmark.py still fits in the frame period, so the frame rate doesn't drop below a single die's
+MAX_DICE_COUNT = 4
+POOL_POLY_SCALE = 0.45  # size of each die's polygon when rolling several, relative to the single die
+
+ANIMATION_DURATION = 0.5
+ANIMATION_FPS = 30  # target frame rate (frames are dropped, not delayed, if rendering falls behind)
+ANIMATION_SPIN = 360  # degrees the die polygon spins during a roll (eased to a stop)
+ANIMATION_NUMBER_CHANGES = 10  # how many times the displayed number changes during a roll
+IDLE_REFRESH_FPS = 4  # max screen refresh rate when not animating (e.g. battery icon changes)
+ANIMATION_STATS = False  # print animation frames rendered / dropped over serial after each roll
+BOOT_STATS = False  # print time from boot to the first frame over serial (also kept in the sleep memory record)
+LOOP_SLEEP = 0.01  # longest pause between main loop passes, when not light sleeping
+LIGHT_SLEEP_IDLE = False  # light sleep through long waits instead of polling every LOOP_SLEEP with time.sleep: off
+#   until its current draw (and whether the backlight holds its level) has been measured on the device, see TODO.md
+LIGHT_SLEEP_MIN_TIME = 0.25  # light sleep (rather than polling every LOOP_SLEEP) until deadlines at least this far off
+
+BAT_THRESH_HIDE = 70
+BATTERY_TTL = 5  # seconds a battery gauge reading is reused before reading it again
+BATTERY_HYSTERESIS = 1.0  # % change in battery level needed to update the icon
+BATTERY_CAPACITY_MAH = 420  # for the estimated runtime remaining (shown next to the battery icon)
+POWER_ESTIMATE_SAMPLES = 8  # estimates of current draw kept per power state (see power_estimator.py)
+SLEEP_MEMORY_POWER_ESTIMATE = state_record.SIZE  # where the power estimator is kept in sleep memory (after the record)
+HISTORY_SIZE = 32  # rolls remembered (kept in sleep memory after the power estimator, see roll_history.py)
+HISTORY_SHOWN = 5  # rolls listed while D2 is held
+ROLL_STATS_MAX_PENDING = 200  # rolls counted in RAM before writing the lifetime face counts to flash even without a
+#   deep sleep (the most a battery pull can lose: fewer means more flash writes, see roll_stats.py)
+
+
+def rolldie(dietype) -> str:
+    """Roll the die specified by the data structure dietype (typically an item from dice_types[]), return string result."""
+    if "expr" in dietype:
+        return str(dice_expr.compiled(dietype["expr"])(entropy.randrange))
+    n = entropy.randrange(dietype["sides"]) + 1
+    if dietype["zero_index"] or "symbol_list" in dietype:
+        n -= 1
+    if "symbol_list" in dietype:
+        return dietype["symbol_list"][n]
+    return str(n)
+
+
+def die_faces(dietype):
+    """All possible results of the die dietype, as the strings rolldie() returns (in order)."""
+    if "symbol_list" in dietype:
+        return list(dietype["symbol_list"])
+    return [str(n) for n in die_values(dietype)]
+
+
+def die_values(dietype):
+    """What each face of the die dietype counts for in the sum of several dice (in die_faces() order)."""
+    if "symbol_list" in dietype:
+        return list(dietype["symbol_values"])
+    if "expr" in dietype:
+        low, high = dice_expr.bounds(dietype["expr"])
+        return list(range(low, high + 1))
+    first = 0 if dietype["zero_index"] else 1
+    return list(range(first, first + dietype["sides"]))
+
+
+def die_name(dietype):
+    """Name of the die dietype for the menu, e.g. "D20" or "4d6kh3"."""
+    return dietype["expr"] if "expr" in dietype else f"D{dietype['sides']}"
+
+
+def format_sum(total, dietype):
+    """Sum of several dice of type dietype as a string (signed for symbol dice, e.g. "+2" for Fudge dice)."""
+    if "symbol_list" in dietype:
+        return f"{total:+d}"
+    return str(total)
+
+
+def roll_pool(dietype, count):
+    """Roll count dice of type dietype at once, return list of string results (each from rolldie())."""
+    return [rolldie(dietype) for _ in range(count)]
+
+
+def format_odds(percentile, odds):
+    """Percentile and "1 in N" odds of a result, short enough for the menu area (e.g. "97%ile 1 in 20")."""
+    if odds >= 10_000_000:
+        n = f"{odds // 1_000_000}M"
+    elif odds >= 10_000:
+        n = f"{odds // 1000}k"
+    else:
+        n = str(odds)
+    return f"{percentile}%ile 1 in {n}"
+
+
+def get_battery_color(pct):
+    if pct <= 20:
+        return 0xFF0000  # red
+    elif pct <= 70:
+        return 0xFFFF00  # yellow
+    else:
+        return 0x00FF00  # green
+
+
+class DiceApp:
+    """The die roller, running on the hardware object hw (see hardware.py / hardware_sim.py).
+
+    step() runs one pass of the main loop, run() loops forever.
+    """
+
+    def __init__(self, hw):
+        self.hw = hw
+        self.scene = hw.scene
+        self.button_events = ButtonEvents(hw.buttons)
+        self.dice_index = DEFAULT_DICE_INDEX
+        self.dice_count = 1
+        self.power_estimate = PowerEstimator(BATTERY_CAPACITY_MAH, POWER_ESTIMATE_SAMPLES, now=hw.monotonic())
+        # (a roll history entry has only a few bits for which die and how many: see roll_history.py)
+        assert len(dice_types) - 1 <= roll_history.MAX_DICE_INDEX and MAX_DICE_COUNT <= roll_history.MAX_DICE_COUNT, \
+            "too many dice types or dice for the roll history"
+        self.history = RollHistory(HISTORY_SIZE)
+        self.sleep_memory_history = SLEEP_MEMORY_POWER_ESTIMATE + self.power_estimate.size()
+        self.power_sample_due = True  # read the gauge for the power estimate at the next idle pass
+        self.last_refresh_time = 0
+        self.first_pixel_ms = None  # time from boot to first frame
+        self.poly_radius_default = polygon_math.radius_units(self.scene.height / 2)
+        # if we just woke up from a deep sleep and reboot, load some config values from backup RAM / sleep memory
+        #   (see state_record.py: a missing, corrupt or outdated record is ignored)
+        self.state = state_record.StateRecord()
+        resumed = (hw.sleep.wake_alarm and self.state.load(hw.sleep.memory) and self.state.dice_index < len(dice_types)
+                   and 1 <= self.state.dice_count <= MAX_DICE_COUNT)
+        if resumed:
+            self.dice_index = self.state.dice_index
+            self.dice_count = self.state.dice_count
+            self.state.wakes += 1
+            ### Fast resume: show the die as it was before sleeping first, and only then do the rest of the setup
+            #   (the button press that woke us is answered straight away, even before the new roll starts)
+            self.scene.set_brightness(TFT_BRIGHTNESS)
+            die = dice_types[self.dice_index]
+            rotation = die["poly_r0"] + self.state.rotation
+            if self.dice_count == 1:
+                self.scene.set_polygon_points(self.generate_polygon_pts(die["polygon_sides"], rotation=rotation))
+                self.scene.set_result(self.state.last_result)
+            else:
+                # (only the sum was saved, so the dice are shown blank)
+                self.scene.set_pool(self.dice_count)
+                pts = self.generate_polygon_pts(die["polygon_sides"], rotation=rotation, scale=POOL_POLY_SCALE)
+                self.scene.set_pool_points([pts] * self.dice_count)
+                self.scene.set_pool_sum("= " + self.state.last_result)
+            self.commit_frame()
+            self.power_estimate.restore(hw.sleep.memory, SLEEP_MEMORY_POWER_ESTIMATE, hw.monotonic(), hw.wall_time())
+            self.history.restore(hw.sleep.memory, self.sleep_memory_history)
+        else:
+            self.state = state_record.StateRecord()
+        hw.finish_setup()
+        # lifetime count of every face rolled, in flash (nothing is read from it until the first write)
+        self.roll_stats = RollStats(hw.nvm, [(die_name(die), len(die_faces(die))) for die in dice_types],
+                                    ROLL_STATS_MAX_PENDING)
+        self.low_power_mode = False
+        self.animation_running = False  # is a die roll currently animating?
+        self.roll_animation = RollAnimation(ANIMATION_DURATION, ANIMATION_FPS, ANIMATION_SPIN, ANIMATION_NUMBER_CHANGES)
+        self.battery = BatteryService(hw.gauge, hw.power, BATTERY_TTL, BATTERY_HYSTERESIS)
+        self.dimmed = False
+        self.history_shown = False  # is the roll history showing in place of the die? (while D2 is held)
+        self.d2_used = False  # has the current press of D2 already done something (so its release doesn't)?
+        self.faces = []  # every possible result of the current die (see set_die_faces())
+        self.face_values = []  # what each of those counts for in the sum of several dice
+        self.fast_random = entropy.FastRandom(entropy.randrange(1 << 16))
+        self.roller = None  # compiled dice expression of the current die, if it has one (see dice_expr.py)
+        self.pool_rolled = [0] * self.dice_count  # face index rolled on each die (when rolling several)
+        self.rolled_total = 0  # value of the die, or sum of the dice, last shown
+        self.sum_counts = None  # exact distribution of the current die / pool, once needed (see show_odds())
+        self.poly_pts_lookup = []
+        self.pool_pts_lookup = []
+        self.poly_rot_step = 1
+
+        self.scene.set_brightness(TFT_BRIGHTNESS)
+        self.set_display_die_info()
+        self.set_die_faces()
+        self.set_die_shape()
+        # initial die value (and do a first roll on startup or resume from deep sleep)
+        if not resumed:
+            self.roll_die_and_update_display()
+            self.update_battery_icon()  # (when resuming, left to the first idle pass after the roll)
+        # handle dimming and sleeping after periods of inactivity
+        self.last_button_time = hw.monotonic()
+        ### Roll the die on startup
+        self.start_dieroll()
+
+    ## Button handling
+    #   Buttons are scanned in the background and arrive here as timestamped events (see button_events.py),
+    #   so we never wait for a button to be released and can't miss a press during a slow frame
+
+    def button_pressed(self, n):
+        """Is button N currently held down?"""
+        return self.button_events.held(n)
+
+    def handle_button_event(self, event_type, n, t):
+        # D2 acts on release (changing the number of dice), unless it was held long enough to show the roll history
+        if n == 2 and event_type != PRESS:
+            if event_type == LONG_PRESS and not self.low_power_mode and not self.d2_used:
+                self.d2_used = True
+                self.show_history()
+            elif event_type == RELEASE:
+                if self.history_shown:
+                    self.hide_history()
+                elif not self.d2_used and not self.low_power_mode:
+                    self.change_dice_count()
+            return
+        if event_type == PRESS:
+            self.last_button_time = t
+            if n == 2:
+                self.d2_used = self.low_power_mode
+            if self.low_power_mode:
+                self.exit_low_power()
+                if n != 0:
+                    return  # D1 or D2 only wake the display, but D0 will also trigger a new roll, below
+            else:
+                self.scene.set_brightness(TFT_BRIGHTNESS)
+                self.dimmed = False
+                self.power_estimate.set_state(ACTIVE, t)
+        elif event_type == REPEAT and n == 1 and not self.low_power_mode:
+            pass  # holding D1 keeps cycling through dice
+        else:
+            return  # (LONG_PRESS, RELEASE, and repeats of other buttons are not used yet)
+        if n == 0:
+            if not self.animation_running:
+                self.start_dieroll()
+        elif n == 1:
+            self.change_die()
+
+    ## Polygon vertices
+
+    def generate_polygon_pts(self, n, rotation=0, scale=None, x_offset=0, y_offset=0):
+        """Calculate vertices of polygon with N sides (integer math only, see polygon_math.py)."""
+        if scale:
+            poly_radius = int(scale * self.poly_radius_default)
+        else:
+            poly_radius = self.poly_radius_default
+        return polygon_math.polygon_pts(n, rotation, poly_radius, x_offset, y_offset)
+
+    ## Precomputed polygon rotation (vertex lookup table)
+    #   A regular polygon looks identical after rotating by 360/polygon_sides degrees, so we only need to store
+    #   one symmetry period of rotations. The table is rebuilt whenever we change die type, and the animation
+    #   then just steps through it rather than doing trig for every vertex on every frame.
+    #   The step size ("rot_step", in degrees) is per die, and must evenly divide 360/polygon_sides.
+
+    def build_polygon_lookup(self, die):
+        """Precompute polygon vertices for one symmetry period of die (an item from dice_types[]), starting at its poly_r0."""
+        n = die["polygon_sides"]
+        step = die["rot_step"]
+        self.poly_rot_step = step
+        self.poly_pts_lookup = [self.generate_polygon_pts(n, rotation=die["poly_r0"] + step * i) for i in range(360 // n // step)]
+        if self.dice_count > 1:
+            self.pool_pts_lookup = [
+                self.generate_polygon_pts(n, rotation=die["poly_r0"] + step * i, scale=POOL_POLY_SCALE)
+                for i in range(360 // n // step)
+            ]
+
+    def lookup_polygon_pts(self, rotation=0):
+        """Return precomputed vertices of current polygon, for integer rotation in degrees from its resting orientation poly_r0."""
+        return self.poly_pts_lookup[(rotation // self.poly_rot_step) % len(self.poly_pts_lookup)]
+
+    def lookup_pool_pts(self, rotation=0):
+        """Return precomputed vertices of each die's polygon when rolling several, for integer rotation in degrees
+        (each die is a different fraction of a symmetry period further on, so they don't all spin in step)."""
+        table = self.pool_pts_lookup
+        n = len(table)
+        i = rotation // self.poly_rot_step
+        count = self.dice_count
+        return [table[(i + k * n // count) % n] for k in range(count)]
+
+    def set_die_shape(self):
+        """Show the polygon(s) for the current die and number of dice, at their resting orientation."""
+        self.build_polygon_lookup(dice_types[self.dice_index])
+        self.scene.set_pool(self.dice_count)
+        if self.dice_count == 1:
+            self.scene.set_polygon_points(self.lookup_polygon_pts())
+        else:
+            self.scene.set_pool_points(self.lookup_pool_pts())
+
+    ## Frame commits
+    #   Scene changes (polygon points, die text and position, battery icon, ...) are batched and pushed to the display
+    #   with a single refresh, so each frame is one update over SPI rather than one partial refresh per change.
+
+    def commit_frame(self, fps=ANIMATION_FPS):
+        """Push all pending scene changes to the display in one refresh, capped at fps frames per second."""
+        self.scene.refresh(fps)
+        self.last_refresh_time = self.hw.monotonic()
+        if self.first_pixel_ms is None:
+            self.first_pixel_ms = self.hw.ms_since_boot()
+            self.state.boot_ms = self.first_pixel_ms
+            if BOOT_STATS:
+                print(f"boot to first frame: {self.first_pixel_ms} ms")
+
+    def commit_idle_changes(self):
+        """Commit scene changes made outside of an animation, at most IDLE_REFRESH_FPS times per second."""
+        if self.scene.dirty and self.hw.monotonic() >= self.next_idle_commit():
+            self.commit_frame(IDLE_REFRESH_FPS)
+
+    def next_idle_commit(self):
+        return self.last_refresh_time + 1 / IDLE_REFRESH_FPS
+
+    ## Die display
+
+    def set_die_faces(self):
+        """Lay out every possible result of the current die, so that rolls just pick one by index."""
+        self.faces = die_faces(dice_types[self.dice_index])
+        self.face_values = die_values(dice_types[self.dice_index])
+        expr = dice_types[self.dice_index].get("expr")
+        self.roller = dice_expr.compiled(expr) if expr else None  # (parsed here, never while rolling)
+        self.scene.set_faces(self.faces)
+
+    def roll_die_and_update_display(self, final=True):
+        """Roll and show a new result: the real one if final, else one of the numbers flashed up while rolling."""
+        # (same distribution as rolldie(), without making a new string on every number change)
+        # only the real result needs the unbiased hardware random numbers, see entropy.py
+        randrange = entropy.randrange if final else self.fast_random.randrange
+        roller = self.roller
+        if self.dice_count == 1:
+            i = roller(randrange) - self.face_values[0] if roller else randrange(len(self.faces))
+            self.state.last_result = self.faces[i]
+            self.rolled_total = self.face_values[i]
+            self.scene.show_face(i)
+            return
+        # several dice: roll them all in one pass, then update every die and the sum together (one frame)
+        n = len(self.faces)
+        values = self.face_values
+        rolled = self.pool_rolled
+        total = 0
+        for k in range(self.dice_count):
+            i = roller(randrange) - values[0] if roller else randrange(n)
+            rolled[k] = i
+            total += values[i]
+        self.rolled_total = total
+        self.state.last_result = format_sum(total, dice_types[self.dice_index])
+        self.scene.show_pool_faces(rolled)
+        self.scene.set_pool_sum("= " + self.state.last_result)
+
+    ## Odds of the result
+    #   The exact distribution of the current die / pool is only worked out after the first roll that needs it
+    #   (see probability.py), not when switching dice (which starts a roll animation) or on every roll
+
+    def show_odds(self):
+        """Show the percentile and odds of the result just rolled."""
+        if self.sum_counts is None:
+            self.sum_counts = self.die_sum_counts()
+        index_total = self.rolled_total - self.dice_count * self.face_values[0]  # (values are consecutive)
+        self.scene.set_odds(format_odds(*probability.rank(self.sum_counts, index_total)))
+
+    def die_sum_counts(self):
+        """Exact distribution of the current die / pool (see probability.py)."""
+        die = dice_types[self.dice_index]
+        if "expr" not in die:
+            return probability.sum_counts(die["sides"], self.dice_count)
+        count, sides, keep, keep_highest, _ = dice_expr.parse(die["expr"])
+        if keep < count:
+            return probability.keep_counts(sides, count, keep, keep_highest, self.dice_count)
+        return probability.sum_counts(sides, count * self.dice_count)
+
+    ## Roll history and lifetime statistics
+    #   Every finished roll goes into a ring in an array (see roll_history.py), kept in sleep memory over a deep sleep,
+    #   and its faces are counted towards the lifetime statistics (see roll_stats.py), written to flash in batches
+
+    def record_roll(self):
+        index_total = self.rolled_total - self.dice_count * self.face_values[0]
+        self.history.append(self.dice_index, self.dice_count, index_total)
+        if self.dice_count == 1:
+            self.roll_stats.count(self.dice_index, index_total)
+        else:
+            for i in self.pool_rolled:
+                self.roll_stats.count(self.dice_index, i)
+
+    def history_lines(self, n):
+        """The last n rolls (newest first) as text, e.g. "D20 17" or "3D6=11"."""
+        lines = []
+        for i in range(min(n, self.history.count)):
+            dice_index, count, index_total = self.history.get(i)
+            if dice_index >= len(dice_types):
+                continue  # (from a list of dice since changed)
+            die = dice_types[dice_index]
+            if count == 1:
+                faces = die_faces(die)
+                result = faces[index_total] if index_total < len(faces) else "?"
+                lines.append(f"{die_name(die)} {result}")
+            else:
+                total = index_total + count * die_values(die)[0]
+                prefix = f"{count}x" if "expr" in die else str(count)
+                lines.append(f"{prefix}{die_name(die)}={format_sum(total, die)}")
+        return lines
+
+    def show_history(self):
+        self.history_shown = True
+        self.scene.set_history(self.history_lines(HISTORY_SHOWN))
+
+    def hide_history(self):
+        self.history_shown = False
+        self.scene.set_history(None)
+
+    def clear_odds(self):
+        self.sum_counts = None
+        self.scene.set_odds("")
+
+    def clear_die_display(self):
+        self.scene.set_result("")
+
+    def set_display_die_info(self):
+        """Update D1 text with current die value (and number of dice, if more than one)"""
+        die = dice_types[self.dice_index]
+        if self.dice_count == 1:
+            self.scene.set_die_label(f"< {die_name(die)}")
+        elif "expr" in die:
+            self.scene.set_die_label(f"<{self.dice_count}x{die['expr']}")
+        else:
+            self.scene.set_die_label(f"< {self.dice_count}{die_name(die)}")
+
+    ## Battery % reading and display
+
+    #   The gauge is read through a cache (see battery_service.py), and the icon only changes when the level does
+
+    def get_battery(self):
+        """Return battery %, clamped from 0 to 100 (cached, None if never read)"""
+        return self.battery.percent
+
+    def update_battery_icon(self, bat_level=None):
+        # update length and color of battery icon based on actually battery level
+        # if a battery level was not passed to this function (e.g. for debugging), use the (cached) gauge reading
+        if bat_level is None:
+            if not self.battery.update(self.hw.monotonic()):
+                return  # no change (or nothing to read)
+            bat_level = self.get_battery()
+        # hide icon if battery nearly full (the scene only redraws it if its color or size actually change)
+        self.scene.set_battery(bat_level, get_battery_color(bat_level), bat_level >= BAT_THRESH_HIDE)
+
+    ## Power use estimate and runtime remaining
+    #   The power estimator is told about every change of power state, but only reads the gauge at a few of them,
+    #   and never during a roll animation: see power_estimator.py
+
+    def sample_power(self):
+        self.power_sample_due = False
+        try:
+            pct = self.hw.gauge.cell_percent
+            charge_rate = self.hw.gauge.charge_rate
+        except OSError:
+            return  # (skip this reading: the estimator just waits for the next one)
+        self.power_estimate.sample(self.hw.monotonic(), pct, charge_rate)
+        self.state.charge_rate_centipct = int(charge_rate * 100)
+        self.update_runtime_display(pct)
+
+    def update_runtime_display(self, pct):
+        hours = self.power_estimate.hours_remaining(max(0, min(100, pct)))
+        if hours is None:
+            text = ""
+        elif hours < 48:
+            text = f"{hours:.0f}h"
+        else:
+            text = f"{hours / 24:.0f}d"
+        self.scene.set_runtime(text)
+
+    ## Power management and sleep functionality
+
+    def enter_low_power(self):
+        # last chance to read the battery gauge before I2C is powered down
+        self.sample_power()
+        self.power_estimate.set_state(DISPLAY_OFF, self.hw.monotonic())
+        # Turn off display to save a bit of power
+        self.low_power_mode = True
+        self.hw.power.set_display_i2c(False)
+
+    def exit_low_power(self):
+        self.low_power_mode = False
+        self.hw.power.set_display_i2c(True)
+        self.scene.set_brightness(TFT_BRIGHTNESS)
+        self.dimmed = False
+        self.battery.invalidate()  # battery icon may be out of date after a long sleep
+        self.power_estimate.set_state(ACTIVE, self.hw.monotonic())
+        self.power_sample_due = True
+
+    def time_since_last_button(self):
+        return self.hw.monotonic() - self.last_button_time
+
+    def deep_sleep(self):
+        # save a few key status values to backup RAM ('sleep memory') to reload after deep sleep reboot
+        state = self.state
+        state.dice_index = self.dice_index
+        state.dice_count = self.dice_count
+        if self.battery.percent is not None:
+            state.battery_centipct = int(self.battery.percent * 100)
+        state.monotonic_ms = int(self.hw.monotonic() * 1000)
+        state.rtc_time = int(self.hw.wall_time())
+        state.save(self.hw.sleep.memory)
+        self.power_estimate.save(self.hw.sleep.memory, SLEEP_MEMORY_POWER_ESTIMATE, self.hw.monotonic(),
+                                 self.hw.wall_time())
+        self.history.save(self.hw.sleep.memory, self.sleep_memory_history)
+        self.roll_stats.flush()
+        self.hw.sleep.deep_sleep()
+        # will never reach this point: reboots after exiting deep sleep
+
+    ### Animation dieroll
+
+    def start_dieroll(self):
+        self.animation_running = True
+        self.scene.set_odds("")
+        self.state.rolls += 1
+        self.roll_animation.start(self.hw.monotonic())
+
+    def change_die(self):
+        """Change which die to roll (can even do this during an ongoing roll animation, which restarts it)"""
+        self.clear_die_display()
+        self.dice_index = (self.dice_index + 1) % len(dice_types)
+        self.clear_odds()
+        self.set_display_die_info()
+        self.set_die_faces()
+        # update background polygon (and its precomputed rotations)
+        self.set_die_shape()
+        self.start_dieroll()
+
+    def change_dice_count(self):
+        """Roll one more die at once, back to one after MAX_DICE_COUNT (also restarts any ongoing roll animation)"""
+        self.dice_count = self.dice_count % MAX_DICE_COUNT + 1
+        self.pool_rolled = [0] * self.dice_count
+        self.clear_odds()
+        self.set_display_die_info()
+        self.set_die_shape()
+        self.start_dieroll()
+
+    ### Main program loop
+
+    def step(self):
+        """One pass of the main program loop."""
+        now = self.hw.monotonic()
+        # handle all button events since the last pass
+        self.button_events.update(now)
+        event = self.button_events.get()
+        while event:
+            self.handle_button_event(*event)
+            event = self.button_events.get()
+        #### Low Power Mode: just check for wakes or need to deep sleep
+        if self.low_power_mode:
+            if self.time_since_last_button() >= INACTIVITY_DEEPSLEEP_TIME:
+                self.deep_sleep()
+                raise RuntimeError("Unreachable code: deep sleep should have rebooted on wake.")
+        ### Standard Main Loop, if not in low power mode:
+        elif self.animation_running:
+            # While animating a die roll, skip most other main loop code for speed
+            # Rotation and number changes come from elapsed time: only draw when a frame is due (late frames are dropped)
+            roll_animation = self.roll_animation
+            if roll_animation.update(self.hw.monotonic()):
+                if self.dice_count == 1:
+                    self.scene.set_polygon_points(self.lookup_polygon_pts(roll_animation.angle))
+                else:
+                    self.scene.set_pool_points(self.lookup_pool_pts(roll_animation.angle))
+                if roll_animation.new_number:
+                    self.roll_die_and_update_display(final=not roll_animation.running)
+                self.commit_frame(ANIMATION_FPS)  # push polygon(s) and number(s) together as one frame
+            if not roll_animation.running:
+                self.animation_running = False
+                self.state.rotation = roll_animation.angle % 360
+                self.show_odds()  # (committed with the next idle changes)
+                self.record_roll()
+                if ANIMATION_STATS:
+                    print(f"roll animation: {roll_animation.stats()}")
+        else:  # Animation Not Running
+            # Read battery value (every BATTERY_TTL) and update icon if it changed
+            self.update_battery_icon()
+            if self.power_sample_due:
+                self.sample_power()
+            self.commit_idle_changes()
+            if self.roll_stats.flush_due():
+                self.roll_stats.flush()  # (after the result is on screen, so no roll waits for the flash)
+            # If no button has been pressed in a while, turn off display and I2C to save battery
+            if self.button_events.any_held():
+                pass  # (don't dim or sleep while a button is held down)
+            elif self.time_since_last_button() >= INACTIVITY_SLEEP_TIME:
+                self.enter_low_power()
+            elif self.time_since_last_button() >= INACTIVITY_DIM_TIME and not self.dimmed:
+                # dimming display: likely doesn't save much power, but cues user display is about to sleep
+                self.scene.set_brightness(TFT_DIM_BRIGHTNESS)
+                self.dimmed = True
+                self.power_estimate.set_state(DIMMED, self.hw.monotonic())
+
+    ### Waiting between main loop passes
+    #   Rather than waking every LOOP_SLEEP to check whether anything needs doing, work out when the next thing is
+    #   actually due (animation frame, battery update, dim / sleep timeouts, button repeat) and wait until then.
+    #   With LIGHT_SLEEP_IDLE, long waits are spent in light sleep, which a button press also wakes us from, so no
+    #   press waits on a deadline. Otherwise the loop polls every LOOP_SLEEP until the deadline.
+
+    def next_deadline(self):
+        """Time at which step() next has something to do (apart from handling new button presses)."""
+        if self.low_power_mode:
+            return self.last_button_time + INACTIVITY_DEEPSLEEP_TIME
+        if self.animation_running:
+            return self.roll_animation.next_frame_time()
+        deadline = self.battery.next_read_time()
+        if deadline is None or self.power_sample_due:
+            return self.hw.monotonic()
+        if self.scene.dirty:
+            deadline = min(deadline, self.next_idle_commit())
+        repeat_due = self.button_events.next_due()
+        if repeat_due is not None:
+            # (a held button also postpones dimming and sleeping until it is released)
+            deadline = min(deadline, repeat_due)
+        elif self.dimmed:
+            deadline = min(deadline, self.last_button_time + INACTIVITY_SLEEP_TIME)
+        else:
+            deadline = min(deadline, self.last_button_time + INACTIVITY_DIM_TIME)
+        return deadline
+
+    def wait_for_next_deadline(self):
+        deadline = self.next_deadline()
+        gap = deadline - self.hw.monotonic()
+        if LIGHT_SLEEP_IDLE and gap >= LIGHT_SLEEP_MIN_TIME and not self.button_events.any_held():
+            # (a held button would immediately wake us from light sleep again)
+            self.hw.sleep.light_sleep_until(deadline)
+        elif gap > 0:
+            # short waits: poll for button presses as often as before
+            self.hw.wait(min(gap, LOOP_SLEEP))
+
+    def run(self):
+        while True:
+            self.step()
+            self.wait_for_next_deadline()
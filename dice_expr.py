@@ -0,0 +1,108 @@
+# Dice expressions such as "4d6kh3", "2d20kl1", "d100" or "3d6+2", compiled once into a roller function
+#
+# An expression is one dice term with an optional keep and modifier: [count]d<sides>[kh<n>|kl<n>][+<m>|-<m>]
+# (kh / kl: only the n highest / lowest dice count). Dice are numbered from 1.
+# compiled(expr) parses expr the first time it is asked for and returns a function roll(randrange) -> int, where
+# randrange is random.randrange (or anything like it). The last CACHE_SIZE compiled expressions are kept, so
+# rolling an expression again never parses it. interpret() parses and rolls in one go every time, drawing the same
+# random numbers in the same order, as a reference for the compiled form.
+
+CACHE_SIZE = 16
+
+_compiled = {}  # expression: roller
+_compiled_order = []  # expressions, oldest first
+compiles = 0  # expressions parsed and compiled so far (to check the cache is used)
+
+
+def _number(s, i):
+    """(value, index after it) of the decimal number at s[i] (ValueError if there is none)."""
+    j = i
+    while j < len(s) and "0" <= s[j] <= "9":
+        j += 1
+    return int(s[i:j]), j
+
+
+def parse(expr):
+    """(count, sides, keep, keep_highest, modifier) of expr. Raises ValueError if it isn't a dice expression."""
+    s = expr.strip().lower()
+    d = s.find("d")
+    if d < 0:
+        raise ValueError(f"no 'd' in dice expression {expr!r}")
+    count = int(s[:d]) if d else 1
+    sides, i = _number(s, d + 1)
+    keep = count
+    keep_highest = True
+    if s.startswith("kh", i) or s.startswith("kl", i):
+        keep_highest = s[i + 1] == "h"
+        keep, i = _number(s, i + 2)
+    modifier = 0
+    if i < len(s) and s[i] in "+-":
+        modifier, j = _number(s, i + 1)
+        if s[i] == "-":
+            modifier = -modifier
+        i = j
+    if i != len(s) or count < 1 or sides < 1 or not 1 <= keep <= count:
+        raise ValueError(f"bad dice expression {expr!r}")
+    return count, sides, keep, keep_highest, modifier
+
+
+def bounds(expr):
+    """Lowest and highest result of expr."""
+    count, sides, keep, _, modifier = parse(expr)
+    return keep + modifier, keep * sides + modifier
+
+
+def interpret(expr, randrange):
+    """Roll expr, parsing it every time (see compiled() for the fast way)."""
+    count, sides, keep, keep_highest, modifier = parse(expr)
+    rolls = sorted(randrange(sides) + 1 for _ in range(count))
+    kept = rolls[count - keep:] if keep_highest else rolls[:keep]
+    return sum(kept) + modifier
+
+
+def _compile(expr):
+    """Roller for expr, specialized to the cheapest way of rolling it."""
+    count, sides, keep, keep_highest, modifier = parse(expr)
+    base = keep + modifier  # (each kept die counts 1 more than randrange(sides) returns)
+    if keep == count:
+        if count == 1:
+            def roll(randrange):
+                return randrange(sides) + base
+        else:
+            def roll(randrange):
+                total = base
+                for _ in range(count):
+                    total += randrange(sides)
+                return total
+    elif keep == 1:
+        def roll(randrange):
+            best = randrange(sides)
+            for _ in range(count - 1):
+                r = randrange(sides)
+                if (r > best) if keep_highest else (r < best):
+                    best = r
+            return best + base
+    else:
+        drop = count - keep
+
+        def roll(randrange):
+            rolls = sorted([randrange(sides) for _ in range(count)])
+            total = base
+            for r in (rolls[drop:] if keep_highest else rolls[:keep]):
+                total += r
+            return total
+    return roll
+
+
+def compiled(expr):
+    """Roller function for expr: roll(randrange) -> int (compiled on first use, then cached)."""
+    global compiles
+    roll = _compiled.get(expr)
+    if roll is None:
+        roll = _compile(expr)
+        compiles += 1
+        if len(_compiled_order) >= CACHE_SIZE:
+            del _compiled[_compiled_order.pop(0)]
+        _compiled[expr] = roll
+        _compiled_order.append(expr)
+    return roll
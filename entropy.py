@@ -0,0 +1,75 @@
+# Random numbers for die rolls: unbiased draws from the hardware random number generator, read in blocks
+#
+# Real results come from os.urandom (the ESP32-S3's hardware RNG on the Feather), so they don't depend on how the
+# random module happened to be seeded after a reboot (including each wake from deep sleep). Bytes are read BLOCK_SIZE
+# at a time into a buffer, and each draw takes as few bytes as it needs. A draw below n is unbiased for any n:
+# values from the top of the byte range that would make some results more likely than others are rejected and
+# drawn again (e.g. for n = 100 from one byte, only 0-199 are used).
+#
+# The numbers flashed up during a roll animation are thrown away, so they come from FastRandom instead: a 16-bit
+# xorshift generator seeded from the pool, which never allocates (its values all fit in a CircuitPython small int).
+
+import os
+
+BLOCK_SIZE = 64  # bytes read from os.urandom at a time
+
+
+class EntropyPool:
+    """Unbiased random numbers from source(n) -> n random bytes (os.urandom by default), read in blocks."""
+
+    def __init__(self, block_size=BLOCK_SIZE, source=os.urandom):
+        self.source = source
+        self.buf = bytearray(block_size)
+        self.pos = block_size  # (nothing read until the first draw)
+        self.refills = 0
+        self.rejections = 0
+
+    def _refill(self):
+        self.buf[:] = self.source(len(self.buf))
+        self.pos = 0
+        self.refills += 1
+
+    def randrange(self, n):
+        """Random integer from 0 to n - 1, each equally likely (n up to 2 ** 24)."""
+        # smallest whole number of bytes covering n, and the largest multiple of n below their range
+        span = 256
+        n_bytes = 1
+        while span < n:
+            span <<= 8
+            n_bytes += 1
+        limit = span - span % n
+        buf = self.buf
+        while True:
+            v = 0
+            for _ in range(n_bytes):
+                if self.pos >= len(buf):
+                    self._refill()
+                v = (v << 8) | buf[self.pos]
+                self.pos += 1
+            if v < limit:
+                return v % n
+            self.rejections += 1
+
+
+class FastRandom:
+    """Cheap, allocation-free (but slightly biased, and predictable) random numbers, for animation only."""
+
+    def __init__(self, seed):
+        self.state = (seed & 0xFFFF) or 1  # (xorshift never leaves 0)
+
+    def randrange(self, n):
+        """Random integer from 0 to n - 1 (n up to 2 ** 14)."""
+        x = self.state
+        x ^= (x << 7) & 0xFFFF
+        x ^= x >> 9
+        x ^= (x << 8) & 0xFFFF
+        self.state = x
+        return (x * n) >> 16
+
+
+pool = EntropyPool()  # shared by everything that rolls for real
+
+
+def randrange(n):
+    """Unbiased random integer from 0 to n - 1, from the shared pool."""
+    return pool.randrange(n)
@@ -0,0 +1,620 @@
+# Thin hardware layer for the die roller on the Feather ESP32-S3 Reverse TFT (+ MAX17048 battery gauge)
+#
+# Everything that touches board-specific CircuitPython modules lives here, so the application (dice_app.py)
+# can also run on a PC against the pure-Python stand-ins in hardware_sim.py, which have the same interface.
+
+import alarm
+import board
+import digitalio
+import displayio
+import keypad
+import microcontroller
+import supervisor
+import terminalio
+import time
+import vectorio
+
+import result_font
+import state_record
+
+# The libraries below need copying from the circuitpython bundle to the local lib/ folder. They are only imported
+#   when first needed, so they aren't in the way of the first frame after waking: adafruit_display_text in
+#   Scene.build_status() / set_history(), adafruit_max1704x when the battery gauge is first read (see BatteryGauge)
+
+_TICKS_PERIOD = state_record.TICKS_PERIOD
+
+# does importing WiFi let us shut it off? (didn't make an obvious battery difference, though...)
+# import wifi
+# wifi.radio.enabled = False
+
+
+class PowerRails:
+    """Neopixel and TFT / I2C (Stemma QT + battery gauge) power switches."""
+
+    def __init__(self):
+        # Disable Neopixel to save power
+        self.neopixel_power = digitalio.DigitalInOut(board.NEOPIXEL_POWER)
+        self.neopixel_power.direction = digitalio.Direction.OUTPUT
+        self.neopixel_power.value = False
+        # Prepare to disable TFT (and Stemma QT) to save power
+        self.tft_i2c_power = digitalio.DigitalInOut(board.TFT_I2C_POWER)
+        self.tft_i2c_power.direction = digitalio.Direction.OUTPUT
+        # self.tft_i2c_power.value = False  # initially powered down, but will power up shortly
+        self.tft_i2c_power.value = True  # power up display and I2C (already on by default...)
+
+    @property
+    def display_i2c(self):
+        """Is the TFT display / I2C rail powered?"""
+        return self.tft_i2c_power.value
+
+    def set_display_i2c(self, on):
+        """Power the TFT display and I2C bus on or off (the battery gauge can't be read while off)."""
+        self.tft_i2c_power.value = on
+
+
+_BUTTON_PINS = (board.D0, board.D1, board.D2)
+
+
+def read_button(n):
+    """Directly read whether button N is pressed (only while its pin isn't in use by keypad or an alarm)."""
+    pin = digitalio.DigitalInOut(_BUTTON_PINS[n])
+    # D0 is pulled HIGH by default on S3 Reverse TFT Feather (see docs), so it's active low
+    if n == 0:
+        pin.switch_to_input(pull=digitalio.Pull.UP)
+        pressed = not pin.value
+    else:
+        pin.switch_to_input(pull=digitalio.Pull.DOWN)
+        pressed = pin.value
+    pin.deinit()
+    return pressed
+
+
+class Buttons:
+    """The three input buttons D0 (roll), D1 (change die), D2 (spare), scanned in the background by keypad."""
+
+    def __init__(self):
+        self.event = keypad.Event()
+        self.injected = []  # button transitions seen while not scanning (e.g. a press that woke us from light sleep)
+        self.start_scanning()
+
+    def start_scanning(self):
+        # D0 is pulled HIGH by default on S3 Reverse TFT Feather (see docs), so it's active low, while D1 and D2
+        # are active high: one keypad scanner for each polarity
+        self.keys_D0 = keypad.Keys((board.D0,), value_when_pressed=False, pull=True)
+        self.keys_D1_D2 = keypad.Keys((board.D1, board.D2), value_when_pressed=True, pull=True)
+
+    def stop_scanning(self):
+        """Release all three pins (e.g. to use them as PinAlarms). Transitions keypad saw that haven't been read yet
+        (e.g. a tap during the last display refresh) are kept, to be returned by get_event() like injected ones."""
+        now = time.monotonic()
+        queued = []
+        while True:
+            transition = self._read_keypad(now)
+            if transition is None:
+                break
+            queued.append(transition)
+        queued.sort(key=lambda transition: transition[2])  # (D0 and D1 / D2 come from separate queues)
+        self.injected = queued + self.injected
+        self.keys_D0.deinit()
+        self.keys_D1_D2.deinit()
+
+    def get_event(self, now):
+        """Return next button transition as (button #, pressed, time), or None. now and time are time.monotonic()."""
+        if self.injected:
+            return self.injected.pop(0)
+        return self._read_keypad(now)
+
+    def _read_keypad(self, now):
+        if self.keys_D0.events.get_into(self.event):
+            n = 0
+        elif self.keys_D1_D2.events.get_into(self.event):
+            n = self.event.key_number + 1
+        else:
+            return None
+        # keypad timestamps are supervisor.ticks_ms(): convert to time.monotonic() via the event's age
+        age_ms = (supervisor.ticks_ms() - self.event.timestamp) % _TICKS_PERIOD
+        return (n, self.event.pressed, now - age_ms / 1000)
+
+    def release_wake_pin(self):
+        """Free D0 so it can be used as a PinAlarm to wake from sleep."""
+        self.keys_D0.deinit()
+
+
+class BatteryGauge:
+    """MAX17048 battery fuel gauge (on the I2C bus, so only readable while the TFT/I2C rail is powered)."""
+
+    def __init__(self):
+        self.monitor = None  # set up on first read, so it isn't in the way of the first frame after waking
+
+    def connect(self):
+        import adafruit_max1704x
+
+        self.monitor = adafruit_max1704x.MAX17048(board.I2C())
+
+    @property
+    def cell_percent(self):
+        if self.monitor is None:
+            self.connect()
+        return self.monitor.cell_percent
+
+    @property
+    def charge_rate(self):
+        """Charge (+) or discharge (-) rate in % per hour."""
+        if self.monitor is None:
+            self.connect()
+        return self.monitor.charge_rate
+
+
+class SleepControl:
+    """Sleep memory (backup RAM that survives deep sleep), light sleep, and deep sleep entry."""
+
+    def __init__(self, buttons):
+        self.buttons = buttons
+        self.wake_alarm = alarm.wake_alarm  # None unless we just rebooted after waking from deep sleep
+        self.memory = alarm.sleep_memory
+        self.light_sleeps = 0
+
+    def light_sleep_until(self, deadline):
+        """Light sleep until time.monotonic() reaches deadline, or any button is pressed.
+
+        The pins are handed from keypad to PinAlarms and back, so a press that woke us but was already released
+        before scanning restarted is passed on to Buttons as an injected press and release.
+        """
+        # (the TFT keeps showing its last frame)
+        self.light_sleeps += 1
+        buttons = self.buttons
+        buttons.stop_scanning()
+        if buttons.injected:
+            # a button changed since the app last looked (and may already be released, so no PinAlarm would wake us):
+            #   don't sleep, hand it straight back
+            buttons.start_scanning()
+            return
+        woke = alarm.light_sleep_until_alarms(
+            alarm.time.TimeAlarm(monotonic_time=deadline),
+            alarm.pin.PinAlarm(pin=board.D0, value=False, pull=True),
+            alarm.pin.PinAlarm(pin=board.D1, value=True, pull=True),
+            alarm.pin.PinAlarm(pin=board.D2, value=True, pull=True),
+        )
+        if isinstance(woke, alarm.pin.PinAlarm):
+            n = _BUTTON_PINS.index(woke.pin)
+            # if the button is still held, keypad will report it as pressed once scanning restarts, but a short
+            # tap may already be over: pass that on as a press and release
+            if not read_button(n):
+                now = time.monotonic()
+                buttons.injected.append((n, True, now))
+                buttons.injected.append((n, False, now))
+        buttons.start_scanning()
+
+    def deep_sleep(self):
+        """Deep sleep until D0 is pressed. Never returns: the board reboots after waking."""
+        self.buttons.release_wake_pin()
+        pin_alarm = alarm.pin.PinAlarm(pin=board.D0, value=False, pull=True)
+        alarm.exit_and_deep_sleep_until_alarms(pin_alarm)
+
+
+##################
+## Display Layout
+
+# Battery icon layout
+BXY = 3   # battery offset from display edge
+BH = 15  # battery icon height
+BW = 35  # battery icon width
+BS = BH // 3  # battery step
+BG = 2  # battery gap
+
+DIE_TEXT_SCALE = 6  # (only for the built-in font, used if there is no RESULT_FONT)
+RESULT_MAX_CHARS = 3  # longest die result that can be shown
+RESULT_FONT = "/fonts/dice_result.bdf"  # large font for the die result, drawn at scale=1 (see make_result_font.py)
+POOL_MAX_DICE = 4  # most dice that can be shown at once (2x2 in the die area)
+POOL_TEXT_SCALE = 3  # (built-in font) for the result on each die of a pool
+SUM_TEXT_SCALE = 2
+SUM_MAX_CHARS = 5  # "= 396"
+HISTORY_TEXT_SCALE = 2
+
+
+def battery_fill_width(pct):
+    """Width of the black '% battery drained' bar drawn inside the battery icon."""
+    return max(1, int((BW - BS - 2 * BG) * (100 - pct) / 100))
+
+
+class Scene:
+    """Everything drawn on the TFT: die polygon and result on the right, button menu and battery icon on the left.
+
+    The set_* methods only change the scene (and mark it dirty), nothing is sent to the display until refresh().
+    Only the die is created up front: the menu and battery items are added by build_status(), so that waking from
+    deep sleep can show the die before building them.
+    """
+
+    def __init__(self, display):
+        self.display = display
+        self.width = display.width
+        self.height = display.height
+        # only refresh the screen when we commit a complete frame (see refresh()), not after every change to an object
+        display.auto_refresh = False
+        self.dirty = True
+
+        # Create an image group we can add elements to, and add that group to the display
+        self.display_group = displayio.Group()
+        display.root_group = self.display_group
+
+        # Next we create a Bitmap which is like a canvas that we can draw on.
+        canvas = displayio.Bitmap(display.width, display.height, 1)
+        # TODO: rename all these with some common prefix such as obj_ or layer_ or gfx_, to make later editing of these globals more clear?
+        # We create a Palette with one color and set that color to a value
+        background_palette = displayio.Palette(1)
+        background_palette[0] = 0x000000  # Black
+        # With all those pieces in place, we create a TileGrid by passing the bitmap and palette and draw it at (0, 0) which represents the display's upper left.
+        background = displayio.TileGrid(canvas, pixel_shader=background_palette, x=0, y=0)
+        self.display_group.append(background)
+
+        # Now draw the die icon background (filled polygon) on the right
+        self.dieroll_x0 = display.width - display.height
+        poly_palette = displayio.Palette(1)
+        poly_palette[0] = 0xCF50FA  # purple
+        self.polygon = vectorio.Polygon(
+            pixel_shader=poly_palette,
+            points=[(0, 0), (0, 0), (0, 0)],  # real points set by the app
+            x=self.dieroll_x0 + display.height // 2,
+            y=display.height // 2,
+        )
+        self.display_group.append(self.polygon)
+
+        # die value: tiles straight from a font's glyph bitmap rather than a Label, so that showing another result
+        #   is a few tile index writes, with no glyph layout (see set_faces() / show_face()). Glyphs of the large
+        #   result font are only read from flash when first shown (see result_font.py).
+        try:
+            self.glyphs = result_font.GlyphCache(RESULT_FONT, displayio.Bitmap)
+            glyph_bitmap = self.glyphs.bitmap
+            self.glyph_width, glyph_height = self.glyphs.cell_width, self.glyphs.cell_height
+            self.blank_tile = result_font.BLANK_TILE
+            self.result_scale = 1
+        except OSError:  # (font not copied to the board)
+            self.glyphs = None
+            font = terminalio.FONT
+            glyph_bitmap = font.bitmap
+            self.glyph_width, glyph_height = font.get_bounding_box()
+            self.blank_tile = font.get_glyph(ord(" ")).tile_index
+            self.result_scale = DIE_TEXT_SCALE
+        text_roll_palette = displayio.Palette(2)
+        text_roll_palette[0] = 0x000000
+        text_roll_palette.make_transparent(0)
+        text_roll_palette[1] = 0x000000  # text color
+        self.text_roll_tiles = displayio.TileGrid(
+            glyph_bitmap,
+            pixel_shader=text_roll_palette,
+            width=RESULT_MAX_CHARS,
+            height=1,
+            tile_width=self.glyph_width,
+            tile_height=glyph_height,
+            y=-(glyph_height // 2),
+        )
+        self.text_roll = displayio.Group(scale=self.result_scale, y=display.height // 2)
+        self.text_roll.append(self.text_roll_tiles)
+        self.display_group.append(self.text_roll)
+        self.faces = []
+        self.layout_evictions = 0
+        self.face_layouts = []  # (tile indices, x) for each face of the current die
+        # several dice at once: smaller polygons with their results, and the sum under the D1 menu text, only created
+        #   the first time they are shown (see set_pool())
+        self.pool_count = 1
+        self.pool_polygons = None
+        self.history = None  # (roll history, created the first time it is shown: see set_history())
+        self.pool_face_layouts = []  # (tile indices, x offset from the polygon center) for each face
+        self.blank_pool_tile = terminalio.FONT.get_glyph(ord(" ")).tile_index
+        self.set_result("??")
+
+    def build_status(self):
+        """Add the button menu, odds, battery icon and runtime text (call once, before any of the set_* methods for
+        them)."""
+        from adafruit_display_text import label
+
+        display = self.display
+        ## Menu text by buttons
+        text_D0 = displayio.Group(scale=2, x=0, y=10)
+        text_D0.append(label.Label(terminalio.FONT, text="< ROLL", color=0xFFFFFF))
+        self.display_group.append(text_D0)
+
+        # odds of the last result, under the D0 menu text
+        self.text_odds = label.Label(terminalio.FONT, text="", color=0xFFFFFF, x=0, y=34)
+        self.display_group.append(self.text_odds)
+
+        self.text_D1 = displayio.Group(scale=2, x=0, y=display.height // 2)
+        self.text_D1.append(label.Label(terminalio.FONT, text="< D?", color=0xFFFFFF))
+        self.display_group.append(self.text_D1)
+
+        ## Battery visual icon
+        self.bat_icon = displayio.Group()
+        self.bat_icon_palette = displayio.Palette(1)
+        self.bat_icon_palette[0] = 0x00FF00
+        # Draw frame of battery as filled polygon
+        bat_icon_frame = vectorio.Polygon(
+            pixel_shader=self.bat_icon_palette,
+            points=[
+                (0, 0),
+                (BW - BS, 0),
+                (BW - BS, BS),
+                (BW, BS),
+                (BW, BS * 2),
+                (BW - BS, BS * 2),
+                (BW - BS, BS * 3),
+                (0, BS * 3),
+            ],
+            x=BXY,
+            y=display.height - BH - BXY,
+        )
+        # now clear out part of the battery w/ a black rectangle
+        black_palette = displayio.Palette(1)
+        black_palette[0] = 0x000000
+        fill_width = battery_fill_width(100)
+        self.bat_icon_filling = vectorio.Rectangle(
+            pixel_shader=black_palette,
+            width=fill_width,
+            height=BH - 2 * BG,
+            x=BW - BS - BG - fill_width + BXY,
+            y=display.height - BH + BG - BXY,
+        )
+        self.bat_icon.append(bat_icon_frame)
+        self.bat_icon.append(self.bat_icon_filling)
+        self.bat_icon_state = None  # (hidden, color, fill width) as last drawn
+        self.display_group.append(self.bat_icon)
+
+        # Estimated battery runtime remaining, next to the battery icon
+        self.text_runtime = label.Label(
+            terminalio.FONT, text="", color=0xFFFFFF, x=BXY + BW + 4, y=display.height - BXY - BH // 2
+        )
+        self.display_group.append(self.text_runtime)
+        self.dirty = True
+
+    def set_brightness(self, brightness):
+        self.display.brightness = brightness
+
+    def set_polygon_points(self, pts):
+        self.polygon.points = pts
+        self.dirty = True
+
+    def layout_result(self, text):
+        """Tile indices and x position to show text (up to RESULT_MAX_CHARS) centered in the die polygon."""
+        text = text[:RESULT_MAX_CHARS]
+        if self.glyphs is not None:
+            tiles = [self.glyphs.tile(c) for c in text]
+        else:
+            font = terminalio.FONT
+            tiles = [font.get_glyph(ord(c)).tile_index for c in text]
+        tiles += [self.blank_tile] * (RESULT_MAX_CHARS - len(text))
+        text_width = len(text) * self.glyph_width * self.result_scale
+        return tiles, self.dieroll_x0 + self.height // 2 - text_width // 2
+
+    def set_faces(self, faces):
+        """Lay out every result of the current die (list of strings) up front, for show_face() / show_pool_faces()."""
+        self.faces = faces
+        glyph_width = terminalio.FONT.get_bounding_box()[0]
+        self.pool_face_layouts = [
+            (self._font_tiles(face, RESULT_MAX_CHARS), -(len(face) * glyph_width * POOL_TEXT_SCALE // 2)) for face in faces
+        ]
+        evictions = self.glyphs.evictions if self.glyphs is not None else 0
+        self.face_layouts = [self.layout_result(face) for face in faces]
+        if self.glyphs is not None:
+            if self.glyphs.evictions != evictions:
+                self.face_layouts = None  # (more characters than glyph slots: lay out each face as it is shown)
+            self.layout_evictions = self.glyphs.evictions
+
+    def show_face(self, i):
+        """Show result faces[i] (from set_faces()) centered in the die polygon."""
+        if self.glyphs is not None and self.glyphs.evictions != self.layout_evictions:
+            self.set_faces(self.faces)  # (a glyph the layouts use was dropped from the cache since)
+        if self.face_layouts is None:
+            self._show_layout(self.layout_result(self.faces[i]))
+        else:
+            self._show_layout(self.face_layouts[i])
+
+    def set_result(self, text):
+        """Show any text (die result) centered in the die polygon."""
+        self._show_layout(self.layout_result(text))
+
+    def _show_layout(self, layout):
+        tiles, x = layout
+        grid = self.text_roll_tiles
+        for i in range(RESULT_MAX_CHARS):
+            grid[i] = tiles[i]
+        self.text_roll.x = x
+        self.dirty = True
+
+    ## Dice pools: up to POOL_MAX_DICE smaller dice in place of the one die, and their sum
+
+    def pool_centers(self, count):
+        """Centers of the polygons for count dice: side by side for 2, else on a 2x2 grid (3: one centered below)."""
+        x0 = self.dieroll_x0
+        h = self.height
+        q = h // 4
+        if count == 2:
+            return [(x0 + q, h // 2), (x0 + 3 * q, h // 2)]
+        centers = [(x0 + q, q), (x0 + 3 * q, q), (x0 + q, 3 * q), (x0 + 3 * q, 3 * q)]
+        if count == 3:
+            centers[2] = (x0 + h // 2, 3 * q)
+        return centers[:count]
+
+    def _font_tiles(self, text, n):
+        """Tile indices of text in the built-in font, padded with blanks to n."""
+        font = terminalio.FONT
+        tiles = [font.get_glyph(ord(c)).tile_index for c in text[:n]]
+        return tiles + [font.get_glyph(ord(" ")).tile_index] * (n - len(tiles))
+
+    def _build_pool(self):
+        font = terminalio.FONT
+        glyph_width, glyph_height = font.get_bounding_box()
+        text_palette = self.text_roll_tiles.pixel_shader
+        self.pool_polygons = []
+        self.pool_texts = []
+        for _ in range(POOL_MAX_DICE):
+            polygon = vectorio.Polygon(pixel_shader=self.polygon.pixel_shader, points=[(0, 0), (0, 0), (0, 0)])
+            self.pool_polygons.append(polygon)
+            self._add_below_history(polygon)
+        for _ in range(POOL_MAX_DICE):  # (after all the polygons, so no polygon covers another die's result)
+            text = displayio.Group(scale=POOL_TEXT_SCALE)
+            text.append(displayio.TileGrid(
+                font.bitmap, pixel_shader=text_palette, width=RESULT_MAX_CHARS, height=1,
+                tile_width=glyph_width, tile_height=glyph_height, y=-(glyph_height // 2),
+            ))
+            self.pool_texts.append(text)
+            self._add_below_history(text)
+        sum_palette = displayio.Palette(2)
+        sum_palette[0] = 0x000000
+        sum_palette.make_transparent(0)
+        sum_palette[1] = 0xFFFFFF
+        self.pool_sum = displayio.Group(scale=SUM_TEXT_SCALE, x=0, y=self.height * 3 // 4 - 2)
+        self.pool_sum.append(displayio.TileGrid(
+            font.bitmap, pixel_shader=sum_palette, width=SUM_MAX_CHARS, height=1,
+            tile_width=glyph_width, tile_height=glyph_height, y=-(glyph_height // 2),
+        ))
+        self._add_below_history(self.pool_sum)
+
+    def _add_below_history(self, item):
+        """Add item to the display, under the roll history if that has been built (it must cover everything else)."""
+        if self.history is None:
+            self.display_group.append(item)
+        else:
+            self.display_group.insert(self.display_group.index(self.history), item)
+
+    def set_pool(self, count):
+        """Show count dice (1 to POOL_MAX_DICE): the one large die for 1, else the pool, with blank results."""
+        self.pool_count = count
+        single = count == 1
+        self.polygon.hidden = not single
+        self.text_roll.hidden = not single
+        if single and self.pool_polygons is None:
+            return
+        if self.pool_polygons is None:
+            self._build_pool()
+        centers = self.pool_centers(count) if not single else []
+        for i in range(POOL_MAX_DICE):
+            hidden = i >= len(centers)
+            self.pool_polygons[i].hidden = hidden
+            self.pool_texts[i].hidden = hidden
+            if not hidden:
+                self.pool_polygons[i].x, self.pool_polygons[i].y = centers[i]
+                self.pool_texts[i].y = centers[i][1]
+                self._show_pool_layout(i, ([self.blank_pool_tile] * RESULT_MAX_CHARS, 0))
+        self.pool_sum.hidden = single
+        self.set_pool_sum("")
+        self.dirty = True
+
+    def set_pool_points(self, pts_list):
+        """Set the vertices of each die in the pool (relative to its center)."""
+        for i in range(len(pts_list)):
+            self.pool_polygons[i].points = pts_list[i]
+        self.dirty = True
+
+    def show_pool_faces(self, indices):
+        """Show faces[indices[i]] (from set_faces()) on die i of the pool."""
+        for i in range(len(indices)):
+            self._show_pool_layout(i, self.pool_face_layouts[indices[i]])
+        self.dirty = True
+
+    def _show_pool_layout(self, i, layout):
+        tiles, dx = layout
+        grid = self.pool_texts[i][0]
+        for k in range(RESULT_MAX_CHARS):
+            grid[k] = tiles[k]
+        self.pool_texts[i].x = self.pool_polygons[i].x + dx
+
+    def set_pool_sum(self, text):
+        """Set the sum of the pool, shown under the D1 menu text."""
+        grid = self.pool_sum[0]
+        tiles = self._font_tiles(text, SUM_MAX_CHARS)
+        for k in range(SUM_MAX_CHARS):
+            grid[k] = tiles[k]
+        self.dirty = True
+
+    def set_history(self, lines):
+        """Show lines of text (the last rolls) in place of the die, or go back to the die if lines is None."""
+        if self.history is None:
+            if lines is None:
+                return
+            from adafruit_display_text import label
+
+            # black backdrop over the die area, with the text on top
+            black_palette = displayio.Palette(1)
+            black_palette[0] = 0x000000
+            self.history = displayio.Group(x=self.dieroll_x0)
+            self.history.append(vectorio.Rectangle(
+                pixel_shader=black_palette, width=self.height, height=self.height, x=0, y=0
+            ))
+            text = displayio.Group(scale=HISTORY_TEXT_SCALE, x=4, y=12)
+            text.append(label.Label(terminalio.FONT, text="", color=0xFFFFFF, line_spacing=1.0))
+            self.history.append(text)
+            self.display_group.append(self.history)
+        self.history.hidden = lines is None
+        if lines is not None:
+            self.history[1][0].text = "\n".join(lines) if lines else "no rolls"
+        self.dirty = True
+
+    def set_die_label(self, text):
+        """Set the menu text next to button D1."""
+        self.text_D1[0].text = text
+        self.dirty = True
+
+    def set_battery(self, pct, color, hidden):
+        """Update color, hidden state and '% battery drained' bar of the battery icon (if any of them changed)."""
+        fill_width = battery_fill_width(pct)
+        if hidden:
+            icon = (True, None, None)  # (nothing else shows while hidden)
+        else:
+            icon = (False, color, fill_width)
+        if icon == self.bat_icon_state:
+            return
+        self.bat_icon_state = icon
+        self.bat_icon.hidden = hidden
+        # update palette used for existing battery icon
+        self.bat_icon_palette[0] = color
+        # update size and location of '% battery drained' black bar
+        self.bat_icon_filling.width = fill_width
+        self.bat_icon_filling.x = BW - BS - BG - fill_width + BXY
+        self.dirty = True
+
+    def set_odds(self, text):
+        """Set the odds text under the D0 menu text."""
+        if text != self.text_odds.text:
+            self.text_odds.text = text
+            self.dirty = True
+
+    def set_runtime(self, text):
+        """Set the estimated runtime text next to the battery icon."""
+        if text != self.text_runtime.text:
+            self.text_runtime.text = text
+            self.dirty = True
+
+    def refresh(self, fps):
+        """Push all pending scene changes to the display in one refresh, capped at fps frames per second."""
+        self.display.refresh(target_frames_per_second=fps, minimum_frames_per_second=0)
+        self.dirty = False
+
+
+class Device:
+    """All of the die roller's hardware (see hardware_sim.SimDevice for the PC stand-in)."""
+
+    def __init__(self):
+        self.power = PowerRails()
+        self.buttons = Buttons()
+        self.sleep = SleepControl(self.buttons)
+        self.nvm = microcontroller.nvm  # flash that survives power loss (None on boards without it)
+        # Battery monitor
+        self.gauge = BatteryGauge()
+        # board-specific display initialization (for this S3 TFT Feather)
+        self.scene = Scene(board.DISPLAY)
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def wall_time(self):
+        """Seconds from the real time clock, which (unlike monotonic()) keeps counting through deep sleep."""
+        return time.time()
+
+    def ms_since_boot(self):
+        return state_record.ms_since_boot(supervisor.ticks_ms())
+
+    def finish_setup(self):
+        """Set up everything not needed for the first frame."""
+        self.scene.build_status()
+
+    def wait(self, seconds):
+        time.sleep(seconds)
@@ -0,0 +1,316 @@
+# Pure-Python stand-ins for hardware.py, to run the die roller headless on a PC (ordinary CPython)
+#
+# Time is simulated: a SimClock only moves forward when the app waits, checks buttons, or refreshes the display
+# (each costs a configurable amount of simulated time), so runs are fast and repeatable. Buttons follow a scripted
+# timeline, the battery gauge drains at a configurable rate, and deep sleep ends the run (see simulate()).
+
+import state_record
+
+
+class SimClock:
+    """Simulated time.monotonic() (seconds)."""
+
+    def __init__(self, t0=0.0):
+        self.now = t0
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class SimButtons:
+    """Buttons driven by a scripted timeline: a list of (button #, press time, release time) in seconds."""
+
+    def __init__(self, clock, timeline=(), read_cost=0.00005):
+        self.clock = clock
+        self.timeline = list(timeline)
+        self.read_cost = read_cost  # simulated time to check for a button event
+        self.reads = 0
+        # press / release transitions in time order, as a background keypad scanner would queue them
+        transitions = []
+        for button, t_press, t_release in self.timeline:
+            transitions.append((t_press, button, True))
+            transitions.append((t_release, button, False))
+        transitions.sort()
+        self.transitions = transitions
+        self.next_transition = 0
+        # skip anything before the current time (e.g. after a simulated reboot)
+        while self.next_transition < len(transitions) and transitions[self.next_transition][0] < clock.now:
+            self.next_transition += 1
+
+    def get_event(self, now):
+        """Return next button transition as (button #, pressed, time), or None."""
+        self.clock.advance(self.read_cost)
+        self.reads += 1
+        if self.next_transition < len(self.transitions):
+            t, button, pressed = self.transitions[self.next_transition]
+            if t <= now:
+                self.next_transition += 1
+                return (button, pressed, t)
+        return None
+
+    def next_transition_time(self):
+        """Time of the next press or release not yet returned by get_event() (or None)."""
+        if self.next_transition < len(self.transitions):
+            return self.transitions[self.next_transition][0]
+        return None
+
+    def next_press(self, after, n=0):
+        """Time of the first scripted press of button N after time after (or None)."""
+        times = [t_press for button, t_press, _ in self.timeline if button == n and t_press > after]
+        return min(times) if times else None
+
+    def release_wake_pin(self):
+        pass
+
+
+class SimPower:
+    """TFT / I2C power rail."""
+
+    def __init__(self):
+        self.display_i2c = True
+        self.switches = 0
+
+    def set_display_i2c(self, on):
+        if on != self.display_i2c:
+            self.switches += 1
+        self.display_i2c = on
+
+
+class SimGauge:
+    """Battery gauge starting at percent, draining drain_per_hour %/hour. Reads fail while the I2C rail is off."""
+
+    def __init__(self, clock, power, percent=80.0, drain_per_hour=5.0, read_cost=0.0005, connect_cost=0.05):
+        self.clock = clock
+        self.power = power
+        self.connect_cost = connect_cost  # (first read: library import and I2C setup)
+        self.connected = False
+        self.percent0 = percent
+        self.drain_per_hour = drain_per_hour
+        self.read_cost = read_cost
+        self.reads = 0
+
+    def _read(self):
+        if not self.power.display_i2c:
+            raise OSError("I2C read with TFT/I2C power off")
+        if not self.connected:
+            self.connected = True
+            self.clock.advance(self.connect_cost)
+        self.clock.advance(self.read_cost)
+        self.reads += 1
+
+    @property
+    def cell_percent(self):
+        self._read()
+        return self.percent0 - self.drain_per_hour * self.clock.now / 3600
+
+    @property
+    def charge_rate(self):
+        self._read()
+        return -self.drain_per_hour
+
+
+class SimScene:
+    """Records what the app draws instead of drawing it. refresh() costs refresh_cost seconds of simulated time."""
+
+    def __init__(self, clock, width=240, height=135, refresh_cost=0.012, build_status_cost=0.02):
+        self.clock = clock
+        self.build_status_cost = build_status_cost
+        self.status_built = False
+        self.first_frame = None  # (result, or sum of a pool, and status_built) when the first frame was refreshed
+        self.width = width
+        self.height = height
+        self.refresh_cost = refresh_cost
+        self.dirty = True
+        self.brightness = 0
+        self.polygon_points = []
+        self.result = ""
+        self.faces = []
+        self.pool_count = 1
+        self.pool_points = []
+        self.pool_results = []
+        self.pool_sum = ""
+        self.die_label = ""
+        self.battery = None  # (pct, color, hidden)
+        self.battery_redraws = 0
+        self.runtime = ""
+        self.odds = ""
+        self.history = None  # lines of roll history shown in place of the die
+        self.frames = 0
+        self.result_changes = 0
+        self.last_refresh = None
+
+    def build_status(self):
+        self.clock.advance(self.build_status_cost)
+        self.status_built = True
+        self.dirty = True
+
+    def set_brightness(self, brightness):
+        self.brightness = brightness
+
+    def set_polygon_points(self, pts):
+        self.polygon_points = pts
+        self.dirty = True
+
+    def set_faces(self, faces):
+        self.faces = faces
+
+    def show_face(self, i):
+        self.set_result(self.faces[i])
+
+    def set_result(self, text):
+        self.result = text
+        self.result_changes += 1
+        self.dirty = True
+
+    def set_pool(self, count):
+        self.pool_count = count
+        self.pool_points = []
+        self.pool_results = [""] * count if count > 1 else []
+        self.pool_sum = ""
+        self.dirty = True
+
+    def set_pool_points(self, pts_list):
+        self.pool_points = pts_list
+        self.dirty = True
+
+    def show_pool_faces(self, indices):
+        self.pool_results = [self.faces[i] for i in indices]
+        self.result_changes += 1
+        self.dirty = True
+
+    def set_pool_sum(self, text):
+        self.pool_sum = text
+        self.dirty = True
+
+    def set_die_label(self, text):
+        self.die_label = text
+        self.dirty = True
+
+    def set_battery(self, pct, color, hidden):
+        # (no icon geometry here, so unlike hardware.Scene any change of pct counts as a redraw)
+        if (pct, color, hidden) != self.battery:
+            self.battery = (pct, color, hidden)
+            self.battery_redraws += 1
+            self.dirty = True
+
+    def set_history(self, lines):
+        self.history = lines
+        self.dirty = True
+
+    def set_odds(self, text):
+        if text != self.odds:
+            self.odds = text
+            self.dirty = True
+
+    def set_runtime(self, text):
+        if text != self.runtime:
+            self.runtime = text
+            self.dirty = True
+
+    def refresh(self, fps):
+        # like displayio: wait out the rest of the frame period if called early
+        if self.last_refresh is not None:
+            early = self.last_refresh + 1 / fps - self.clock.now
+            if early > 0:
+                self.clock.advance(early)
+        self.clock.advance(self.refresh_cost)
+        self.last_refresh = self.clock.now
+        if not self.frames:
+            self.first_frame = (self.result if self.pool_count == 1 else self.pool_sum, self.status_built)
+        self.frames += 1
+        self.dirty = False
+
+
+class DeepSleep(Exception):
+    """Raised by SimSleepControl.deep_sleep() in place of the board rebooting."""
+
+
+class SimSleepControl:
+    def __init__(self, clock, buttons, memory=None, wake_alarm=None):
+        self.clock = clock
+        self.buttons = buttons
+        self.memory = memory if memory is not None else bytearray(8192)
+        self.wake_alarm = wake_alarm
+        self.light_sleeps = 0
+
+    def light_sleep_until(self, deadline):
+        """Skip ahead to deadline, or to the next button press / release if that comes first."""
+        self.light_sleeps += 1
+        t = self.buttons.next_transition_time()
+        if t is not None and t < deadline:
+            deadline = t
+        if deadline > self.clock.now:
+            self.clock.now = deadline
+
+    def deep_sleep(self):
+        raise DeepSleep()
+
+
+class SimDevice:
+    """Simulated hardware with the same attributes as hardware.Device."""
+
+    def __init__(self, timeline=(), clock=None, sleep_memory=None, wake_alarm=None, battery_percent=80.0, nvm=None):
+        self.clock = clock or SimClock()
+        self.t_boot = self.clock.now
+        self.waits = 0  # short (time.sleep) waits, see also sleep.light_sleeps
+        self.power = SimPower()
+        self.buttons = SimButtons(self.clock, timeline)
+        self.sleep = SimSleepControl(self.clock, self.buttons, sleep_memory, wake_alarm)
+        self.nvm = nvm if nvm is not None else bytearray(8192)
+        self.gauge = SimGauge(self.clock, self.power, battery_percent)
+        self.scene = SimScene(self.clock)
+
+    def monotonic(self):
+        return self.clock.monotonic()
+
+    def wall_time(self):
+        return int(self.clock.now)
+
+    def ticks_ms(self):
+        """As supervisor.ticks_ms(): from state_record.TICKS_AT_BOOT at boot, wrapping around."""
+        return (state_record.TICKS_AT_BOOT + int((self.clock.now - self.t_boot) * 1000)) % state_record.TICKS_PERIOD
+
+    def ms_since_boot(self):
+        return state_record.ms_since_boot(self.ticks_ms())
+
+    def finish_setup(self):
+        self.scene.build_status()
+
+    def wait(self, seconds):
+        self.waits += 1
+        self.clock.advance(seconds)
+
+
+def simulate(app_class, timeline, until, battery_percent=80.0, nvm=None):
+    """Run app_class (e.g. dice_app.DiceApp) on simulated hardware following the button timeline until time until.
+
+    Deep sleep 'reboots' the app at the next scripted D0 press (the wake pin), keeping sleep memory, as the board would.
+    nvm (flash) is kept too, and can be passed in to carry it over to another run, as if after a power cut.
+    Returns a list of (boot time, app) for each boot (the last app is still running at time until).
+    """
+    clock = SimClock()
+    sleep_memory = bytearray(8192)
+    if nvm is None:
+        nvm = bytearray(8192)
+    wake_alarm = None
+    boots = []
+    while clock.now < until:
+        t_boot = clock.now
+        hw = SimDevice(timeline, clock, sleep_memory, wake_alarm, battery_percent, nvm)
+        app = app_class(hw)
+        boots.append((t_boot, app))
+        try:
+            while clock.now < until:
+                app.step()
+                app.wait_for_next_deadline()
+        except DeepSleep:
+            wake = hw.buttons.next_press(clock.now)
+            if wake is None or wake >= until:
+                clock.now = until
+                break
+            clock.now = wake
+            wake_alarm = True
+    return boots
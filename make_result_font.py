@@ -0,0 +1,66 @@
+# Make the large bitmap font used for the die result (fonts/dice_result.bdf) from a TrueType font
+#
+# Usage, from the repository root: python make_result_font.py [font.ttf] [pixel size]
+# Needs Pillow (pip install pillow). Only the characters any die can show are included (digits, die symbols, "?"),
+# all in a cell of the same width, so that results can be laid out like a monospaced font (see result_font.py).
+# The default is DejaVu Sans Bold (free license, see https://dejavu-fonts.github.io/License.html).
+
+import os
+import sys
+
+from PIL import Image, ImageDraw, ImageFont
+
+from dice_app import dice_types
+
+DEFAULT_TTF = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+DEFAULT_SIZE = 56  # px (digits about as tall as the scale=6 terminalio ones they replace)
+OUT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts", "dice_result.bdf")
+
+ttf = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_TTF
+size = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_SIZE
+font = ImageFont.truetype(ttf, size)
+
+chars = set("0123456789?")
+for die in dice_types:
+    for symbol in die.get("symbol_list", []):
+        chars.update(symbol)
+chars = sorted(chars)
+
+baseline, _ = font.getmetrics()
+advance = max(int(round(font.getlength(c))) for c in chars)
+rendered = []
+for c in chars:
+    # render on a canvas of cell width, with the glyph centered horizontally in the cell
+    image = Image.new("1", (advance, 2 * size), 0)
+    ImageDraw.Draw(image).text(((advance - font.getlength(c)) / 2, 0), c, font=font, fill=1)
+    rendered.append((c, image, image.getbbox() or (0, 0, 1, 1)))
+# cells only as tall as the glyphs actually used (none of which go far below the baseline), so that centering the
+#   cell vertically centers the digits
+top = min(box[1] for _, _, box in rendered)
+bottom = max(box[3] for _, _, box in rendered)
+ascent = baseline - top
+descent = bottom - baseline
+glyphs = []
+for c, image, box in rendered:
+    glyph = image.crop(box)
+    rows = []
+    for y in range(glyph.height):
+        bits = "".join("1" if glyph.getpixel((x, y)) else "0" for x in range(glyph.width))
+        bits += "0" * (-len(bits) % 8)
+        rows.append("".join(f"{int(bits[i:i + 8], 2):02X}" for i in range(0, len(bits), 8)))
+    # BBX: width, height, x offset from the cell origin, y offset of the bottom row from the baseline
+    glyphs.append((c, glyph.width, glyph.height, box[0], baseline - box[3], rows))
+
+with open(OUT_FILE, "w") as f:
+    f.write("STARTFONT 2.1\n")
+    f.write(f"FONT -{os.path.splitext(os.path.basename(ttf))[0]}-{size}\n")
+    f.write(f"SIZE {size} 75 75\n")
+    f.write(f"FONTBOUNDINGBOX {advance} {ascent + descent} 0 {-descent}\n")
+    f.write(f"STARTPROPERTIES 2\nFONT_ASCENT {ascent}\nFONT_DESCENT {descent}\nENDPROPERTIES\n")
+    f.write(f"CHARS {len(glyphs)}\n")
+    for c, w, h, xoff, yoff, rows in glyphs:
+        f.write(f"STARTCHAR U+{ord(c):04X}\nENCODING {ord(c)}\nSWIDTH 500 0\nDWIDTH {advance} 0\n")
+        f.write(f"BBX {w} {h} {xoff} {yoff}\nBITMAP\n")
+        f.write("\n".join(rows) + "\nENDCHAR\n")
+    f.write("ENDFONT\n")
+print(f"Wrote {len(glyphs)} glyphs ({''.join(chars)}), {advance}x{ascent + descent} px cells, to {OUT_FILE}")
@@ -0,0 +1,84 @@
+# Integer-only (fixed point) polygon vertex math for the die icon
+#
+# On CircuitPython every float result (math.radians(), math.cos(), round(), ...) is a new object on the heap,
+# so calculating polygon vertices with floating point trig is slow and churns the garbage collector.
+# Instead, angles are handled as integers in 1/ANGLE_SUBDIV degree units, and sin/cos come from a
+# quarter-wave fixed-point sine table (linearly interpolated between whole degrees).
+#
+# Intermediate products are kept below 2**30 so they stay CircuitPython 'small ints' (no heap allocation):
+#   radius (in 1/RADIUS_SUBDIV px, up to ~4000 = 250px) * sin (up to SIN_ONE = 2**14), and sin * sin (2**28)
+
+import math
+
+SIN_BITS = 14
+SIN_ONE = 1 << SIN_BITS
+ANGLE_SUBDIV = 16  # angle units per degree
+RADIUS_BITS = 4
+RADIUS_SUBDIV = 1 << RADIUS_BITS  # radius units per pixel
+_SHIFT = SIN_BITS + RADIUS_BITS
+_HALF = 1 << (_SHIFT - 1)
+_SIN_HALF = 1 << (SIN_BITS - 1)
+_QUARTER_TURN = 90 * ANGLE_SUBDIV
+_FULL_TURN = 360 * ANGLE_SUBDIV
+
+# sin(0..90 degrees) in fixed point, computed once at import
+SIN_TABLE = tuple(int(math.sin(math.radians(d)) * SIN_ONE + 0.5) for d in range(91))
+
+
+def isin(a):
+    """Fixed-point sine (scaled by SIN_ONE) of integer angle a, in 1/ANGLE_SUBDIV degree units."""
+    quadrant, a = divmod(a % _FULL_TURN, _QUARTER_TURN)
+    if quadrant & 1:
+        a = _QUARTER_TURN - a
+    d, frac = divmod(a, ANGLE_SUBDIV)
+    s = SIN_TABLE[d]
+    if frac:
+        s += (SIN_TABLE[d + 1] - s) * frac // ANGLE_SUBDIV
+    return -s if quadrant & 2 else s
+
+
+def icos(a):
+    """Fixed-point cosine (scaled by SIN_ONE) of integer angle a, in 1/ANGLE_SUBDIV degree units."""
+    return isin(a + _QUARTER_TURN)
+
+
+def radius_units(radius):
+    """Convert a radius in pixels (int or float) to the fixed-point units polygon_pts() expects."""
+    return int(radius * RADIUS_SUBDIV + 0.5)
+
+
+def polygon_pts(n, rotation=0, radius=0, x_offset=0, y_offset=0):
+    """Calculate (x, y) integer vertices of regular polygon with N sides, using integer math only.
+
+    rotation is in degrees (an int keeps this fully integer), radius in radius_units(), offsets in integer pixels.
+    """
+    if isinstance(rotation, int):
+        a0 = rotation * ANGLE_SUBDIV
+    else:
+        a0 = int(rotation * ANGLE_SUBDIV)
+    x0 = (x_offset << _SHIFT) + _HALF
+    y0 = (y_offset << _SHIFT) + _HALF
+    # table lookups only for the first vertex and the per-vertex step, then rotate by the step with integer math
+    c = icos(a0)
+    s = isin(a0)
+    step = _FULL_TURN // n
+    cd = icos(step)
+    sd = isin(step)
+    # let's have angles read clockwise from the +X axis
+    pts = []
+    for i in range(n):
+        pts.append(((radius * c + x0) >> _SHIFT, (radius * s + y0) >> _SHIFT))
+        c, s = (c * cd - s * sd + _SIN_HALF) >> SIN_BITS, (s * cd + c * sd + _SIN_HALF) >> SIN_BITS
+    return pts
+
+
+def polygon_pts_float(n, rotation=0, radius=0.0, x_offset=0, y_offset=0):
+    """Reference floating point version of polygon_pts() (radius in pixels), for accuracy testing."""
+    angle_internal = 360 / n
+    pts = []
+    for i in range(n):
+        an = math.radians(rotation + angle_internal * i)
+        x = radius * math.cos(an)
+        y = radius * math.sin(an)
+        pts.append((int(round(x + x_offset)), int(round(y + y_offset))))
+    return pts
@@ -0,0 +1,148 @@
+# Estimate of current draw per power state, and of battery runtime remaining, from the battery gauge
+#
+# Rather than logging battery % by hand (see docs/battery_notes.md and tests/test_power_usage.py), the app tells us
+# whenever it changes power state (active, dimmed, display off, deep sleep), and reads the gauge now and then when
+# convenient (never during a roll animation, and never with the I2C rail off). Between two readings we know how long
+# was spent in each state, so the charge used (from the change in battery %, times the battery capacity) can be
+# split between them. Each state keeps its last SAMPLES estimates in a fixed-size buffer, and the whole estimator
+# fits in a few hundred bytes of sleep memory, so it carries on across deep sleeps.
+
+import struct
+from array import array
+
+ACTIVE = 0
+DIMMED = 1
+DISPLAY_OFF = 2
+DEEP_SLEEP = 3
+N_STATES = 4
+
+STATE_NAMES = ("active", "dimmed", "display off", "deep sleep")
+
+# last battery % (-1: none), seconds spent in each state since then, and wall clock time (whole seconds) at deep sleep
+_HEADER = "<5fI"
+_HEADER_SIZE = struct.calcsize(_HEADER)
+
+
+class PowerEstimator:
+    """Rolling per-state average current (mA) for a battery of capacity_mah.
+
+    A reading closes an interval once at least min_sample_time seconds have passed since the last one. Its charge
+    is put down to the state the interval was mostly spent in, after taking off what the other states in it are
+    estimated to have drawn (states with no estimate yet are assumed to draw as much as the main one).
+    """
+
+    def __init__(self, capacity_mah=420, samples=8, min_sample_time=60, now=0.0):
+        self.capacity_mah = capacity_mah
+        self.samples = samples
+        self.min_sample_time = min_sample_time
+        self.state = ACTIVE
+        self.since = now  # (time.monotonic() when we entered state)
+        self.last_percent = -1.0
+        self.pending = array("f", [0.0] * N_STATES)  # seconds in each state since last_percent was read
+        # per state ring buffers of (estimated mA, over how many seconds), state s in slots s*samples ...
+        self.ma = array("f", [0.0] * (N_STATES * samples))
+        self.weight = array("f", [0.0] * (N_STATES * samples))
+        self.next_slot = bytearray(N_STATES)
+
+    def set_state(self, state, now):
+        if state != self.state:
+            self.pending[self.state] += now - self.since
+            self.state = state
+            self.since = now
+
+    def sample(self, now, percent, charge_rate=0.0):
+        """Battery reading at time now. Returns True if it closed an interval (i.e. an estimate was updated)."""
+        self.pending[self.state] += now - self.since  # (bring time in current state up to date)
+        self.since = now
+        if self.last_percent < 0 or percent > self.last_percent or charge_rate > 0:
+            self._restart(percent)  # no earlier reading, or charging (so no use for estimating drain)
+            return False
+        pending = self.pending
+        total = 0
+        main = 0
+        for s in range(N_STATES):
+            total += pending[s]
+            if pending[s] > pending[main]:
+                main = s
+        if total < self.min_sample_time:
+            return False  # too short for a meaningful change in battery %: keep accumulating
+        used_mah = (self.last_percent - percent) * self.capacity_mah / 100
+        main_time = pending[main]
+        for s in range(N_STATES):
+            if s != main and pending[s] > 0:
+                ma = self.current_ma(s)
+                if ma is None:
+                    main_time += pending[s]
+                else:
+                    used_mah -= ma * pending[s] / 3600
+        self._record(main, max(0.0, used_mah) * 3600 / main_time, main_time)
+        self._restart(percent)
+        return True
+
+    def _restart(self, percent):
+        self.last_percent = percent
+        for s in range(N_STATES):
+            self.pending[s] = 0.0
+
+    def _record(self, state, ma, seconds):
+        i = state * self.samples + self.next_slot[state]
+        self.ma[i] = ma
+        self.weight[i] = seconds
+        self.next_slot[state] = (self.next_slot[state] + 1) % self.samples
+
+    def current_ma(self, state=None):
+        """Average current in state (or over all states, weighted by time spent in each), or None if not known yet."""
+        if state is None:
+            first, last = 0, N_STATES * self.samples
+        else:
+            first, last = state * self.samples, (state + 1) * self.samples
+        charge = 0.0
+        seconds = 0.0
+        for i in range(first, last):
+            charge += self.ma[i] * self.weight[i]
+            seconds += self.weight[i]
+        if not seconds:
+            return None
+        return charge / seconds
+
+    def hours_remaining(self, percent):
+        """Estimated runtime left at battery level percent, with the usage seen so far (or None if not known yet)."""
+        ma = self.current_ma()
+        if not ma:
+            return None
+        return percent * self.capacity_mah / 100 / ma
+
+    ## Persistence across deep sleep (sleep memory)
+
+    def size(self):
+        """Bytes of sleep memory used by save()."""
+        return _HEADER_SIZE + 8 * N_STATES * self.samples + N_STATES
+
+    def save(self, memory, offset, now, wall_time):
+        """Store state in memory (at offset) just before deep sleep, at time.monotonic() now and time.time() wall_time."""
+        self.set_state(DEEP_SLEEP, now)
+        pending = self.pending
+        # (alarm.sleep_memory takes slice assignment, but isn't a buffer that struct.pack_into can write to directly)
+        memory[offset:offset + _HEADER_SIZE] = struct.pack(
+            _HEADER, self.last_percent, pending[0], pending[1], pending[2], pending[3], int(wall_time)
+        )
+        i = offset + _HEADER_SIZE
+        n = 4 * N_STATES * self.samples
+        memory[i:i + n] = bytes(self.ma)
+        memory[i + n:i + 2 * n] = bytes(self.weight)
+        memory[i + 2 * n:i + 2 * n + N_STATES] = self.next_slot
+
+    def restore(self, memory, offset, now, wall_time):
+        """Reload state saved by save() after waking from deep sleep (the time asleep counts as DEEP_SLEEP)."""
+        values = struct.unpack(_HEADER, bytes(memory[offset:offset + _HEADER_SIZE]))
+        self.last_percent = values[0]
+        for s in range(N_STATES):
+            self.pending[s] = values[1 + s]
+        self.pending[DEEP_SLEEP] += max(0, int(wall_time) - values[5])
+        i = offset + _HEADER_SIZE
+        n = 4 * N_STATES * self.samples
+        self.ma = array("f", bytes(memory[i:i + n]))
+        self.weight = array("f", bytes(memory[i + n:i + 2 * n]))
+        self.next_slot = bytearray(memory[i + 2 * n:i + 2 * n + N_STATES])
+        self.state = ACTIVE
+        self.since = now
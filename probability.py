@@ -0,0 +1,107 @@
+# Exact probability of every total of a roll of several dice, for showing how likely a result was
+#
+# Dice are counted by face index (0 to sides - 1, whatever the faces show: see dice_app.die_values()), so one table
+# serves every die with that many sides and any fixed offset (e.g. dice numbered from 0 or 1, or a modifier).
+# sum_counts(sides, count)[k] is how many of the sides ** count equally likely outcomes have face indices summing to k.
+# It is built by convolving one more die at a time, starting from the largest pool of the same die already in the
+# cache (so e.g. 4D6 after 3D6 is one step). Integers only, and at most CACHE_SIZE tables are kept.
+# keep_counts() does the same for keeping only the highest (or lowest) few of the dice, e.g. 4D6 keep highest 3.
+
+CACHE_SIZE = 8
+
+_cache = {}  # (sides, count): list of counts
+_cache_order = []  # keys, least recently used first
+convolutions = 0  # dice added to a table so far (to check the cache is reused)
+
+
+def sum_counts(sides, count):
+    """Number of outcomes of count dice with sides faces each, for each total of face indices (0 to count * (sides - 1))."""
+    global convolutions
+    key = (sides, count)
+    if key in _cache:
+        return _recall(key)
+    # start from the largest cached pool of this die (or from one die)
+    start = 1
+    counts = [1] * sides
+    for n in range(count - 1, 1, -1):
+        if (sides, n) in _cache:
+            start = n
+            counts = _cache[(sides, n)]
+            break
+    for _ in range(count - start):
+        # one more die: each new total is the sum of the sides old totals that lead to it (a sliding window)
+        new = [0] * (len(counts) + sides - 1)
+        window = 0
+        for k in range(len(new)):
+            if k < len(counts):
+                window += counts[k]
+            if k >= sides:
+                window -= counts[k - sides]
+            new[k] = window
+        counts = new
+        convolutions += 1
+    return _remember(key, counts)
+
+
+def keep_counts(sides, count, keep, highest=True, pool=1):
+    """Number of outcomes for each total of face indices (0 to pool * keep * (sides - 1)) of pool rolls of count dice
+    with sides faces each, keeping the keep highest (or lowest) dice of each roll."""
+    key = (sides, count, keep, highest, pool)
+    if key in _cache:
+        return _recall(key)
+    # binomial coefficients choose[n][j] (n dice, j of them on one face)
+    choose = [[1]]
+    for n in range(1, count + 1):
+        row = choose[-1]
+        choose.append([1] + [row[j - 1] + row[j] for j in range(1, n)] + [1])
+    # faces from the highest down: ways[n][s] is how many ways n of the dice can show the faces seen so far, with
+    #   the first keep of them (the highest) adding up to s
+    top = keep * (sides - 1)
+    ways = [[1] + [0] * top] + [[0] * (top + 1) for _ in range(count)]
+    for face in range(sides - 1, -1, -1):
+        new = [[0] * (top + 1) for _ in range(count + 1)]
+        for n in range(count + 1):
+            for s, w in enumerate(ways[n]):
+                if w:
+                    for j in range(count - n + 1):
+                        kept = min(n + j, keep) - min(n, keep)
+                        new[n + j][s + face * kept] += w * choose[count - n][j]
+        ways = new
+    roll = ways[count]
+    if not highest:
+        roll = roll[::-1]  # (the lowest dice are the highest ones with every face index i turned into sides - 1 - i)
+    counts = roll
+    for _ in range(pool - 1):
+        total = [0] * (len(counts) + len(roll) - 1)
+        for i, a in enumerate(counts):
+            for j, b in enumerate(roll):
+                total[i + j] += a * b
+        counts = total
+    return _remember(key, counts)
+
+
+def _recall(key):
+    _cache_order.remove(key)
+    _cache_order.append(key)
+    return _cache[key]
+
+
+def _remember(key, counts):
+    if len(_cache_order) >= CACHE_SIZE:
+        del _cache[_cache_order.pop(0)]
+    _cache[key] = counts
+    _cache_order.append(key)
+    return counts
+
+
+def rank(counts, k):
+    """(percentile, odds) of total k in the table counts (from sum_counts()): the percentage of outcomes below k
+    (counting half of those equal to k), 0 to 100, and N for odds of "1 in N" of rolling exactly k."""
+    below = 0
+    for i in range(k):
+        below += counts[i]
+    equal = counts[k]
+    total = below
+    for i in range(k, len(counts)):
+        total += counts[i]
+    return (200 * below + 100 * equal) // (2 * total), (total + equal // 2) // equal
@@ -0,0 +1,90 @@
+# Large bitmap font for the die result, read from a BDF file on flash one glyph at a time
+#
+# Glyphs are drawn into the slots of a single bitmap strip, one font cell wide each, so the result can be shown by a
+# TileGrid over the strip at scale=1 (sharp, and no per-pixel scaling at refresh time) just by setting tile indices.
+# Tile BLANK_TILE is always empty (for padding a result shorter than the grid).
+# Opening the font only indexes where each glyph is in the file: a glyph's bitmap is read the first time it is
+# needed, and at most `slots` glyphs are kept (the least recently used one is dropped to make room for another).
+# Only the parts of BDF needed here are supported: every glyph is placed in a cell of the font's bounding box size,
+# as written by make_result_font.py.
+
+BLANK_TILE = 0
+
+
+class GlyphCache:
+    """Glyphs of the BDF font at path, drawn on demand into bitmap_class(width, height, 2) (e.g. displayio.Bitmap)."""
+
+    def __init__(self, path, bitmap_class, slots=16):
+        self.path = path
+        self.offsets = {}  # character code: file offset of its ENCODING line
+        with open(path, "rb") as f:
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line or line.startswith(b"ENDFONT"):
+                    break
+                if line.startswith(b"FONTBOUNDINGBOX"):
+                    _, w, h, x0, y0 = line.split()
+                    self.cell_width = int(w)
+                    self.cell_height = int(h)
+                    self.cell_y0 = int(y0)  # (offset of the bottom of the cell from the baseline)
+                elif line.startswith(b"ENCODING"):
+                    self.offsets[int(line.split()[1])] = offset
+        self.slots = slots
+        self.bitmap = bitmap_class(self.cell_width * (slots + 1), self.cell_height, 2)  # (+ the blank tile)
+        self.slot_of = {}  # character: slot it is drawn in (tile index slot + 1)
+        self.slot_char = [None] * slots
+        self.last_used = [0] * slots
+        self.uses = 0
+        self.loads = 0
+        self.evictions = 0  # (tile indices handed out before an eviction may no longer show the same character)
+
+    def tile(self, c):
+        """Tile index of character c in the strip, loading it first if needed (BLANK_TILE if the font doesn't have c)."""
+        self.uses += 1
+        slot = self.slot_of.get(c)
+        if slot is None:
+            if ord(c) not in self.offsets:
+                return BLANK_TILE
+            slot = self._free_slot()
+            self._load(c, slot)
+        self.last_used[slot] = self.uses
+        return slot + 1
+
+    def _free_slot(self):
+        slot = 0
+        for i in range(self.slots):
+            if self.slot_char[i] is None:
+                return i
+            if self.last_used[i] < self.last_used[slot]:
+                slot = i
+        del self.slot_of[self.slot_char[slot]]
+        self.slot_char[slot] = None
+        self.evictions += 1
+        return slot
+
+    def _load(self, c, slot):
+        bitmap = self.bitmap
+        x0 = (slot + 1) * self.cell_width
+        for y in range(self.cell_height):
+            for x in range(x0, x0 + self.cell_width):
+                bitmap[x, y] = 0
+        with open(self.path, "rb") as f:
+            f.seek(self.offsets[ord(c)])
+            line = f.readline()
+            while not line.startswith(b"BBX"):
+                line = f.readline()
+            _, w, h, xoff, yoff = line.split()
+            w, h, xoff, yoff = int(w), int(h), int(xoff), int(yoff)
+            f.readline()  # BITMAP
+            # cell row of the glyph's top row: the cell's bottom row is cell_y0 below the baseline
+            top = self.cell_height - 1 - (yoff - self.cell_y0) - (h - 1)
+            for row in range(h):
+                bits = int(f.readline().strip(), 16)
+                n_bits = (w + 7) // 8 * 8
+                for col in range(w):
+                    if bits >> (n_bits - 1 - col) & 1:
+                        bitmap[x0 + xoff + col, top + row] = 1
+        self.slot_of[c] = slot
+        self.slot_char[slot] = c
+        self.loads += 1
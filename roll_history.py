@@ -0,0 +1,55 @@
+# The last few rolls (which die, how many of them, and the result), kept across deep sleep
+#
+# A fixed-size ring of 16-bit entries in an array: 3 bits of die index, 2 bits of number of dice - 1, and 11 bits of
+# result, counted as the total of face indices (0 for the lowest result, see dice_app.DiceApp.show_odds()), so
+# every die and pool fits. Adding a roll is a couple of integer writes, with no allocation, so it costs nothing on
+# the animation path. save() / restore() copy it to and from sleep memory around a deep sleep.
+
+from array import array
+
+MAX_DICE_INDEX = 7
+MAX_DICE_COUNT = 4
+MAX_INDEX_TOTAL = 2047
+
+
+class RollHistory:
+    """The last size rolls, newest first from get()."""
+
+    def __init__(self, size=32):
+        self.entries = array("H", [0] * size)
+        self.head = 0  # slot the next roll goes in
+        self.count = 0
+
+    def append(self, dice_index, dice_count, index_total):
+        """Add a roll of dice_count dice of type dice_index whose face indices added up to index_total."""
+        entries = self.entries
+        entries[self.head] = (dice_index << 13) | ((dice_count - 1) << 11) | min(index_total, MAX_INDEX_TOTAL)
+        self.head += 1
+        if self.head == len(entries):
+            self.head = 0
+        if self.count < len(entries):
+            self.count += 1
+
+    def get(self, i):
+        """(dice index, dice count, index total) of the i-th newest roll (0: the last one)."""
+        entry = self.entries[(self.head - 1 - i) % len(self.entries)]
+        return entry >> 13, ((entry >> 11) & 3) + 1, entry & MAX_INDEX_TOTAL
+
+    def size(self):
+        """Bytes of sleep memory used by save()."""
+        return 2 + 2 * len(self.entries)
+
+    def save(self, memory, offset):
+        memory[offset] = self.head
+        memory[offset + 1] = self.count
+        memory[offset + 2:offset + self.size()] = bytes(self.entries)
+
+    def restore(self, memory, offset):
+        """Reload the rolls saved by save() (the ring must be the same size)."""
+        head = memory[offset]
+        count = memory[offset + 1]
+        if head >= len(self.entries) or count > len(self.entries):
+            return  # (not a saved history)
+        self.head = head
+        self.count = count
+        self.entries = array("H", bytes(memory[offset + 2:offset + self.size()]))
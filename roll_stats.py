@@ -0,0 +1,107 @@
+# Lifetime count of every face rolled on every die, kept in flash (microcontroller.nvm) through any power loss
+#
+# Rolls are only counted in RAM (count() is one array increment, so it costs nothing on the roll path), and added to
+# the counts in flash by flush(): on the way into deep sleep, or once max_pending rolls are waiting (the most a
+# battery pull can lose). Nothing is read from flash at boot: only flush() and totals() read it.
+#
+# Flash wears out with writes, so each flush writes a whole new record into the next of several slots in turn,
+# rather than rewriting the same bytes every time. Slot layout (little-endian): magic "RS", layout key, sequence
+# number, a 32-bit count for every face of every die, and a Fletcher-16 checksum of everything before it. The record
+# with the highest sequence number and a good checksum is the current one. A record is written body first and its
+# header (with the new sequence number) last, into the slot holding the oldest record: if power is lost part way
+# through, that slot just isn't read (a bad checksum, or an old sequence number), and the previous record stands.
+# The layout key is a checksum of the dice (names and number of faces): records from a different list of dice are
+# ignored, and counting starts again.
+
+import struct
+from array import array
+
+from state_record import checksum
+
+MAGIC = b"RS"
+_HEADER = "<2sHI"
+HEADER_SIZE = struct.calcsize(_HEADER)
+
+
+class RollStats:
+    """Lifetime face counts for the dice [(name, number of faces), ...], in nvm (a bytes-like, e.g. microcontroller.nvm)."""
+
+    def __init__(self, nvm, dice, max_pending=200):
+        self.nvm = nvm
+        self.offsets = []  # first count of each die
+        n = 0
+        for _, faces in dice:
+            self.offsets.append(n)
+            n += faces
+        self.offsets.append(n)
+        layout = ",".join(f"{name}:{faces}" for name, faces in dice).encode()
+        self.layout = checksum(layout, len(layout))
+        self._counts = f"<{n}I"
+        self.record_size = HEADER_SIZE + 4 * n + 2
+        self.slots = len(nvm) // self.record_size if nvm is not None else 0
+        self.pending = array("H", [0] * n)  # faces rolled since the last flush
+        self.pending_rolls = 0
+        self.max_pending = max_pending
+        self.writes = 0  # records written (to check writes are batched)
+
+    def count(self, dice_index, face_index):
+        """Count one roll of face face_index on die dice_index (in RAM: see flush())."""
+        self.pending[self.offsets[dice_index] + face_index] += 1
+        self.pending_rolls += 1
+
+    def flush_due(self):
+        """Have enough rolls been counted since the last flush to write them out now?"""
+        return self.pending_rolls >= self.max_pending
+
+    def _latest(self):
+        """(slot, sequence number, record bytes) of the current record, or (-1, 0, None) if there isn't one."""
+        best = (-1, 0, None)
+        nvm = self.nvm
+        size = self.record_size
+        for slot in range(self.slots):
+            start = slot * size
+            magic, layout, sequence = struct.unpack(_HEADER, bytes(nvm[start:start + HEADER_SIZE]))
+            if magic != MAGIC or layout != self.layout or (best[2] is not None and sequence <= best[1]):
+                continue
+            record = bytes(nvm[start:start + size])
+            if struct.unpack_from("<H", record, size - 2)[0] == checksum(record, size - 2):
+                best = (slot, sequence, record)
+        return best
+
+    def totals(self, dice_index):
+        """Lifetime count of each face of die dice_index (including rolls not yet flushed)."""
+        first = self.offsets[dice_index]
+        last = self.offsets[dice_index + 1]
+        stored = [0] * (last - first)
+        if self.slots:
+            record = self._latest()[2]
+            if record is not None:
+                stored = list(struct.unpack_from(self._counts, record, HEADER_SIZE)[first:last])
+        return [stored[i] + self.pending[first + i] for i in range(last - first)]
+
+    def flush(self):
+        """Add the rolls counted since the last flush to the record in nvm. Returns whether anything was written."""
+        if not self.pending_rolls:
+            return False
+        if not self.slots:
+            self._clear_pending()  # (nowhere to keep them)
+            return False
+        slot, sequence, record = self._latest()
+        counts = list(struct.unpack_from(self._counts, record, HEADER_SIZE)) if record else [0] * len(self.pending)
+        for i, n in enumerate(self.pending):
+            counts[i] = min(counts[i] + n, 0xFFFFFFFF)
+        buf = bytearray(self.record_size)
+        struct.pack_into(_HEADER, buf, 0, MAGIC, self.layout, sequence + 1)
+        struct.pack_into(self._counts, buf, HEADER_SIZE, *counts)
+        struct.pack_into("<H", buf, self.record_size - 2, checksum(buf, self.record_size - 2))
+        start = (slot + 1) % self.slots * self.record_size
+        self.nvm[start + HEADER_SIZE:start + self.record_size] = buf[HEADER_SIZE:]
+        self.nvm[start:start + HEADER_SIZE] = buf[:HEADER_SIZE]  # (header last: the record only counts once complete)
+        self._clear_pending()
+        self.writes += 1
+        return True
+
+    def _clear_pending(self):
+        for i in range(len(self.pending)):
+            self.pending[i] = 0
+        self.pending_rolls = 0
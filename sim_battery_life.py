@@ -0,0 +1,237 @@
+# Monte Carlo battery life of the die roller for a usage profile, across settings of its three inactivity timers
+#
+# Usage, from the repository root: python sim_battery_life.py [profile] [device-days per setting] [--latency=s]
+# (profiles: see PROFILES). Prints the settings with the longest battery life whose mean wake latency (the wait from
+# pressing a button to the die being shown) is within the target, and charts battery life against the timers
+# (battery_life.png if matplotlib is installed, else as tables).
+#
+# Each simulated device gets a random timeline of button presses: sessions of rolling, started at random through
+# the day, a random length each, with presses at random (Poisson) within them. Between two presses the device goes
+# through the same states as dice_app.DiceApp with the timers being tried (see power_states(), checked against the
+# real app on simulated hardware in tests/test_sim_battery_life.py): awake rolling, light sleep with the display on,
+# dimmed after INACTIVITY_DIM_TIME, display off after INACTIVITY_SLEEP_TIME, then deep sleep after
+# INACTIVITY_DEEPSLEEP_TIME, and the charge used in each is its time times the state's current (CURRENT_MA). A press
+# in deep sleep reboots the board, which costs BOOT_TIME at the active current, and is also the wait before the die
+# shows. Every setting is tried on the same timelines (so differences between settings aren't just luck), and the
+# runs are spread across a process pool, one per chunk of device-days per setting.
+
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import dice_app
+
+# current draw (mA) in each state: from docs/battery_notes.md and the app's power estimator (see power_estimator.py)
+CURRENT_MA = {
+    "active": 100.0,  # awake, rolling
+    "light sleep": 60.0,  # display on at full brightness, waiting for a press
+    "dimmed": 55.0,
+    "display off": 40.0,  # display and I2C off, light sleep
+    "deep sleep": 0.12,  # (420 mAh lost 14% in 20 days)
+}
+STATES = tuple(CURRENT_MA)
+BOOT_TIME = 1.0  # seconds from a press in deep sleep to the die shown (boot, imports, first frame)
+DISPLAY_WAKE_TIME = 0.05  # seconds to power the display back up after display off
+
+# sessions per day (on average), mean minutes per session, rolls per hour during a session
+PROFILES = {
+    "daily": (2, 10, 60),  # a couple of short games a day
+    "game night": (2 / 7, 180, 30),  # a long board game twice a week
+    "fidget": (12, 1, 240),  # picked up for a few quick rolls many times a day
+}
+CHUNK_DAYS = 100  # device-days per task in the process pool
+
+# timers tried (seconds): dim, display off (after dimming), and deep sleep
+DIM_TIMES = (5, 10, 20, 40)
+SLEEP_AFTER_DIM = (2, 5, 15, 30)
+DEEPSLEEP_TIMES = (30, 60, 120, 180, 300, 600, 1800)
+
+
+def power_states(gap, dim, sleep, deepsleep):
+    """Seconds spent in each state (in STATES order) in the gap seconds from one press to the next, with timers dim,
+    sleep and deepsleep (as INACTIVITY_DIM_TIME, ... in dice_app.DiceApp.step(), dim less than sleep)."""
+    # (the app only checks for deep sleep once the display is off)
+    ends = [min(dice_app.ANIMATION_DURATION, dim), dim, sleep, max(sleep, deepsleep), gap]
+    seconds = []
+    start = 0.0
+    for end in ends:
+        end = min(end, gap)
+        seconds.append(max(0.0, end - start))
+        start = max(start, end)
+    return seconds
+
+
+def state_at(elapsed, dim, sleep, deepsleep):
+    """State of the app elapsed seconds after the last press (as power_states())."""
+    seconds = power_states(elapsed + 1e-9, dim, sleep, deepsleep)
+    return STATES[max(i for i in range(len(STATES)) if seconds[i] > 0)]
+
+
+def press_times(profile, days, rng):
+    """Sorted times (seconds) of every press in days of use following profile."""
+    sessions_per_day, session_minutes, rolls_per_hour = PROFILES[profile]
+    presses = []
+    for day in range(days):
+        # sessions per day: Poisson, by counting exponential gaps within one day
+        t = rng.expovariate(sessions_per_day) if sessions_per_day else 1.0
+        while t < 1.0:
+            start = (day + rng.random()) * 86400
+            end = start + rng.expovariate(1 / (session_minutes * 60))
+            press = start
+            while press <= end:
+                presses.append(press)
+                press += rng.expovariate(rolls_per_hour / 3600)
+            t += rng.expovariate(sessions_per_day)
+    presses.sort()
+    return presses
+
+
+def simulate_chunk(args):
+    """Charge (mA s) used in each state, and wake latency, over days of use (process pool worker).
+    Returns (charge per state, seconds, presses, total wake latency, wakes from deep sleep)."""
+    timers, profile, days, seed = args
+    dim, sleep, deepsleep = timers
+    presses = press_times(profile, days, random.Random(seed))
+    charge = [0.0] * len(STATES)
+    latency = 0.0
+    boots = 0
+    last = None
+
+    def spend(seconds):
+        for i, s in enumerate(seconds):
+            charge[i] += s * CURRENT_MA[STATES[i]]
+
+    for t in presses:
+        if last is None:
+            spend([0.0] * (len(STATES) - 1) + [t])  # (deep sleep until the first press)
+            state = "deep sleep"
+        else:
+            spend(power_states(t - last, dim, sleep, deepsleep))
+            state = state_at(t - last, dim, sleep, deepsleep)
+        if state == "deep sleep":
+            latency += BOOT_TIME
+            boots += 1
+            charge[0] += BOOT_TIME * CURRENT_MA["active"]
+        elif state == "display off":
+            latency += DISPLAY_WAKE_TIME
+        last = t
+    end = days * 86400.0
+    if last is None:
+        spend([0.0] * (len(STATES) - 1) + [end])
+    else:
+        spend(power_states(end - last, dim, sleep, deepsleep))
+    return charge, end, len(presses), latency, boots
+
+
+def settings():
+    """Every combination of timers tried: (dim, sleep, deepsleep)."""
+    grid = []
+    for dim in DIM_TIMES:
+        for after in SLEEP_AFTER_DIM:
+            for deepsleep in DEEPSLEEP_TIMES:
+                if deepsleep > dim + after:
+                    grid.append((dim, dim + after, deepsleep))
+    current = (dice_app.INACTIVITY_DIM_TIME, dice_app.INACTIVITY_SLEEP_TIME, dice_app.INACTIVITY_DEEPSLEEP_TIME)
+    if current not in grid:
+        grid.append(current)
+    return grid
+
+
+def run(profile, days, grid, executor=None):
+    """{timers: (mean mA, battery life in days, mean wake latency in s, fraction of presses from deep sleep,
+    mA per state)} for each setting in grid, over days device-days each (on the same timelines for every setting)."""
+    chunks = [(seed, min(CHUNK_DAYS, days - start)) for seed, start in enumerate(range(0, days, CHUNK_DAYS))]
+    tasks = [(timers, profile, n, seed) for timers in grid for seed, n in chunks]
+    results = executor.map(simulate_chunk, tasks, chunksize=8) if executor else map(simulate_chunk, tasks)
+    totals = {}
+    for (timers, _, _, _), (charge, seconds, presses, latency, boots) in zip(tasks, results):
+        total = totals.setdefault(timers, [[0.0] * len(STATES), 0.0, 0, 0.0, 0])
+        for i, c in enumerate(charge):
+            total[0][i] += c
+        total[1] += seconds
+        total[2] += presses
+        total[3] += latency
+        total[4] += boots
+    summary = {}
+    for timers, (charge, seconds, presses, latency, boots) in totals.items():
+        ma = sum(charge) / seconds
+        summary[timers] = (ma, dice_app.BATTERY_CAPACITY_MAH / ma / 24, latency / max(presses, 1),
+                           boots / max(presses, 1), [c / seconds for c in charge])
+    return summary
+
+
+def best(summary, target_latency):
+    """Timers with the longest battery life whose mean wake latency is at most target_latency (None if none is)."""
+    ok = [timers for timers, result in summary.items() if result[2] <= target_latency]
+    return max(ok, key=lambda timers: summary[timers][1]) if ok else None
+
+
+def describe(timers, result):
+    ma, life, latency, from_deep, per_state = result
+    states = ", ".join(f"{name} {state_ma:.3f}" for name, state_ma in zip(STATES, per_state))
+    return (f"dim {timers[0]:>3d} s, display off {timers[1]:>3d} s, deep sleep {timers[2]:>4d} s: {ma:.3f} mA, "
+            f"{life:.0f} days, wake latency {1000 * latency:.0f} ms ({100 * from_deep:.0f}% of presses from deep "
+            f"sleep)\n    mA by state: {states}")
+
+
+def chart(summary, profile, path="battery_life.png"):
+    """Battery life against the timers: one panel per dim time, deep sleep time across, a line per display off time."""
+    try:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        plt = None
+    if plt is None:
+        for dim in DIM_TIMES:
+            print(f"\nBattery life (days), dim after {dim} s ({profile}):")
+            print(f"  {'display off':>12s} " + " ".join(f"{'deep ' + str(d):>10s}" for d in DEEPSLEEP_TIMES))
+            for after in SLEEP_AFTER_DIM:
+                cells = [summary.get((dim, dim + after, d)) for d in DEEPSLEEP_TIMES]
+                print(f"  {str(dim + after) + ' s':>12s} " + " ".join(
+                    f"{c[1]:10.0f}" if c else f"{'-':>10s}" for c in cells))
+        print("\n(pip install matplotlib to chart this to battery_life.png)")
+        return
+    fig, axes = plt.subplots(1, len(DIM_TIMES), figsize=(4 * len(DIM_TIMES), 4), sharey=True)
+    for ax, dim in zip(axes, DIM_TIMES):
+        for after in SLEEP_AFTER_DIM:
+            points = [(d, summary[(dim, dim + after, d)][1]) for d in DEEPSLEEP_TIMES if (dim, dim + after, d) in summary]
+            ax.plot([p[0] for p in points], [p[1] for p in points], marker="o", label=f"display off {dim + after} s")
+        ax.set_xscale("log")
+        ax.set_title(f"dim after {dim} s")
+        ax.set_xlabel("deep sleep after (s)")
+        ax.grid(True, alpha=0.3)
+    axes[0].set_ylabel(f"battery life (days, {dice_app.BATTERY_CAPACITY_MAH} mAh)")
+    axes[-1].legend(fontsize="small")
+    fig.suptitle(f"Simulated battery life, '{profile}' use")
+    fig.tight_layout()
+    fig.savefig(path, dpi=100)
+    print(f"\nchart: {path}")
+
+
+if __name__ == "__main__":
+    target_latency = 0.25
+    args = []
+    for arg in sys.argv[1:]:
+        if arg.startswith("--latency="):
+            target_latency = float(arg.split("=", 1)[1])
+        else:
+            args.append(arg)
+    profile = args[0] if args else "daily"
+    days = int(args[1]) if len(args) > 1 else 2000
+    if profile not in PROFILES:
+        sys.exit(f"unknown profile {profile!r} (one of: {', '.join(PROFILES)})")
+    grid = settings()
+    print(f"'{profile}' use: {len(grid)} timer settings x {days} device-days, in a process pool")
+    with ProcessPoolExecutor() as executor:
+        summary = run(profile, days, grid, executor)
+    current = (dice_app.INACTIVITY_DIM_TIME, dice_app.INACTIVITY_SLEEP_TIME, dice_app.INACTIVITY_DEEPSLEEP_TIME)
+    print("Current settings:\n  " + describe(current, summary[current]))
+    choice = best(summary, target_latency)
+    if choice is None:
+        print(f"No setting keeps the mean wake latency within {1000 * target_latency:.0f} ms")
+    else:
+        print(f"Longest battery life with mean wake latency within {1000 * target_latency:.0f} ms:\n  "
+              + describe(choice, summary[choice]))
+    chart(summary, profile)
@@ -0,0 +1,23 @@
+# Run the die roller headless on a PC (CPython), with simulated hardware and a scripted button timeline
+# Usage, from the repository root: python sim_diceroll.py
+
+from dice_app import DiceApp, dice_types, die_name
+from hardware_sim import simulate
+
+# (button #, press time, release time) in seconds
+TIMELINE = [
+    (0, 2.0, 2.2),  # roll
+    (1, 4.0, 4.1),  # change die (D20 -> D100)
+    (0, 6.0, 6.1),  # roll
+    (1, 30.0, 30.1),  # press while display is off (wakes display only)
+    (0, 400.0, 400.1),  # wake from deep sleep
+    (0, 403.0, 403.1),  # roll
+]
+DURATION = 420
+
+boots = simulate(DiceApp, TIMELINE, DURATION)
+for t_boot, app in boots:
+    hw = app.hw
+    print(f"boot at {t_boot:.1f}s: {die_name(dice_types[app.dice_index])}, last result '{hw.scene.result}', "
+          f"{hw.scene.frames} frames, {hw.gauge.reads} battery reads, {hw.buttons.reads} button reads, "
+          f"low power mode {app.low_power_mode}, first frame after {app.first_pixel_ms} ms")
@@ -0,0 +1,73 @@
+# State kept in sleep memory (alarm.sleep_memory) across deep sleep, as one versioned, checksummed record
+#
+# Layout (little-endian, see _FORMAT): magic "DR", layout version, die index, number of dice, mode, last result (up to
+# 3 characters: the sum when rolling several dice), rotation, battery % and charge rate (in 1/100ths),
+# time.monotonic() in ms and time.time() when going to sleep, counters of wakes and rolls, boot-to-first-pixel time
+# (ms) of the last boot, and a Fletcher-16 checksum of everything before it.
+# A record with the wrong magic, version or checksum (e.g. after a cold boot, or from an older version of this
+# code) is rejected rather than read as garbage. Bump VERSION whenever the layout changes, or the layout of
+# anything the app stores after it in sleep memory (see dice_app.py).
+
+import struct
+
+MAGIC = b"DR"
+VERSION = 4
+_FORMAT = "<2sBBBB3sHhhIIHIHH"
+SIZE = struct.calcsize(_FORMAT)
+NO_BATTERY = -1  # battery_centipct when there is no battery reading
+TICKS_AT_BOOT = 0x1FFF0000  # supervisor.ticks_ms() at boot: CircuitPython starts it just before it wraps, not at 0
+TICKS_PERIOD = 1 << 29  # supervisor.ticks_ms() wraps around
+
+
+def ms_since_boot(ticks_ms):
+    """Milliseconds since boot (including the reboot after deep sleep) from a supervisor.ticks_ms() reading."""
+    return (ticks_ms - TICKS_AT_BOOT) % TICKS_PERIOD
+
+
+def checksum(data, n):
+    """Fletcher-16 checksum of the first n bytes of data."""
+    a = 0
+    b = 0
+    for i in range(n):
+        a = (a + data[i]) % 255
+        b = (b + a) % 255
+    return (b << 8) | a
+
+
+class StateRecord:
+    """Everything restored after a deep sleep. save() / load() read and write it at offset in memory."""
+
+    def __init__(self):
+        self.dice_index = 0
+        self.dice_count = 1
+        self.mode = 0  # free for scripts to use (e.g. the sleep mode being tested, see tests/test_power_usage.py)
+        self.last_result = ""
+        self.rotation = 0  # degrees
+        self.battery_centipct = NO_BATTERY
+        self.charge_rate_centipct = 0  # (per hour)
+        self.monotonic_ms = 0
+        self.rtc_time = 0
+        self.wakes = 0
+        self.rolls = 0
+        self.boot_ms = 0
+
+    def save(self, memory, offset=0):
+        buf = bytearray(SIZE)
+        struct.pack_into(
+            _FORMAT, buf, 0, MAGIC, VERSION, self.dice_index, self.dice_count, self.mode, self.last_result.encode(), self.rotation,
+            self.battery_centipct, self.charge_rate_centipct, self.monotonic_ms & 0xFFFFFFFF, self.rtc_time,
+            self.wakes & 0xFFFF, self.rolls & 0xFFFFFFFF, min(self.boot_ms, 0xFFFF), 0,
+        )
+        struct.pack_into("<H", buf, SIZE - 2, checksum(buf, SIZE - 2))
+        memory[offset:offset + SIZE] = buf
+
+    def load(self, memory, offset=0):
+        """Restore from memory, if it holds a valid record of this version (returns False, changing nothing, if not)."""
+        buf = bytes(memory[offset:offset + SIZE])
+        values = struct.unpack_from(_FORMAT, buf)
+        if values[0] != MAGIC or values[1] != VERSION or values[-1] != checksum(buf, SIZE - 2):
+            return False
+        (_, _, self.dice_index, self.dice_count, self.mode, last_result, self.rotation, self.battery_centipct,
+         self.charge_rate_centipct, self.monotonic_ms, self.rtc_time, self.wakes, self.rolls, self.boot_ms, _) = values
+        self.last_result = last_result.rstrip(b"\0").decode()
+        return True
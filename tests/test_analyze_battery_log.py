@@ -0,0 +1,97 @@
+# Host-side (CPython) test of the battery log analyzer (analyze_battery_log.py): discharge slopes recovered from
+# synthetic logs (text and binary) with gauge noise, mode changes, charge events and clock resets, in constant memory
+# Run from the repository root: python tests/test_analyze_battery_log.py
+
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from analyze_battery_log import DischargeFit, analyze, report
+from datalogger import Datalogger
+
+T0 = 1_714_000_000  # (a real clock, as after a deep sleep)
+CAPACITY = 420
+rng = random.Random(1)
+
+
+def discharge(mode, t, percent, hours, per_hour, noise=0.05):
+    """Hourly samples of a battery losing per_hour % an hour, from percent at time t."""
+    return [(mode, t + 3600 * h, round(percent - per_hour * h + rng.gauss(0, noise), 2)) for h in range(hours)]
+
+
+# a straight line is fitted exactly, however large the timestamps
+fit = DischargeFit()
+for h in range(10):
+    fit.add(T0 + 3600 * h, 90 - 0.5 * h)
+fit.end_run()
+assert abs(fit.percent_per_hour() + 0.5) < 1e-9 and fit.stderr_per_hour() < 1e-6
+# runs keep their own offsets: two parallel runs at different levels give the same slope, not a jump between them
+for h in range(10):
+    fit.add(T0 + 100_000 + 3600 * h, 40 - 0.5 * h)
+fit.end_run()
+assert abs(fit.percent_per_hour() + 0.5) < 1e-9 and fit.runs == 2 and fit.samples == 20
+assert DischargeFit().percent_per_hour() is None
+
+with tempfile.TemporaryDirectory() as tmp:
+    # text log: deep sleep (mode 3) at 0.03 %/h, charged back up part way through, then a cold boot resetting
+    #   the clock; light sleep (mode 2) at 16 %/h in a second file
+    samples = discharge(3, T0, 80, 300, 0.03)
+    samples += discharge(3, T0 + 3600 * 300, 100, 200, 0.03)  # (charged from ~71% to 100%)
+    samples += discharge(3, 946_684_800, 95, 100, 0.03)  # (clock back to 2000-01-01)
+    text_path = os.path.join(tmp, "battery_log_3.txt")
+    with open(text_path, "w") as f:
+        for mode, t, pct in samples:
+            f.write(f"{mode},{t},{pct}\n")
+    light_path = os.path.join(tmp, "battery_log_2.txt")
+    with open(light_path, "w") as f:
+        f.write("\n")
+        for mode, t, pct in discharge(2, T0, 94, 6, 16, noise=0.3):
+            f.write(f"{mode},{t},{pct}\n")
+        f.write("2,garbage\n")
+    fits, charges = analyze([text_path, light_path])
+    assert charges == 1 and fits[3].runs == 3 and fits[3].samples == 600
+    assert abs(fits[3].percent_per_hour() + 0.03) < 0.002, fits[3].percent_per_hour()
+    assert abs(fits[2].percent_per_hour() + 16) < 0.5 and fits[2].samples == 6
+    text = report(fits, charges, CAPACITY)
+    assert "S3 deep sleep" in text and "1 charge event cut out" in text
+    ma = -fits[3].percent_per_hour() / 100 * CAPACITY
+    assert f"{ma:7.2f}" in text and abs(ma - 0.126) < 0.01
+    deep_sleep_samples = fits[3].samples
+
+    # binary log (datalogger.py, as test_log_power_usage.py writes it): modes switching back and forth
+    bin_path = os.path.join(tmp, "battery_log.bin")
+    log = Datalogger(bin_path, "<BIH", ["mode", "time", "cell_percent/100"], 24, writable=True)
+    t = T0
+    pct = 99.0
+    for _ in range(5):
+        for mode, per_hour, hours in [(1, 4.0, 3), (3, 0.03, 48)]:
+            for mode, t, pct in discharge(mode, t, pct, hours, per_hour, noise=0.02):
+                log.log(mode, t, int(pct * 100))
+            t += 3600
+            pct -= per_hour
+    log.flush()
+    fits, charges = analyze([bin_path])
+    assert charges == 0 and fits[1].runs == fits[3].runs == 5
+    assert abs(fits[1].percent_per_hour() + 4) < 0.1 and abs(fits[3].percent_per_hour() + 0.03) < 0.005
+
+    # months of samples take no more memory than a few days of them
+    def peak_memory(hours):
+        path = os.path.join(tmp, f"long_{hours}.txt")
+        with open(path, "w") as f:
+            for h in range(hours):
+                f.write(f"3,{T0 + 3600 * h},{90 - 0.002 * h:.3f}\n")
+        tracemalloc.start()
+        fits, _ = analyze([path])
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert fits[3].samples == hours
+        return peak
+
+    short, long = peak_memory(100), peak_memory(20_000)
+    assert long < short + 4096, (short, long)
+
+print(f"analyze_battery_log OK (deep sleep {ma:.3f} mA from {deep_sleep_samples} samples; peak memory {short} B "
+      f"for 100 samples, {long} B for 20000)")
@@ -0,0 +1,250 @@
+# Benchmarks of the die roller's hot paths, with stored baselines to catch performance regressions
+#   polygon vertices (per polygon_sides), rolldie() (per die type), random numbers, one animation frame (of one die,
+#   and of the most dice rolled at once, which should stay within the frame period on the device), showing a die
+#   result (and, on the device, the old Label way of doing it for comparison), one idle main loop pass, and
+#   press-to-first-frame latency
+#
+# On a PC (CPython, with the simulated hardware from hardware_sim.py), from the repository root:
+#   python tests/test_benchmark.py                  # compare against stored baseline, exit code 1 on regression
+#   python tests/test_benchmark.py --add-baseline   # store timings of new benchmarks only, keeping the stored ones
+#   python tests/test_benchmark.py --save-baseline  # store current timings as the new baseline (all of them)
+# On the device (real hardware, timed with supervisor.ticks_ms), uncomment the import in code.py: results
+#   and any regressions vs. the device baseline are printed over serial
+#
+# Baselines are per platform ("cpython" / "circuitpython"). Every timed batch is paired with a batch of a fixed
+# pure-Python calibration loop, and regressions are judged on the ratio between the fastest of each, so a machine
+# that is faster or slower than the one that recorded the baseline (or a PC that is throttled right now) doesn't count.
+
+import json
+import sys
+
+ON_DEVICE = sys.implementation.name == "circuitpython"
+REGRESSION_THRESHOLD = 30 if ON_DEVICE else 50  # % slower than baseline that counts as a failure (PC timings are noisier)
+# each benchmark runs REPEATS batches, and the fastest one counts (filtering out most noise from other processes)
+REPEATS = 5 if ON_DEVICE else 25
+ITERATION_SCALE = 1 if ON_DEVICE else 10  # longer batches on a PC, where each call is far faster
+CALIBRATION_CALLS = 20 * ITERATION_SCALE
+
+if ON_DEVICE:
+    import supervisor
+    import hardware
+
+    BASELINE_FILE = "/tests/benchmark_baseline.json"
+    _TICKS_PERIOD = 1 << 29
+
+    def ticks_us():
+        return supervisor.ticks_ms() * 1000
+
+    def elapsed_us(t0, t1):
+        return ((t1 - t0) % (_TICKS_PERIOD * 1000))
+
+    def new_device():
+        return hardware.Device()
+
+else:
+    import os
+    import time
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    import hardware_sim
+
+    BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+    def ticks_us():
+        return time.perf_counter_ns() / 1000
+
+    def elapsed_us(t0, t1):
+        return t1 - t0
+
+    def new_device():
+        return hardware_sim.SimDevice()
+
+import dice_app
+import entropy
+from dice_app import DiceApp, dice_types, die_faces, die_name, rolldie
+
+PLATFORM = sys.implementation.name
+results = {}  # name: (fastest time per call in us, that time relative to the fastest calibration batch)
+
+
+def calibration_loop():
+    total = 0
+    for i in range(100):
+        total += i * i
+    return total
+
+
+def time_batch(fn, calls):
+    t0 = ticks_us()
+    for _ in range(calls):
+        fn()
+    return elapsed_us(t0, ticks_us()) / calls
+
+
+def record(name, times, calibration_times):
+    """Store and print the result of a benchmark, from matching lists of batch times and calibration batch times."""
+    results[name] = (min(times), min(times) / max(min(calibration_times), 0.001))
+    print(f"{name:32s} {min(times):10.1f} us")
+
+
+def bench(name, fn, iterations):
+    """Time fn() in REPEATS batches of iterations calls, each paired with a calibration batch."""
+    calls = iterations * ITERATION_SCALE
+    times = []
+    calibration_times = []
+    for _ in range(REPEATS):
+        calibration_times.append(time_batch(calibration_loop, CALIBRATION_CALLS))
+        times.append(time_batch(fn, calls))
+    record(name, times, calibration_times)
+
+
+app = DiceApp(new_device())
+while app.animation_running:  # let the startup roll finish
+    app.step()
+
+# Polygon vertices for every polygon_sides value in use
+for n in sorted(set(die["polygon_sides"] for die in dice_types)):
+    bench(f"generate_polygon_pts({n})", lambda: app.generate_polygon_pts(n, rotation=37), 200)
+
+# rolldie() for every die type
+for die in dice_types:
+    bench(f"rolldie({die_name(die)})", lambda: rolldie(die), 500)
+
+# Random numbers: unbiased from the entropy pool (real results), and the cheap generator (animation numbers)
+pool = entropy.EntropyPool()
+fast_random = entropy.FastRandom(1234)
+for n in (20, 100):
+    bench(f"entropy.randrange({n})", lambda: pool.randrange(n), 500)
+    bench(f"FastRandom.randrange({n})", lambda: fast_random.randrange(n), 500)
+
+# One animation frame's scene update: polygon points, new number, and re-centering (display refresh excluded, as
+#   on the device it waits for the frame rate cap)
+scene = app.scene
+angles = [5 * i for i in range(72)]
+frame = [0]
+
+
+def animation_frame():
+    frame[0] += 1
+    scene.set_polygon_points(app.lookup_polygon_pts(angles[frame[0] % 72]))
+    app.roll_die_and_update_display(final=False)
+
+
+def show_result():
+    frame[0] += 1
+    scene.show_face(frame[0] % len(app.faces))
+
+
+if ON_DEVICE:
+    # For comparison, the way results used to be shown: set the text of a terminalio Label, and re-center it from
+    #   its bounding box (the Label isn't on the display, so this leaves out its share of the refresh)
+    import displayio
+    import terminalio
+    from adafruit_display_text import label
+
+    old_label = label.Label(terminalio.FONT, text="??", color=0x000000)
+    old_group = displayio.Group(scale=6)
+    old_group.append(old_label)
+
+    def show_result_label():
+        frame[0] += 1
+        old_label.text = app.faces[frame[0] % len(app.faces)]
+        old_group.x = 172 - old_label.bounding_box[2] * 6 // 2
+
+
+largest = max(range(len(dice_types)), key=lambda i: len(die_faces(dice_types[i])))
+for index in (dice_app.DEFAULT_DICE_INDEX, largest):
+    app.dice_index = index
+    app.set_die_faces()
+    app.build_polygon_lookup(dice_types[index])
+    name = die_name(dice_types[index])
+    bench(f"animation_frame({name})", animation_frame, 500)
+    bench(f"show_result({name})", show_result, 500)
+    if ON_DEVICE:
+        bench(f"show_result_label({name})", show_result_label, 500)
+
+# The most dice at once (see MAX_DICE_COUNT): every polygon and result changes in the same frame
+app.dice_index = dice_app.DEFAULT_DICE_INDEX
+app.set_die_faces()
+while app.dice_count < dice_app.MAX_DICE_COUNT:
+    app.change_dice_count()
+while app.animation_running:
+    app.step()
+
+
+def pool_animation_frame():
+    frame[0] += 1
+    scene.set_pool_points(app.lookup_pool_pts(angles[frame[0] % 72]))
+    app.roll_die_and_update_display(final=False)
+
+
+bench(f"animation_frame({app.dice_count}xD20)", pool_animation_frame, 500)
+while app.dice_count != 1:
+    app.change_dice_count()
+while app.animation_running:
+    app.step()
+
+
+# One idle main loop pass (buttons, battery icon update, idle commit, dim/sleep checks)
+def idle_pass():
+    app.last_button_time = app.hw.monotonic()  # stay awake
+    app.step()
+
+
+bench("idle_loop_pass", idle_pass, 100)
+
+
+# Press-to-first-frame latency: from the main loop seeing D0 pressed to the first animation frame being committed
+def first_frame():
+    refreshed = app.last_refresh_time
+    app.start_dieroll()
+    while app.last_refresh_time == refreshed:
+        app.step()
+
+
+times = []
+calibration_times = []
+for _ in range(REPEATS * ITERATION_SCALE // 2):  # (each sample is a single short run, so take more of them)
+    while app.animation_running:  # finish previous roll (untimed)
+        app.step()
+    calibration_times.append(time_batch(calibration_loop, CALIBRATION_CALLS))
+    times.append(time_batch(first_frame, 1))
+record("press_to_first_frame", times, calibration_times)
+
+# Compare to (or save) baseline
+try:
+    with open(BASELINE_FILE) as f:
+        baselines = json.load(f)
+except (OSError, ValueError):
+    baselines = {}
+
+if "--save-baseline" in sys.argv or "--add-baseline" in sys.argv:
+    baseline = {name: [round(t, 2), round(relative, 4)] for name, (t, relative) in results.items()}
+    if "--add-baseline" in sys.argv:
+        baseline.update(baselines.get(PLATFORM, {}))  # (a regression must not become the new baseline)
+    baselines[PLATFORM] = baseline
+    with open(BASELINE_FILE, "w") as f:
+        if ON_DEVICE:
+            json.dump(baselines, f)  # (no indent option in CircuitPython's json)
+        else:
+            json.dump(baselines, f, indent=1, sort_keys=True)
+    print(f"Saved {PLATFORM} baseline to {BASELINE_FILE}")
+else:
+    baseline = baselines.get(PLATFORM, {})
+    if not baseline:
+        print(f"No {PLATFORM} baseline stored (run with --save-baseline)")
+    regressions = []
+    for name, (t, relative) in results.items():
+        if name in baseline:
+            base_t, base_relative = baseline[name]
+            slower = 100 * (relative / base_relative - 1)
+            if slower > REGRESSION_THRESHOLD:
+                regressions.append(f"{name}: {slower:.0f}% slower than baseline ({t:.1f} us vs. {base_t:.1f} us)")
+    if regressions:
+        print(f"FAIL: {len(regressions)} benchmark(s) more than {REGRESSION_THRESHOLD}% slower than baseline:")
+        for r in regressions:
+            print("  " + r)
+        if not ON_DEVICE:
+            sys.exit(1)
+    elif baseline:
+        print(f"OK: no benchmark more than {REGRESSION_THRESHOLD}% slower than baseline")
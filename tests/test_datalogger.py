@@ -0,0 +1,76 @@
+# Host-side (CPython) test of the buffered binary datalogger (datalogger.py): records only written to the file in
+# blocks, the buffer kept in (sleep) memory across a 'reboot', a read-only filesystem, and decoding back to CSV
+# Run from the repository root: python tests/test_datalogger.py
+
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import datalogger
+from datalogger import Datalogger
+
+FMT = "<BIH"
+FIELDS = ["mode", "time", "cell_percent/100"]
+
+with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "battery_log.bin")
+    memory = bytearray(8192)  # (sleep memory)
+
+    # nothing is written until the buffer fills up, then it all goes in one write
+    log = Datalogger(path, FMT, FIELDS, 4, memory, 100, writable=True)
+    assert log.count == 0  # (blank memory)
+    samples = [(3, 1_700_000_000 + 3600 * i, 9000 - 37 * i) for i in range(11)]
+    for sample in samples[:4]:
+        log.log(*sample)
+    assert not os.path.exists(path) and log.count == 4
+    log.log(*samples[4])
+    assert log.flushes == 1 and log.count == 1
+    size = os.path.getsize(path)
+
+    # a deep sleep 'reboot': a new logger on the same memory carries on with the buffered records
+    for sample in samples[5:8]:
+        log = Datalogger(path, FMT, FIELDS, 4, memory, 100, writable=True)
+        log.log(*sample)
+    assert log.count == 4 and os.path.getsize(path) == size
+    log = Datalogger(path, FMT, FIELDS, 4, memory, 100, writable=True)
+    for sample in samples[8:]:
+        log.log(*sample)
+    log.flush()
+    assert log.count == 0 and log.flushes == 2 and not log.dropped
+    assert all(b == 0 for b in memory[:100]) and all(b == 0 for b in memory[100 + log.size():])
+
+    # decodes back to the samples (percent in 1/100ths back to a number), header once at the top
+    with open(path, "rb") as f:
+        names, rows = datalogger.decode(f.read())
+    assert names == ["mode", "time", "cell_percent"]
+    assert rows == [[mode, t, pct / 100] for mode, t, pct in samples], rows
+    csv = subprocess.run([sys.executable, datalogger.__file__, path], capture_output=True, text=True, check=True).stdout
+    lines = csv.splitlines()
+    assert lines[0] == "mode,time,cell_percent" and lines[1] == "3,1700000000,90.0" and len(lines) == 1 + len(samples)
+
+    # memory from a cold boot (garbage), or buffering some other format, is taken as empty
+    garbage = bytearray(os.urandom(256))
+    assert Datalogger(path, FMT, FIELDS, 4, garbage, 0, writable=True).count <= 4
+    garbage[0:2] = b"XX"
+    assert Datalogger(path, FMT, FIELDS, 4, garbage, 0, writable=True).count == 0
+    log.log(*samples[0])
+    assert Datalogger(path, "<BIHh", FIELDS + ["rate"], 4, memory, 100, writable=True).count == 0
+
+    # read-only filesystem: records are dropped quietly, without trying to open the file
+    readonly_path = os.path.join(tmp, "readonly.bin")
+    log = Datalogger(readonly_path, FMT, FIELDS, 4, writable=False)
+    for sample in samples:
+        log.log(*sample)
+    log.flush()
+    assert log.dropped == len(samples) and log.flushes == 0 and not os.path.exists(readonly_path)
+    # (off the device there is no storage module to ask, so that counts as not writable)
+    assert not Datalogger(readonly_path, FMT, FIELDS).writable
+    # a write that fails (e.g. a full disk) stops any more attempts
+    log = Datalogger(os.path.join(tmp, "no_such_dir", "log.bin"), FMT, FIELDS, 2, writable=True)
+    for sample in samples[:3]:
+        log.log(*sample)
+    assert not log.writable and log.dropped == 2
+
+print(f"datalogger OK ({len(samples)} samples of {log.record_size} bytes, written 4 at a time)")
@@ -0,0 +1,296 @@
+# Host-side (CPython) regression test of the die roller app logic (dice_app.py) on simulated hardware (hardware_sim.py)
+# Checks rolling, changing die (incl. holding D1), rolling several dice (D2), dimming, display-off, deep sleep, restoring the die after waking,
+# and the lifetime face counts in flash
+# Run from the repository root: python tests/test_dice_app_sim.py
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import dice_app
+import dice_expr
+import entropy
+import probability
+import roll_history
+from dice_app import DiceApp, dice_types, die_faces, die_name, die_values, format_odds, format_sum, roll_pool, rolldie
+from battery_service import BatteryService
+import state_record
+from state_record import StateRecord
+from hardware_sim import DeepSleep, SimClock, SimDevice, SimGauge, SimPower, simulate
+
+
+def run_until(app, t):
+    while app.hw.monotonic() < t:
+        app.step()
+        app.wait_for_next_deadline()
+
+
+# Every die's list of faces (which rolls pick from by index) matches what rolldie() can return
+for die in dice_types:
+    faces = die_faces(die)
+    assert len(faces) == len(set(faces)) and ("expr" in die or len(faces) == die["sides"])
+    assert all(rolldie(die) in faces for _ in range(1000))
+    assert len(die_values(die)) == len(faces)
+    assert all(len(result) == 3 and set(result) <= set(faces) for result in (roll_pool(die, 3) for _ in range(100)))
+# ...and pools roll each die with the real distribution of its results (e.g. 3 is rare on 4d6kh3, not one in 16)
+for die in dice_types:
+    if "expr" in die:
+        count, sides, keep, keep_highest, _ = dice_expr.parse(die["expr"])
+        exact = probability.keep_counts(sides, count, keep, keep_highest)
+    else:
+        exact = probability.sum_counts(die["sides"], 1)
+    faces = die_faces(die)
+    seen = [0] * len(faces)
+    for _ in range(4000):
+        for result in roll_pool(die, 5):
+            seen[faces.index(result)] += 1
+    rolls = sum(seen)
+    for i, n in enumerate(seen):
+        p = exact[i] / sum(exact)
+        assert abs(n - rolls * p) <= 5 * (rolls * p * (1 - p)) ** 0.5 + 1, (die_name(die), faces[i], n, rolls * p)
+assert format_sum(-2, dice_types[0]) == "-2" and format_sum(0, dice_types[0]) == "+0"
+
+# Startup: rolls a D20, animation finishes within its time budget (with light sleep while idle, off by default: the
+#   default polling path is checked further down)
+dice_app.LIGHT_SLEEP_IDLE = True
+hw = SimDevice(timeline=[(0, 2.0, 2.1), (1, 3.0, 3.1)])
+app = DiceApp(hw)
+assert app.dice_index == dice_app.DEFAULT_DICE_INDEX
+assert hw.scene.die_label == "< D20"
+run_until(app, 1.0)
+assert not app.animation_running
+assert 1 <= int(hw.scene.result) <= 20
+assert hw.scene.odds == format_odds((200 * (int(hw.scene.result) - 1) + 100) // 40, 20)
+frames_first_roll = hw.scene.frames
+# boot-to-first-frame time: from a ticks_ms() counter starting near its wrap point, as on the board
+assert hw.ticks_ms() > state_record.TICKS_AT_BOOT and 0 < app.first_pixel_ms < 1000
+assert app.state.boot_ms == app.first_pixel_ms
+hw_late = SimDevice(clock=SimClock(5000.0))
+hw_late.clock.advance(100.0)  # (ticks_ms() wrapped around after about 65 s)
+assert hw_late.ticks_ms() < state_record.TICKS_AT_BOOT and hw_late.ms_since_boot() == 100_000
+assert frames_first_roll <= app.roll_animation.total_frames + 1
+
+# D0 rolls again, D1 changes die (and clears then re-rolls)
+run_until(app, 2.5)
+assert app.roll_animation.frames_rendered > 0
+assert app.roll_animation.t0 - 2.0 <= dice_app.LOOP_SLEEP  # press wakes the idle loop from light sleep at once
+run_until(app, 4.0)
+assert app.dice_index == (dice_app.DEFAULT_DICE_INDEX + 1) % len(dice_types)
+assert hw.scene.die_label == f"< {die_name(dice_types[app.dice_index])}"
+assert hw.scene.polygon_points == app.lookup_polygon_pts()
+
+# Idle with the display on: the loop sleeps until the next deadline instead of polling every LOOP_SLEEP
+passes = hw.waits + hw.sleep.light_sleeps
+run_until(app, 3.1 + dice_app.INACTIVITY_DIM_TIME - 0.5)
+idle_wakeups = (hw.waits + hw.sleep.light_sleeps - passes) / (dice_app.INACTIVITY_DIM_TIME - 1.4)
+assert idle_wakeups < 2, idle_wakeups
+assert hw.scene.brightness == dice_app.TFT_BRIGHTNESS
+assert app.battery.reads <= 1 + hw.monotonic() / dice_app.BATTERY_TTL
+assert hw.scene.battery_redraws == 1  # (battery drains less than BATTERY_HYSTERESIS in this time)
+
+# Inactivity: dim, then display / I2C off
+run_until(app, 3.1 + dice_app.INACTIVITY_DIM_TIME + 0.01)
+assert hw.scene.brightness == dice_app.TFT_DIM_BRIGHTNESS
+run_until(app, 3.1 + dice_app.INACTIVITY_SLEEP_TIME + 1)
+assert app.low_power_mode and not hw.power.display_i2c
+reads = hw.gauge.reads
+run_until(app, 3.1 + dice_app.INACTIVITY_SLEEP_TIME + 10)
+assert hw.gauge.reads == reads  # no battery reads with I2C off
+
+# ...then deep sleep, which saves the die to sleep memory
+try:
+    run_until(app, 3.1 + dice_app.INACTIVITY_DEEPSLEEP_TIME + 1)
+    raise AssertionError("expected deep sleep")
+except DeepSleep:
+    pass
+saved = StateRecord()
+assert saved.load(hw.sleep.memory)
+assert saved.dice_index == app.dice_index and saved.last_result == hw.scene.result and saved.rolls == 3
+dice_app.LIGHT_SLEEP_IDLE = False
+
+# Without light sleep (the default), idle waits are time.sleep polls of at most LOOP_SLEEP, and a press is seen
+#   within one
+hw = SimDevice(timeline=[(0, 2.0, 2.1)])
+app = DiceApp(hw)
+run_until(app, 2.5)
+assert hw.sleep.light_sleeps == 0 and app.roll_animation.t0 - 2.0 <= dice_app.LOOP_SLEEP
+run_until(app, 3.1 + dice_app.INACTIVITY_DIM_TIME + 0.01)
+assert hw.sleep.light_sleeps == 0 and hw.scene.brightness == dice_app.TFT_DIM_BRIGHTNESS
+
+# No battery gauge reads (I2C) while a roll is animating, even straight after waking the display
+hw = SimDevice(timeline=[(0, 30.0, 30.1)])
+app = DiceApp(hw)
+run_until(app, 30.0)
+assert app.low_power_mode
+app.step()
+assert app.animation_running
+reads = hw.gauge.reads
+while app.animation_running:
+    app.step()
+    app.wait_for_next_deadline()
+assert hw.gauge.reads == reads
+run_until(app, 31.0)
+assert hw.gauge.reads > reads  # (deferred reading for the power estimate)
+
+# Holding D1: one change on press, no change on the long press, then one more for each auto-repeat
+hw = SimDevice(timeline=[(1, 1.0, 2.5)])
+app = DiceApp(hw)
+run_until(app, 3.0)
+assert app.dice_index == (dice_app.DEFAULT_DICE_INDEX + 2) % len(dice_types)
+
+# Battery service: gauge read at most once per TTL, level only reported when it moves by the hysteresis,
+#   and no reads while the I2C rail is off
+clock = SimClock()
+power = SimPower()
+gauge = SimGauge(clock, power, percent=50.0, drain_per_hour=36.0)  # 1% per 100 s
+battery = BatteryService(gauge, power, ttl=5.0, hysteresis=1.0)
+changes = 0
+while clock.now < 1000:
+    changes += battery.update(clock.now)
+    clock.advance(0.01)
+assert gauge.reads == 200, gauge.reads
+assert changes == 10, changes  # the first read, then one per 1% step
+assert abs(battery.percent - 41.0) < 0.1
+power.set_display_i2c(False)
+assert not battery.update(clock.now + 10) and gauge.reads == 200
+power.set_display_i2c(True)
+battery.invalidate()
+battery.update(clock.now)
+assert gauge.reads == 201
+
+# Full run across a deep sleep 'reboot': die restored from sleep memory on wake
+timeline = [(1, 1.0, 1.1), (0, 500.0, 500.1)]
+boots = simulate(DiceApp, timeline, 510)
+assert len(boots) == 2
+(t0, app0), (t1, app1) = boots
+assert t1 == 500.0
+assert app1.dice_index == app0.dice_index == (dice_app.DEFAULT_DICE_INDEX + 1) % len(dice_types)
+assert app1.hw.scene.result != ""
+assert app1.state.wakes == 1 and app1.state.rolls == app0.state.rolls + 1
+# Fast resume: the first frame after waking is the die and result from before the deep sleep, drawn before the
+#   menu / battery items are built or the battery gauge is set up
+assert app1.hw.scene.first_frame == (app0.state.last_result, False)
+assert app0.hw.scene.first_frame[1]
+assert app1.first_pixel_ms < app0.first_pixel_ms
+assert app1.first_pixel_ms < 1000 * app1.hw.gauge.connect_cost
+assert app1.hw.scene.runtime.endswith("h")  # runtime estimate, from readings before and after the deep sleep
+# Only the real result of a roll is drawn from the entropy pool, not the numbers flashed up while rolling
+draws = []
+real_randrange = entropy.randrange
+entropy.randrange = lambda n: draws.append(n) or real_randrange(n)
+hw = SimDevice()
+app = DiceApp(hw)
+draws.clear()
+run_until(app, 1.0)
+entropy.randrange = real_randrange
+assert app.roll_animation.frames_rendered > 2 and draws == [20]
+
+# Dice pools: D2 cycles the number of dice 1..MAX_DICE_COUNT. Every number change updates all the dice and their
+#   sum at once, and each animation frame moves every polygon, in a single frame commit
+presses = [(2, 1.0 + i, 1.1 + i) for i in range(dice_app.MAX_DICE_COUNT)]
+hw = SimDevice(timeline=presses)
+app = DiceApp(hw)
+run_until(app, 1.9)
+assert app.dice_count == 2 and hw.scene.pool_count == 2 and hw.scene.die_label == "< 2D20"
+assert len(hw.scene.pool_points) == 2 and hw.scene.pool_points[0] != hw.scene.pool_points[1]
+assert len(hw.scene.pool_results) == 2 and all(1 <= int(r) <= 20 for r in hw.scene.pool_results)
+assert hw.scene.pool_sum == "= " + str(sum(int(r) for r in hw.scene.pool_results))
+assert hw.scene.pool_sum == "= " + app.state.last_result
+# odds of the sum, against counting every outcome of 2D20
+total = sum(int(r) for r in hw.scene.pool_results)
+below = sum(1 for a in range(1, 21) for b in range(1, 21) if a + b < total)
+equal = sum(1 for a in range(1, 21) for b in range(1, 21) if a + b == total)
+assert hw.scene.odds == format_odds((200 * below + 100 * equal) // 800, (400 + equal // 2) // equal)
+hw.scene.dirty = False
+frames = hw.scene.frames
+app.start_dieroll()
+while app.animation_running:
+    app.step()
+    if hw.scene.dirty and app.animation_running:  # (the odds after the roll go out with the idle changes)
+        raise AssertionError("scene changed without a frame commit")
+assert hw.scene.frames > frames
+run_until(app, 3.9)
+assert app.dice_count == 4 and len(hw.scene.pool_results) == 4
+run_until(app, 4.9)
+assert app.dice_count == 1 and hw.scene.pool_count == 1 and hw.scene.die_label == "< D20"
+# symbol dice sum to their symbol_values (D3: -, O, + count -1, 0, +1)
+app.dice_index = 0
+app.change_dice_count()
+app.set_die_faces()
+app.set_die_shape()
+for _ in range(20):
+    app.roll_die_and_update_display()
+    total = sum(dice_types[0]["symbol_values"][die_faces(dice_types[0]).index(r)] for r in hw.scene.pool_results)
+    assert hw.scene.pool_sum == "= " + format_sum(total, dice_types[0])
+# dice expressions roll through their compiled roller, with the odds of keeping the highest dice
+expr_index = next(i for i, die in enumerate(dice_types) if "expr" in die)
+hw = SimDevice()
+app = DiceApp(hw)
+while app.dice_index != expr_index:
+    app.change_die()
+run_until(app, 1.0)
+assert hw.scene.die_label == f"< {dice_types[expr_index]['expr']}"
+assert str(app.rolled_total) == hw.scene.result and 3 <= app.rolled_total <= 18
+assert hw.scene.odds == format_odds(*probability.rank(probability.keep_counts(6, 4, 3), app.rolled_total - 3))
+app.change_dice_count()
+run_until(app, hw.monotonic() + 1.0)
+assert hw.scene.die_label == f"<2x{dice_types[expr_index]['expr']}"
+assert hw.scene.pool_sum == "= " + str(sum(int(r) for r in hw.scene.pool_results))
+# the number of dice is kept across deep sleep, and shown (with the saved sum) in the first frame after waking
+boots = simulate(DiceApp, [(2, 1.0, 1.1), (2, 2.0, 2.1), (0, 500.0, 500.1)], 510)
+(_, app0), (_, app1) = boots
+assert app0.dice_count == app1.dice_count == 3 and app1.hw.scene.die_label == "< 3D20"
+assert app1.hw.scene.first_frame == ("= " + app0.state.last_result, False)
+
+# Roll history: holding D2 lists the last rolls in place of the die (without changing the number of dice), and
+#   the history is kept across a deep sleep
+timeline = [(0, 2.0, 2.1), (1, 3.0, 3.1), (2, 4.0, 5.5), (2, 6.0, 6.1), (0, 500.0, 500.1), (2, 501.0, 502.5)]
+hw = SimDevice(timeline=timeline)
+app = DiceApp(hw)
+run_until(app, 5.0)
+assert app.dice_count == 1 and app.history_shown and app.history.count == 3
+assert hw.scene.history[0] == f"{die_name(dice_types[app.dice_index])} {hw.scene.result}"
+assert hw.scene.history[2].startswith("D20 ") and len(hw.scene.history) == 3
+run_until(app, 5.6)
+assert not app.history_shown and hw.scene.history is None and app.dice_count == 1
+run_until(app, 7.0)
+assert app.dice_count == 2  # (short press)
+boots = simulate(DiceApp, timeline, 502.0)  # (D2 still held)
+(_, app0), (_, app1) = boots
+assert app0.history.count == 4 and app1.dice_count == 2
+assert app1.history_shown and app1.history.count == 5  # (+ the roll on waking)
+assert app1.hw.scene.history[1:] == app0.history_lines(4)
+# more dice than a history entry has bits for is refused up front, rather than packed into the wrong fields
+saved = dice_app.MAX_DICE_COUNT
+dice_app.MAX_DICE_COUNT = roll_history.MAX_DICE_COUNT + 1
+try:
+    DiceApp(SimDevice())
+except AssertionError as e:
+    assert "roll history" in str(e), e
+else:
+    raise AssertionError("expected MAX_DICE_COUNT to be checked against the roll history")
+finally:
+    dice_app.MAX_DICE_COUNT = saved
+
+# Lifetime face counts: counted in RAM on every roll, written to flash only on the way into deep sleep (or once
+#   ROLL_STATS_MAX_PENDING rolls are waiting), and still there after a power cut (a cold boot with the same flash)
+nvm = bytearray(8192)
+timeline = [(0, 2.0, 2.1), (2, 3.0, 3.1), (0, 500.0, 500.1)]
+(_, app0), (_, app1) = simulate(DiceApp, timeline, 510, nvm=nvm)
+assert app0.roll_stats.writes == 1 and app1.roll_stats.writes == 0
+d20 = dice_app.DEFAULT_DICE_INDEX
+assert sum(app0.roll_stats.totals(d20)) == 1 + 1 + 2  # (startup roll, D0, then two dice)
+assert sum(app1.roll_stats.totals(d20)) == 4 + 2 and app1.roll_stats.pending_rolls == 2
+hw = SimDevice(nvm=nvm)
+app = DiceApp(hw)
+run_until(app, 1.0)
+assert sum(app.roll_stats.totals(d20)) == 4 + 1  # (app1's rolls were never flushed: the power was cut)
+assert app.roll_stats.totals(d20)[int(hw.scene.result) - 1] >= 1
+for _ in range(dice_app.ROLL_STATS_MAX_PENDING):
+    app.last_button_time = hw.monotonic()  # (stay awake)
+    app.start_dieroll()
+    run_until(app, hw.monotonic() + 1.0)
+assert app.roll_stats.writes == 1 and app.roll_stats.pending_rolls == 1
+assert sum(app.roll_stats.totals(d20)) == 4 + 1 + dice_app.ROLL_STATS_MAX_PENDING
+
+print(f"dice_app simulation OK ({frames_first_roll} frames for startup roll, {idle_wakeups:.2f} wakeups/s while idle)")
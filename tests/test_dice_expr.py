@@ -0,0 +1,68 @@
+# Host-side (CPython) test of dice expressions (dice_expr.py): parsing, compiled rollers agreeing roll for roll with
+# the interpreter, and the compiled-expression cache (no parsing when rolling again, bounded size)
+# Run from the repository root: python tests/test_dice_expr.py
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import dice_expr
+from dice_expr import bounds, compiled, interpret, parse
+
+assert parse("4d6kh3") == (4, 6, 3, True, 0)
+assert parse("2d20kl1") == (2, 20, 1, False, 0)
+assert parse("d100") == (1, 100, 1, True, 0)
+assert parse("3d6+2") == (3, 6, 3, True, 2)
+assert parse(" 2D8KL1-1 ") == (2, 8, 1, False, -1)
+for bad in ["", "6", "d", "3d", "3x6", "0d6", "d0", "4d6kh5", "4d6kh0", "3d6+", "3d6+2x", "4d6k3", "2d6*2"]:
+    try:
+        parse(bad)
+        raise AssertionError(f"parsed {bad!r}")
+    except ValueError:
+        pass
+assert bounds("4d6kh3") == (3, 18) and bounds("3d6+2") == (5, 20) and bounds("2d20kl1") == (1, 20)
+
+# compiled rollers give the same result as the interpreter from the same random numbers, every time
+for expr in ["d6", "d100", "3d6", "3d6+2", "3d6-4", "4d6kh3", "4d6kl3", "2d20kh1", "2d20kl1", "5d10kh2+1", "1d1"]:
+    roll = compiled(expr)
+    low, high = bounds(expr)
+    seen = set()  # (every result inside the bounds)
+    for seed in range(2000):
+        a = random.Random(seed)
+        b = random.Random(seed)
+        result = roll(a.randrange)
+        assert result == interpret(expr, b.randrange), (expr, seed)
+        assert a.random() == b.random()  # (same number of random numbers drawn)
+        seen.add(result)
+    assert min(seen) >= low and max(seen) <= high, expr
+
+# 2d20kl1 (disadvantage): P(1) = 39/400; 4d6kh3 averages about 12.24
+rng = random.Random(1)
+rolls = [compiled("2d20kl1")(rng.randrange) for _ in range(40000)]
+assert abs(rolls.count(1) / 40000 - 39 / 400) < 0.01
+mean = sum(compiled("4d6kh3")(rng.randrange) for _ in range(40000)) / 40000
+assert abs(mean - 12.24) < 0.05, mean
+
+# rolling again never parses: the compiled roller comes from the cache
+compiles = dice_expr.compiles
+real_parse = dice_expr.parse
+
+
+def no_parse(expr):
+    raise AssertionError(f"parsed {expr!r} again")
+
+
+dice_expr.parse = no_parse
+for _ in range(100):
+    compiled("4d6kh3")(random.randrange)
+dice_expr.parse = real_parse
+assert dice_expr.compiles == compiles
+
+# bounded cache, oldest dropped first
+for sides in range(2, 3 * dice_expr.CACHE_SIZE):
+    compiled(f"d{sides}")
+assert len(dice_expr._compiled) == len(dice_expr._compiled_order) == dice_expr.CACHE_SIZE
+assert "d2" not in dice_expr._compiled
+
+print(f"dice_expr OK ({dice_expr.compiles} expressions compiled)")
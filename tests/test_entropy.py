@@ -0,0 +1,91 @@
+# Host-side (CPython) test of the random numbers for die rolls (entropy.py): exactly unbiased draws for any number of
+# sides, uniformity from os.urandom, the cheap animation generator, and throughput of both
+# Run from the repository root: python tests/test_entropy.py
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import entropy
+from entropy import EntropyPool, FastRandom
+
+
+def counting_source():
+    """Stand-in for os.urandom: byte values 0 to 255 in order, over and over."""
+    state = [0]
+
+    def source(n):
+        out = bytearray(n)
+        for i in range(n):
+            out[i] = state[0] % 256
+            state[0] += 1
+        return bytes(out)
+
+    return source
+
+
+# Exactly unbiased: fed each byte value (or pair of bytes) exactly once, every face comes up equally often
+for n in (2, 3, 6, 10, 20, 100, 255, 256):
+    pool = EntropyPool(block_size=256, source=counting_source())
+    counts = [0] * n
+    for _ in range(256 - 256 % n):
+        counts[pool.randrange(n)] += 1
+    assert counts == [256 // n] * n, (n, counts)
+    assert pool.refills == 1
+pairs = bytes(b for v in range(1 << 16) for b in (v >> 8, v & 0xFF))  # (every two-byte value once)
+for n in (257, 1000, 50000):
+    pool = EntropyPool(block_size=len(pairs), source=lambda k: pairs)
+    counts = [0] * n
+    for _ in range(65536 - 65536 % n):
+        counts[pool.randrange(n)] += 1
+    assert counts == [65536 // n] * n, n
+    assert pool.refills == 1
+# rejected values are drawn again (for n = 6, 252-255 are rejected)
+pool = EntropyPool(block_size=4, source=lambda k: bytes([255, 252, 253, 7]))
+assert pool.randrange(6) == 1 and pool.rejections == 3
+
+def chi_square(counts, draws):
+    expected = draws / len(counts)
+    return sum((c - expected) ** 2 / expected for c in counts)
+
+
+# Uniform from os.urandom (chi-square well under the 99.9% critical value for each number of sides)
+for n, critical in ((6, 20.5), (20, 43.8), (100, 148.2)):
+    pool = EntropyPool()
+    draws = 2000 * n
+    counts = [0] * n
+    for _ in range(draws):
+        counts[pool.randrange(n)] += 1
+    assert chi_square(counts, draws) < critical, (n, chi_square(counts, draws))
+
+# FastRandom: full 16-bit period, and close enough to uniform to look random
+fast = FastRandom(12345)
+states = set()
+for _ in range(65535):
+    fast.randrange(2)
+    states.add(fast.state)
+assert len(states) == 65535 and 0 not in states
+assert FastRandom(0).state != 0
+counts = [0] * 20
+for _ in range(65535):
+    counts[fast.randrange(20)] += 1
+assert max(counts) - min(counts) <= 2  # (65536 values spread over 20 faces)
+
+
+# Throughput (printed for comparison): pool draws vs. the cheap generator
+def rate(fn, n=100_000):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn(20)
+    return n / (time.perf_counter() - t0)
+
+
+pool = EntropyPool()
+pool_rate = rate(pool.randrange)
+fast_rate = rate(FastRandom(1).randrange)
+assert pool_rate > 50_000 and fast_rate > 50_000
+bytes_per_draw = entropy.BLOCK_SIZE * pool.refills / 100_000
+assert bytes_per_draw < 1.2  # (one byte per draw, plus 12/256 rejected for n = 20)
+print(f"entropy OK ({pool_rate / 1000:.0f}k pool draws/s, {fast_rate / 1000:.0f}k fast draws/s, "
+      f"{bytes_per_draw:.2f} bytes per D20 roll)")
@@ -0,0 +1,195 @@
+# Host-side (CPython) statistical fairness test of every die in dice_types, through the app's real roll logic
+#   1. Exact mapping: rolldie() is fed every possible sequence of random numbers once (in place of entropy.randrange),
+#      and each must give the same result as in the app (faces in order, for a plain die) or as the dice expression
+#      interpreter. This catches off-by-one errors mapping random numbers to faces (a symbol die showing the wrong
+#      symbols, a die skipping its first or last face, ...) with no statistics needed, and gives the exact
+#      probability of each result for the checks below.
+#   2. Bulk sampling (needs NumPy): SAMPLES rolls per die, one process per die type. The random numbers are the
+#      app's own (entropy.randrange, as rolldie() draws them), and are turned into results through the table from 1.
+#      (which is rolldie() itself), with NumPy doing the lookups and counting. A sampler that skipped the rejection
+#      step is checked to fail.
+#   3. End to end: END_TO_END_SAMPLES real rolldie() calls per die (entropy pool and all).
+#   2. and 3. report the chi-square statistic (failing above the 99.9% critical value) and the largest deviation of
+#   any face from its expected count.
+# Run from the repository root: python tests/test_fairness.py [samples per die]
+# (Each chi-square check has a 0.1% chance of failing with fair dice, so an occasional failure should be rerun.)
+
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import dice_expr
+import entropy
+from dice_app import dice_types, die_faces, die_name, rolldie
+
+SAMPLES = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+END_TO_END_SAMPLES = 100_000
+Z_999 = 3.0902  # standard normal quantile for p = 0.999
+
+
+def draws_per_roll(die):
+    """(random numbers drawn per roll, range of each) for die."""
+    if "expr" in die:
+        count, sides, _, _, _ = dice_expr.parse(die["expr"])
+        return count, sides
+    return 1, die["sides"]
+
+
+def exact_results(die, roll=rolldie):
+    """roll(die) for every possible sequence of random numbers, in order (the sequence's digits in base sides)."""
+    n_draws, sides = draws_per_roll(die)
+    sequence = []
+
+    def fake_randrange(n):
+        assert n == sides, (n, sides)
+        return sequence.pop()
+
+    real_randrange = entropy.randrange
+    entropy.randrange = fake_randrange
+    try:
+        results = []
+        for code in range(sides ** n_draws):
+            sequence[:] = [code // sides ** i % sides for i in range(n_draws)]  # (popped most significant first)
+            results.append(roll(die))
+            assert not sequence, "roll drew fewer random numbers than expected"
+    finally:
+        entropy.randrange = real_randrange
+    return results
+
+
+def mapping_problems(die, roll=rolldie):
+    """Ways in which roll(die), fed every sequence of random numbers once, isn't the die it should be: each sequence
+    must give the face the app shows for it (see DiceApp.roll_die_and_update_display()), or for dice expressions
+    what the interpreter rolls from it."""
+    try:
+        results = exact_results(die, roll)
+    except (IndexError, AssertionError) as e:
+        return [f"roll failed: {e!r}"]
+    if "expr" in die:
+        n_draws, sides = draws_per_roll(die)
+        expected = []
+        for code in range(sides ** n_draws):
+            sequence = [code // sides ** i % sides for i in range(n_draws)]
+            expected.append(str(dice_expr.interpret(die["expr"], lambda n: sequence.pop())))
+    else:
+        expected = die_faces(die)
+    wrong = [i for i in range(len(expected)) if results[i] != expected[i]]
+    if not wrong:
+        return []
+    examples = ", ".join(f"#{i} gives {results[i]!r}, not {expected[i]!r}" for i in wrong[:3])
+    return [f"{len(wrong)} of {len(expected)} random number sequences give the wrong result ({examples})"]
+
+
+def chi_square_critical(dof):
+    """Wilson-Hilferty approximation of the 99.9% point of the chi-square distribution."""
+    k = 2 / (9 * dof)
+    return dof * (1 - k + Z_999 * math.sqrt(k)) ** 3
+
+
+def chi_square(counts, expected):
+    """(chi-square statistic, its 99.9% point) of counts per face against expected counts."""
+    return sum((c - e) ** 2 / e for c, e in zip(counts, expected)), chi_square_critical(len(counts) - 1)
+
+
+def report(name, counts, expected):
+    """Print chi-square and largest per-face deviation, return whether the die passes."""
+    chi2, critical = chi_square(counts, expected)
+    worst = max(range(len(counts)), key=lambda i: abs(counts[i] - expected[i]) / expected[i])
+    deviation = 100 * (counts[worst] - expected[worst]) / expected[worst]
+    ok = chi2 <= critical
+    print(f"  {name:8s} {sum(counts):9d} rolls  chi2 {chi2:8.1f} (99.9% point {critical:6.1f}, {len(counts) - 1} dof)"
+          f"  worst face #{worst} {deviation:+6.2f}%  {'OK' if ok else 'FAIL'}")
+    return ok
+
+
+def sample_die(args):
+    """Bulk sample one die (process pool worker): (name, counts per face, expected counts per face).
+    args: (index in dice_types, rolls, randrange(n) drawing the random numbers: entropy.randrange if None)."""
+    import numpy as np
+
+    index, samples, randrange = args
+    if randrange is None:
+        randrange = entropy.randrange  # (looked up here, as rolldie() does)
+    die = dice_types[index]
+    faces = die_faces(die)
+    face_index = {face: i for i, face in enumerate(faces)}
+    table = np.array([face_index[r] for r in exact_results(die)])
+    n_draws, sides = draws_per_roll(die)
+    needed = samples * n_draws
+    draws = np.fromiter((randrange(sides) for _ in range(needed)), dtype=np.int64, count=needed)
+    draws = draws.reshape(samples, n_draws)
+    # index of each roll's sequence in the exact table (first draw most significant)
+    codes = draws @ (sides ** np.arange(n_draws - 1, -1, -1, dtype=np.int64))
+    counts = np.bincount(table[codes], minlength=len(faces))
+    exact = np.bincount(table, minlength=len(faces))
+    expected = samples * exact / len(table)
+    return die_name(die), counts.tolist(), expected.tolist()
+
+
+def biased_randrange(n):
+    """entropy.randrange() without its rejection step (for a D20 from one byte, 0-15 come up 13 times in 256, not
+    12.8), to check the bulk sampling catches it."""
+    return os.urandom(1)[0] % n
+
+
+def broken_rolldie(dietype):
+    """rolldie() with a classic mapping bug (symbol dice not counted from 0), to check it is caught."""
+    n = entropy.randrange(dietype["sides"]) + 1
+    if dietype["zero_index"]:
+        n -= 1
+    if "symbol_list" in dietype:
+        return dietype["symbol_list"][n]
+    return str(n)
+
+
+def broken_zero_index(dietype):
+    """rolldie() that ignores zero_index (a D10 would roll 1-10, not 0-9)."""
+    return str(entropy.randrange(dietype["sides"]) + 1)
+
+
+if __name__ == "__main__":
+    failed = False
+
+    print("Exact mapping of random numbers to results:")
+    for die in dice_types:
+        problems = mapping_problems(die)
+        print(f"  {die_name(die):8s} {'OK' if not problems else 'FAIL: ' + '; '.join(problems)}")
+        failed |= bool(problems)
+    symbol_die = next(die for die in dice_types if "symbol_list" in die)
+    assert mapping_problems(symbol_die, broken_rolldie), "an off-by-one symbol mapping wasn't caught"
+    zero_die = next(die for die in dice_types if die.get("zero_index"))
+    assert mapping_problems(zero_die, broken_zero_index), "a die ignoring zero_index wasn't caught"
+
+    try:
+        import numpy  # noqa: F401 (only used by the worker processes)
+    except ImportError:
+        numpy = None
+    if numpy is None:
+        print("Bulk sampling skipped: needs NumPy (pip install numpy)")
+    else:
+        print(f"Bulk sampling ({SAMPLES} rolls per die, NumPy, one process per die):")
+        with ProcessPoolExecutor() as executor:
+            tasks = [(i, SAMPLES, None) for i in range(len(dice_types))]
+            for name, counts, expected in executor.map(sample_die, tasks):
+                failed |= not report(name, counts, expected)
+        d20 = next(i for i, die in enumerate(dice_types) if die.get("sides") == 20 and "expr" not in die)
+        chi2, critical = chi_square(*sample_die((d20, 200_000, biased_randrange))[1:])
+        assert chi2 > critical, "a sampler without rejection wasn't caught"
+
+    print(f"End to end ({END_TO_END_SAMPLES} rolldie() calls per die):")
+    for die in dice_types:
+        faces = die_faces(die)
+        results = exact_results(die)
+        exact = [results.count(face) for face in faces]
+        counts = dict.fromkeys(faces, 0)
+        for _ in range(END_TO_END_SAMPLES):
+            counts[rolldie(die)] += 1
+        expected = [END_TO_END_SAMPLES * n / len(results) for n in exact]
+        failed |= not report(die_name(die), [counts[face] for face in faces], expected)
+
+    if failed:
+        print("FAIL")
+        sys.exit(1)
+    print("fairness OK")
@@ -2,6 +2,12 @@
 # Using MAX1704x battery gauge reported % battery capacity
 
 # Log to flash by holding down D2 during boot (and installing the matching boot.py -- see datalogger_boot.py)
+# Samples are buffered in sleep memory and written to /battery_log.bin LOG_BUFFER_RECORDS at a time (see datalogger.py),
+# so most wakes don't touch the filesystem. Copy it to a PC and decode it: python datalogger.py battery_log.bin > log.csv
+# Until then, up to LOG_BUFFER_RECORDS - 1 samples (most of a day) are only in sleep memory, and are lost if the
+# board is reset, unplugged or runs flat (below LOG_FLUSH_BELOW % every sample is written straight away, to catch
+# the end of the battery). Before stopping a test, write them out: press D0 to wake the board (a wake by the button
+# rather than the timer writes the buffer), or D1 while the display is on (every mode change writes the buffer).
 
 import alarm
 import board
@@ -14,6 +20,11 @@ import digitalio
 from adafruit_display_text import label
 import adafruit_max1704x
 
+# Project modules (from the root folder)
+import state_record
+from datalogger import Datalogger
+from state_record import StateRecord
+
 # does importing wifi let us shut it off? (didn't make an obvious battery difference, though...)
 # import wifi
 # wifi.radio.enabled = False
@@ -21,6 +32,8 @@ import adafruit_max1704x
 sleep_mode = 3  # S0 = no sleep, S1 = only turn off display / I2C, S2 = also microprocessor light sleep, S3 = also microprocessor deep sleep, S4 = hybrid (n/a)
 SLEEP_TIME = 3600  # wake after ## seconds sleep and log battery level
 WAKE_TIME = 1  # after waking for ## seconds (w/ display on), go to sleep
+LOG_BUFFER_RECORDS = 24  # samples kept in sleep memory before writing them to flash in one go
+LOG_FLUSH_BELOW = 10  # battery % below which every sample is written straight away (the battery may die any time)
 
 # Battery monitor
 monitor = adafruit_max1704x.MAX17048(board.I2C())
@@ -36,10 +49,6 @@ button_D1.switch_to_input(pull=digitalio.Pull.DOWN)
 # button_D2 = digitalio.DigitalInOut(board.D2)
 # button_D2.switch_to_input(pull=digitalio.Pull.DOWN)
 
-# basic board LED
-led = digitalio.DigitalInOut(board.LED)
-led.direction = digitalio.Direction.OUTPUT
-
 # Disable Neopixel to save power
 neopixel_power = digitalio.DigitalInOut(board.NEOPIXEL_POWER)
 neopixel_power.direction = digitalio.Direction.OUTPUT
@@ -89,31 +98,33 @@ def exit_low_power():
     tft_i2c_power.value = True
 
 
+# sleep mode, time in seconds and cell percent, buffered in sleep memory after the state record
+#   (whether the filesystem is writable is only checked here, once: if it isn't, samples are just dropped)
+battery_log = Datalogger("/battery_log.bin", "<BIH", ["mode", "time", "cell_percent/100"], LOG_BUFFER_RECORDS,
+                         alarm.sleep_memory, state_record.SIZE)
+if not battery_log.writable:
+    print("filesystem not writable by CircuitPython: not logging")
+
+
 def log_battery_level():
-    try:
-        with open(f"/battery_log_{sleep_mode}.txt", "a") as log:
-            # write time in seconds and cell percent to file
-            log.write(f"{sleep_mode},{time.time()},{monitor.cell_percent}\n")
-            log.flush()
-            led.value = True
-            time.sleep(0.1)
-            led.value = False
-    except OSError as e:  # Filesystem not writable by CircuitPython...
-        print("error writing to filesystem")
-        led.value = True
-        time.sleep(1)
-        led.value = False
+    pct = monitor.cell_percent
+    battery_log.log(sleep_mode, int(time.time()), max(0, min(65535, int(pct * 100))))
+    if pct < LOG_FLUSH_BELOW:
+        battery_log.flush()
 
 
 lastsleep = time.time()
 
 # if we just woke up from a deep sleep and reboot reset sleep mode from saved value
-if alarm.wake_alarm:
-    sleep_mode = alarm.sleep_memory[0]
+state = StateRecord()
+if alarm.wake_alarm and state.load(alarm.sleep_memory):
+    sleep_mode = state.mode
     text_D1[0].text = f"< MODE{sleep_mode}"
 
 # log battery level on startup (including if we just woke from a deep sleep and reboot)
 log_battery_level()
+if isinstance(alarm.wake_alarm, alarm.pin.PinAlarm):
+    battery_log.flush()  # (woken by D0: the operator wants the log on flash)
 
 while True:
     if not low_power_mode:
@@ -121,6 +132,7 @@ while True:
         text_bat[0].text = f"{monitor.cell_percent:.1f}%"
         # D1: change sleep mode
         if button_D1.value:
+            battery_log.flush()  # (write out the buffered samples: see the top of this file)
             sleep_mode = (sleep_mode + 1) % 4
             text_D1[0].text = f"< MODE{sleep_mode}"
             while button_D1.value:
@@ -138,16 +150,19 @@ while True:
                 pin_alarm = alarm.pin.PinAlarm(pin=board.D0, value=False, pull=True)
                 time_alarm = alarm.time.TimeAlarm(monotonic_time=time.monotonic() + SLEEP_TIME)
                 # Sleep with both time and pin alarms for more realistic power draw (pin alarm is what end app uses and draws more power)
-                alarm.light_sleep_until_alarms(time_alarm, pin_alarm)
+                woken_by = alarm.light_sleep_until_alarms(time_alarm, pin_alarm)
                 # after sleep ends
                 exit_low_power()
                 lastsleep = time.time()
                 log_battery_level()
+                if isinstance(woken_by, alarm.pin.PinAlarm):
+                    battery_log.flush()
             # Sleep Mode 3: deep sleep
             if sleep_mode == 3:
                 pin_alarm = alarm.pin.PinAlarm(pin=board.D0, value=False, pull=True)
                 time_alarm = alarm.time.TimeAlarm(monotonic_time=time.monotonic() + SLEEP_TIME)
-                alarm.sleep_memory[0] = sleep_mode
+                state.mode = sleep_mode
+                state.save(alarm.sleep_memory)
                 # Sleep with both time and pin alarms for more realistic power draw (pin alarm is what end app uses and draws more power)
                 alarm.exit_and_deep_sleep_until_alarms(time_alarm, pin_alarm)
                 # note: never reaches this line (processor reboots after wake from deep sleep, see if alarm.wake: line earlier)
@@ -0,0 +1,48 @@
+# Host-side (CPython) test of the integer polygon math in polygon_math.py vs. the original floating point version
+# Checks every vertex is within +/-1 pixel over a sweep of rotations, scales and offsets, then runs a microbenchmark
+# Run from the repository root: python tests/test_polygon_math.py
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import polygon_math
+
+DISPLAY_HEIGHT = 135  # S3 Reverse TFT Feather
+POLYGON_SIDES = [3, 4, 5, 6, 7, 10, 12, 20]
+SCALES = [1.0, 0.95, 0.9, 0.5, 0.33]
+OFFSETS = [(0, 0), (90, 70), (-40, 25)]
+
+worst = 0
+checked = 0
+for n in POLYGON_SIDES:
+    for scale in SCALES:
+        radius = scale * DISPLAY_HEIGHT / 2
+        radius_q = polygon_math.radius_units(radius)
+        for x_offset, y_offset in OFFSETS:
+            for rotation in list(range(-360, 721)) + [0.5, 12.25, 54.7, 359.9]:
+                ref = polygon_math.polygon_pts_float(n, rotation, radius, x_offset, y_offset)
+                pts = polygon_math.polygon_pts(n, rotation, radius_q, x_offset, y_offset)
+                assert len(pts) == n
+                for (xr, yr), (x, y) in zip(ref, pts):
+                    assert isinstance(x, int) and isinstance(y, int)
+                    err = max(abs(x - xr), abs(y - yr))
+                    assert err <= 1, f"n={n} rot={rotation} scale={scale}: {(x, y)} vs float {(xr, yr)}"
+                    worst = max(worst, err)
+                    checked += 1
+print(f"accuracy: {checked} vertices checked, worst error {worst} px")
+
+# sin/cos table sanity checks at exact angles
+for deg, expected in [(0, 0), (90, polygon_math.SIN_ONE), (180, 0), (270, -polygon_math.SIN_ONE), (-90, -polygon_math.SIN_ONE)]:
+    assert polygon_math.isin(deg * polygon_math.ANGLE_SUBDIV) == expected
+    assert polygon_math.icos((deg - 90) * polygon_math.ANGLE_SUBDIV) == expected
+
+# Microbenchmark (host CPython timings: relative speed only, the device is ~100x slower and allocates floats on the heap)
+N_CALLS = 20000
+radius = DISPLAY_HEIGHT / 2
+radius_q = polygon_math.radius_units(radius)
+for n in [3, 4, 5, 6, 10]:
+    t_float = timeit.timeit(lambda: polygon_math.polygon_pts_float(n, 37, radius), number=N_CALLS)
+    t_int = timeit.timeit(lambda: polygon_math.polygon_pts(n, 37, radius_q), number=N_CALLS)
+    print(f"{n:2d}-gon: float {1e6 * t_float / N_CALLS:6.2f} us/call, integer {1e6 * t_int / N_CALLS:6.2f} us/call")
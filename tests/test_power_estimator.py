@@ -0,0 +1,78 @@
+# Host-side (CPython) test of the per-power-state current estimator (power_estimator.py)
+# A synthetic battery drains at a known current in each state; the estimates should find those currents,
+# survive a save / restore through sleep memory, and ignore intervals spent charging
+# Run from the repository root: python tests/test_power_estimator.py
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from power_estimator import PowerEstimator, ACTIVE, DIMMED, DISPLAY_OFF, DEEP_SLEEP, STATE_NAMES
+
+CAPACITY = 420
+CURRENT_MA = {ACTIVE: 90.0, DIMMED: 80.0, DISPLAY_OFF: 40.0, DEEP_SLEEP: 0.2}
+
+
+class Battery:
+    def __init__(self, percent=90.0):
+        self.percent = percent
+        self.t = 0.0
+
+    def spend(self, state, seconds):
+        self.percent -= CURRENT_MA[state] * seconds / 3600 / CAPACITY * 100
+        self.t += seconds
+
+
+def check(estimator, state, tolerance=0.05):
+    ma = estimator.current_ma(state)
+    assert ma is not None and abs(ma / CURRENT_MA[state] - 1) < tolerance, (STATE_NAMES[state], ma)
+
+
+# One day of use as dice_app.py would report it: a few minutes of rolling, dim, display off,
+# (sometimes woken from display off again), then deep sleep for an hour or so
+battery = Battery()
+estimator = PowerEstimator(CAPACITY, samples=8)
+memory = bytearray(8192)
+wall_offset = 1_700_000_000  # time.time() at t = 0
+estimator.sample(battery.t, battery.percent)
+for session in range(24):
+    battery.spend(ACTIVE, 120 + 10 * (session % 3))
+    estimator.set_state(DIMMED, battery.t)
+    battery.spend(DIMMED, 5)
+    estimator.sample(battery.t, battery.percent)  # (read just before the I2C rail goes off)
+    estimator.set_state(DISPLAY_OFF, battery.t)
+    battery.spend(DISPLAY_OFF, 165)
+    if session % 4 == 0:  # button pressed with display off
+        estimator.set_state(ACTIVE, battery.t)
+        estimator.sample(battery.t, battery.percent)
+        battery.spend(ACTIVE, 15)
+        estimator.set_state(DIMMED, battery.t)
+        estimator.sample(battery.t, battery.percent)
+        estimator.set_state(DISPLAY_OFF, battery.t)
+        battery.spend(DISPLAY_OFF, 170)
+    # deep sleep: everything goes through sleep memory, and monotonic time starts over after the reboot
+    estimator.save(memory, 16, battery.t, wall_offset + battery.t)
+    battery.spend(DEEP_SLEEP, 3600 + 600 * (session % 5))
+    estimator = PowerEstimator(CAPACITY, samples=8)
+    estimator.restore(memory, 16, 0.0, wall_offset + battery.t)
+    battery.t = 0.0
+    wall_offset += 3600 * 10
+    estimator.sample(battery.t, battery.percent)  # (first idle pass after the wake-up roll)
+
+check(estimator, ACTIVE)
+check(estimator, DISPLAY_OFF, 0.15)  # (each of its intervals also has a little active time in it)
+check(estimator, DEEP_SLEEP, 0.25)  # (small current, and absorbs any error in the other states)
+assert estimator.current_ma(DIMMED) is None  # never the main state in an interval
+hours = estimator.hours_remaining(battery.percent)
+assert hours is not None and hours > 24, hours
+
+# Charging (battery % going up) restarts the interval without recording anything
+before = list(estimator.ma)
+battery.spend(ACTIVE, 300)
+battery.percent += 20
+estimator.sample(battery.t, battery.percent)
+assert list(estimator.ma) == before
+assert estimator.size() <= 300
+
+print("power_estimator OK: " + ", ".join(f"{STATE_NAMES[s]} {estimator.current_ma(s) or 0:.2f} mA"
+                                         for s in (ACTIVE, DISPLAY_OFF, DEEP_SLEEP)) + f", {hours:.0f} h remaining")
@@ -12,6 +12,9 @@ import digitalio
 from adafruit_display_text import label
 import adafruit_max1704x
 
+# Project modules (from the root folder)
+from state_record import StateRecord
+
 # does importing wifi let us shut it off? (didn't make an obvious battery difference, though...)
 # import wifi
 # wifi.radio.enabled = False
@@ -103,17 +106,11 @@ def compute_and_display_sleep_usage():
 
 # if we just woke up from a deep sleep and reboot, load some config values from backup RAM / sleep memory
 #  and display computed usage
-if alarm.wake_alarm:
-    # todo: implement saving of last battery % and times here in byte array?
-    presleep_battery_percent = (256 * alarm.sleep_memory[0] + alarm.sleep_memory[1]) / 10
-    # hacky conversion of 4 bytes of data to a 32-bit timer value
-    presleep_time_int = (
-        256 * 256 * 256 * alarm.sleep_memory[2]
-        + 256 * 256 * alarm.sleep_memory[3]
-        + 256 * alarm.sleep_memory[4]
-        + alarm.sleep_memory[5]
-    )
-    sleep_mode = alarm.sleep_memory[6]
+state = StateRecord()
+if alarm.wake_alarm and state.load(alarm.sleep_memory):
+    presleep_battery_percent = state.battery_centipct / 100
+    presleep_time_int = state.rtc_time
+    sleep_mode = state.mode
     text_D1[0].text = f"< MODE{sleep_mode}"
     compute_and_display_sleep_usage()
 
@@ -155,17 +152,10 @@ while True:
                 button_D0.deinit()
                 pin_alarm = alarm.pin.PinAlarm(pin=board.D0, value=False, pull=True)
                 # save a few key status values to backup RAM ('sleep memory') to reload after deep sleep reboot
-                battery_pct_fixedpoint = int(presleep_battery_percent * 10)
-                alarm.sleep_memory[0] = battery_pct_fixedpoint // 256
-                alarm.sleep_memory[1] = battery_pct_fixedpoint % 256
-                # quick hack to convert 32-bit time to four bytes
-                alarm.sleep_memory[2] = presleep_time_int // (256 * 256 * 256)
-                presleep_time_int %= 256 * 256 * 256
-                alarm.sleep_memory[3] = presleep_time_int // (256 * 256)
-                presleep_time_int %= 256 * 256
-                alarm.sleep_memory[4] = presleep_time_int // 256
-                alarm.sleep_memory[5] = presleep_time_int % 256
-                alarm.sleep_memory[6] = sleep_mode
+                state.battery_centipct = int(presleep_battery_percent * 100)
+                state.rtc_time = presleep_time_int
+                state.mode = sleep_mode
+                state.save(alarm.sleep_memory)
                 alarm.exit_and_deep_sleep_until_alarms(pin_alarm)
                 # note: never reaches this line (processor reboots after wake from deep sleep, see if alarm.wake: line earlier)
             while button_D2.value:
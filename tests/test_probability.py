@@ -0,0 +1,69 @@
+# Host-side (CPython) test of the exact dice probability tables (probability.py): tables match counting every
+# outcome (also keeping only the highest / lowest dice), pools reuse smaller cached ones, the cache stays bounded,
+# and percentile / odds
+# Run from the repository root: python tests/test_probability.py
+
+import itertools
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import probability
+from probability import keep_counts, rank, sum_counts
+
+
+def brute_force(sides, count):
+    counts = [0] * (count * (sides - 1) + 1)
+    for faces in itertools.product(range(sides), repeat=count):
+        counts[sum(faces)] += 1
+    return counts
+
+
+for sides, count in [(3, 1), (3, 4), (6, 1), (6, 2), (6, 3), (10, 3), (20, 2), (100, 2)]:
+    assert sum_counts(sides, count) == brute_force(sides, count), (sides, count)
+
+
+def brute_force_keep(sides, count, keep, highest, pool):
+    counts = [0] * (pool * keep * (sides - 1) + 1)
+    for faces in itertools.product(range(sides), repeat=count * pool):
+        total = 0
+        for roll in range(pool):
+            total += sum(sorted(faces[roll * count:(roll + 1) * count], reverse=highest)[:keep])
+        counts[total] += 1
+    return counts
+
+
+for args in [(6, 4, 3, True, 1), (6, 4, 3, True, 2), (20, 2, 1, True, 1), (20, 2, 1, False, 1), (4, 3, 2, False, 2),
+             (5, 3, 1, True, 3), (6, 4, 4, True, 1), (2, 5, 2, False, 1)]:
+    assert keep_counts(*args) == brute_force_keep(*args), args
+
+# 4D6 keep highest 3: 1 way in 1296 to roll a 3, 21 to roll an 18 (index total 15)
+assert keep_counts(6, 4, 3)[0] == 1 and keep_counts(6, 4, 3)[15] == 21 and sum(keep_counts(6, 4, 3)) == 6 ** 4
+
+# 3D6: 27 ways to roll a 10 (index total 7), 1 way to roll 18; 10D10 still exact (and all integers)
+assert sum_counts(6, 3)[7] == 27 and sum_counts(6, 3)[15] == 1
+ten = sum_counts(10, 10)
+assert sum(ten) == 10 ** 10 and all(isinstance(n, int) for n in ten) and ten == ten[::-1]
+
+# a pool is built from the largest cached pool of the same die: 4D6 after 3D6 is one more die
+n = probability.convolutions
+sum_counts(6, 4)
+assert probability.convolutions == n + 1
+sum_counts(6, 4)
+assert probability.convolutions == n + 1  # (cached)
+
+# bounded cache, least recently used dropped first
+for count in range(1, 3 * probability.CACHE_SIZE):
+    sum_counts(8, count)
+    sum_counts(6, 4)
+assert len(probability._cache) == len(probability._cache_order) == probability.CACHE_SIZE
+assert (6, 4) in probability._cache and (8, 1) not in probability._cache
+
+# percentile (midrank) and "1 in N" odds
+assert rank(sum_counts(20, 1), 19) == (97, 20)  # a 20 on a D20
+assert rank(sum_counts(20, 1), 0) == (2, 20)
+assert rank(sum_counts(6, 3), 15) == (99, 216)  # 18 on 3D6
+assert rank(sum_counts(6, 3), 7) == (43, 8)  # 10 on 3D6: 81 of 216 below, 27 equal
+assert rank(sum_counts(100, 4), 0) == (0, 100_000_000)
+
+print(f"probability OK ({probability.convolutions} convolutions)")
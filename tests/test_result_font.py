@@ -0,0 +1,87 @@
+# Host-side (CPython) test of the result font glyph cache (result_font.py) with fonts/dice_result.bdf: glyphs are
+# drawn as in the BDF file, only read when first used, and no more than `slots` are kept
+# Run from the repository root: python tests/test_result_font.py
+
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+import result_font
+from result_font import GlyphCache
+
+FONT = os.path.join(ROOT, "fonts", "dice_result.bdf")
+
+
+class Bitmap:
+    """Stand-in for displayio.Bitmap."""
+
+    def __init__(self, width, height, value_count):
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(width * height)
+
+    def __setitem__(self, xy, value):
+        x, y = xy
+        assert 0 <= x < self.width and 0 <= y < self.height, xy
+        self.pixels[y * self.width + x] = value
+
+    def __getitem__(self, xy):
+        x, y = xy
+        return self.pixels[y * self.width + x]
+
+
+def bdf_glyph(c):
+    """(BBX, rows of bits) of c, read straight from the BDF file."""
+    with open(FONT) as f:
+        lines = iter(f.read().splitlines())
+    for line in lines:
+        if line == f"ENCODING {ord(c)}":
+            break
+    for line in lines:
+        if line.startswith("BBX"):
+            w, h, xoff, yoff = (int(v) for v in line.split()[1:])
+            break
+    next(lines)  # BITMAP
+    rows = [bin(int(next(lines), 16))[2:].zfill((w + 7) // 8 * 8)[:w] for _ in range(h)]
+    return (w, h, xoff, yoff), rows
+
+
+def cell_pixels(glyphs, tile):
+    x0 = tile * glyphs.cell_width
+    return [[glyphs.bitmap[x0 + x, y] for x in range(glyphs.cell_width)] for y in range(glyphs.cell_height)]
+
+
+glyphs = GlyphCache(FONT, Bitmap, slots=4)
+assert glyphs.loads == 0  # (nothing read but the index)
+assert glyphs.bitmap.width == 5 * glyphs.cell_width
+
+# each glyph's pixels are the BDF rows, at its offset in the cell, and nothing else is set in the cell
+for c in "0718?":
+    tile = glyphs.tile(c)
+    assert tile != result_font.BLANK_TILE
+    (w, h, xoff, yoff), rows = bdf_glyph(c)
+    top = glyphs.cell_height - 1 - (yoff - glyphs.cell_y0) - (h - 1)
+    expected = [[0] * glyphs.cell_width for _ in range(glyphs.cell_height)]
+    for y, row in enumerate(rows):
+        for x, bit in enumerate(row):
+            expected[top + y][xoff + x] = int(bit)
+    assert cell_pixels(glyphs, tile) == expected, c
+assert glyphs.loads == 5 and glyphs.evictions == 1
+
+# cached glyphs aren't read again, and the least recently used one is the one dropped
+loads = glyphs.loads
+tile_8 = glyphs.tile("8")
+glyphs.tile("?")
+glyphs.tile("1")
+assert glyphs.loads == loads
+glyphs.tile("2")  # evicts "7", the least recently used
+assert glyphs.loads == loads + 1 and "7" not in glyphs.slot_of
+assert glyphs.tile("8") == tile_8
+assert len(glyphs.slot_of) == glyphs.slots
+
+# the blank tile stays blank, and is used for characters the font doesn't have
+assert glyphs.tile(" ") == result_font.BLANK_TILE
+assert not any(any(row) for row in cell_pixels(glyphs, result_font.BLANK_TILE))
+
+print(f"result_font OK ({len(glyphs.offsets)} glyphs, {glyphs.cell_width}x{glyphs.cell_height} px)")
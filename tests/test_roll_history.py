@@ -0,0 +1,53 @@
+# Host-side (CPython) test of the roll history ring (roll_history.py): packing, wrapping around, and the round trip
+# through sleep memory
+# Run from the repository root: python tests/test_roll_history.py
+
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import roll_history
+from roll_history import RollHistory
+
+history = RollHistory(8)
+assert history.count == 0
+history.append(3, 1, 19)
+assert history.count == 1 and history.get(0) == (3, 1, 19)
+
+# every field at its limits packs and unpacks unchanged
+for entry in [(0, 1, 0), (roll_history.MAX_DICE_INDEX, roll_history.MAX_DICE_COUNT, roll_history.MAX_INDEX_TOTAL),
+              (5, 4, 396), (4, 2, 198)]:
+    history.append(*entry)
+    assert history.get(0) == entry
+
+# wraps around: only the last size rolls are kept, newest first
+history = RollHistory(8)
+for i in range(20):
+    history.append(i % 6, 1 + i % 4, i)
+assert history.count == 8
+assert [history.get(i) for i in range(8)] == [((19 - i) % 6, 1 + (19 - i) % 4, 19 - i) for i in range(8)]
+
+# appending allocates nothing (once the ring exists)
+tracemalloc.start()
+snapshot = tracemalloc.take_snapshot()
+for i in range(1000):
+    history.append(2, 3, i % 100)
+grown = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(snapshot, "filename")
+            if stat.traceback[0].filename == roll_history.__file__)
+tracemalloc.stop()
+assert grown <= 0, grown
+
+# round trip through sleep memory, after other data
+memory = bytearray(8192)
+history.save(memory, 300)
+restored = RollHistory(8)
+restored.restore(memory, 300)
+assert (restored.head, restored.count, list(restored.entries)) == (history.head, history.count, list(history.entries))
+# memory that was never saved to (or garbage) is ignored
+empty = RollHistory(8)
+memory[300] = 200
+empty.restore(memory, 300)
+assert empty.count == 0
+
+print(f"roll_history OK ({history.size()} bytes of sleep memory for {len(history.entries)} rolls)")
@@ -0,0 +1,137 @@
+# Host-side (CPython) test of the lifetime face counts in flash (roll_stats.py): batching, rotating through the slots,
+# and surviving power loss part way through a write
+# Run from the repository root: python tests/test_roll_stats.py
+
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import roll_stats
+from roll_stats import RollStats
+
+DICE = [("D6", 6), ("D20", 20), ("4d6kh3", 16)]
+
+
+class WritesCounted(bytearray):
+    """nvm that counts how often each byte is written."""
+
+    def __init__(self, size):
+        super().__init__(size)
+        self.byte_writes = [0] * size
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        for i in range(*key.indices(len(self))):
+            self.byte_writes[i] += 1
+
+
+class PowerCut(Exception):
+    pass
+
+
+class CutAfter(bytearray):
+    """nvm that loses power after budget more bytes have been written (writing only part of the slice it was in)."""
+
+    budget = None
+
+    def __setitem__(self, key, value):
+        start, stop, _ = key.indices(len(self))
+        if self.budget is not None and stop - start > self.budget:
+            super().__setitem__(slice(start, start + self.budget), value[:self.budget])
+            raise PowerCut()
+        super().__setitem__(key, value)
+        if self.budget is not None:
+            self.budget -= stop - start
+
+
+# rolls are only counted in RAM until a flush, which adds them to what is already in flash
+nvm = WritesCounted(4096)
+stats = RollStats(nvm, DICE, max_pending=10)
+for face in [0, 5, 5, 2]:
+    stats.count(0, face)
+stats.count(1, 19)
+assert stats.writes == 0 and not any(nvm) and not stats.flush_due()
+assert stats.totals(0) == [1, 0, 1, 0, 0, 2]
+assert stats.flush() and stats.writes == 1 and not stats.flush()  # (nothing new to write)
+stats.count(2, 15)
+assert stats.totals(2)[15] == 1
+# a new RollStats (after a reboot or power loss) reads the counts back
+stats = RollStats(nvm, DICE)
+assert stats.totals(0) == [1, 0, 1, 0, 0, 2] and stats.totals(1) == [0] * 19 + [1] and stats.totals(2) == [0] * 16
+
+# counting a roll is one increment in a preallocated array (kept to small counts here: larger ints are objects in
+#   CPython, but not in CircuitPython)
+stats = RollStats(nvm, DICE, max_pending=400)
+tracemalloc.start()
+snapshot = tracemalloc.take_snapshot()
+for i in range(200):
+    stats.count(1, i % 20)
+grown = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(snapshot, "filename")
+            if stat.traceback[0].filename == roll_stats.__file__)
+tracemalloc.stop()
+assert grown <= 0, grown
+assert not stats.flush_due()
+for i in range(200):
+    stats.count(1, i % 20)
+assert stats.flush_due()
+
+# each flush writes the next slot in turn, so every slot (and no byte more than the others) wears evenly
+nvm = WritesCounted(4096)
+stats = RollStats(nvm, DICE)
+flushes = 10 * stats.slots
+for i in range(flushes):
+    stats.count(0, i % 6)
+    stats.flush()
+assert stats.totals(0) == [flushes // 6 + (i < flushes % 6) for i in range(6)]
+used = nvm.byte_writes[:stats.slots * stats.record_size]
+assert min(used) == max(used) == 10, (min(used), max(used))
+
+# power lost part way through any write: the counts read back are the ones from before the flush (or after it, if
+#   the write completed), never anything else
+for budget in range(0, stats.record_size + 1, 7):
+    nvm = CutAfter(4096)
+    stats = RollStats(nvm, DICE)
+    for _ in range(3):
+        stats.count(1, 7)
+        stats.flush()  # (a few records, so a previous slot is overwritten too)
+    for i in range(2 * stats.slots):
+        stats.count(0, 3)
+        stats.flush()
+    before = stats.totals(0)
+    stats.count(0, 1)
+    nvm.budget = budget
+    try:
+        stats.flush()
+        cut = False
+    except PowerCut:
+        cut = True
+    nvm.budget = None
+    after = RollStats(nvm, DICE)
+    updated = before[:1] + [1] + before[2:]
+    assert after.totals(0) == updated if not cut else after.totals(0) in (before, updated), (budget, after.totals(0))
+    assert after.totals(1)[7] == 3
+    expected = after.totals(0)
+    after.count(0, 0)
+    after.flush()  # (and writing carries on from there)
+    assert RollStats(nvm, DICE).totals(0) == [expected[0] + 1] + expected[1:]
+
+# a damaged newest record falls back to the one before it
+nvm = bytearray(4096)
+stats = RollStats(nvm, DICE)
+stats.count(0, 0)
+stats.flush()
+stats.count(0, 0)
+stats.flush()
+nvm[stats.record_size + roll_stats.HEADER_SIZE] ^= 0xFF
+assert RollStats(nvm, DICE).totals(0)[0] == 1
+
+# records kept for a different list of dice are ignored; blank or garbage flash reads as no rolls yet
+assert RollStats(nvm, [("D6", 6), ("D10", 10), ("4d6kh3", 16)]).totals(0) == [0] * 6
+assert RollStats(bytearray(os.urandom(4096)), DICE).totals(1) == [0] * 20
+# no nvm at all: still counts in RAM, just never writes
+stats = RollStats(None, DICE)
+stats.count(0, 0)
+assert stats.totals(0)[0] == 1 and not stats.flush()
+
+print(f"roll_stats OK ({stats.record_size} bytes per record, {RollStats(nvm, DICE).slots} slots in 4 kB)")
@@ -0,0 +1,88 @@
+# Host-side (CPython) test of the Monte Carlo battery life simulator (sim_battery_life.py): its model of the
+# inactivity timers against the real app on simulated hardware, charge accounting, and the process pool
+# Run from the repository root: python tests/test_sim_battery_life.py
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import dice_app
+import sim_battery_life
+from dice_app import DiceApp
+from hardware_sim import DeepSleep, SimDevice
+from sim_battery_life import CURRENT_MA, STATES, best, power_states, run, simulate_chunk, state_at
+
+
+def app_state(app):
+    """The app's power state, named as in sim_battery_life.STATES."""
+    if app.low_power_mode:
+        return "display off"
+    if app.animation_running:
+        return "active"
+    return "dimmed" if app.dimmed else "light sleep"
+
+
+def check_against_app(dim, sleep, deepsleep):
+    """The model's state at times after a press matches the real app's, with these timers."""
+    saved = dice_app.INACTIVITY_DIM_TIME, dice_app.INACTIVITY_SLEEP_TIME, dice_app.INACTIVITY_DEEPSLEEP_TIME
+    dice_app.INACTIVITY_DIM_TIME, dice_app.INACTIVITY_SLEEP_TIME, dice_app.INACTIVITY_DEEPSLEEP_TIME = dim, sleep, deepsleep
+    try:
+        press = 2.0
+        hw = SimDevice(timeline=[(0, press, press + 0.1)])
+        app = DiceApp(hw)
+        times = [0.1, dice_app.ANIMATION_DURATION + 0.1]
+        for boundary in (dim, sleep, deepsleep):
+            times += [boundary - 0.1, boundary + 0.1]
+        seen = []
+        for elapsed in sorted(t for t in times if t > 0):
+            expected = state_at(elapsed, dim, sleep, deepsleep)
+            try:
+                while hw.monotonic() < press + elapsed:
+                    app.step()
+                    app.wait_for_next_deadline()
+                actual = app_state(app)
+            except DeepSleep:
+                actual = "deep sleep"
+            seen.append(actual)
+            assert actual == expected, ((dim, sleep, deepsleep), elapsed, actual, expected)
+            if actual == "deep sleep":
+                break
+        return seen
+    finally:
+        dice_app.INACTIVITY_DIM_TIME, dice_app.INACTIVITY_SLEEP_TIME, dice_app.INACTIVITY_DEEPSLEEP_TIME = saved
+
+
+# the model's states follow the real app, for the current timers and others (incl. deep sleep no sooner than
+#   the display turning off)
+assert check_against_app(dice_app.INACTIVITY_DIM_TIME, dice_app.INACTIVITY_SLEEP_TIME,
+                         dice_app.INACTIVITY_DEEPSLEEP_TIME)[-1] == "deep sleep"
+assert check_against_app(3, 4, 30)[-1] == "deep sleep"
+assert check_against_app(5, 8, 6)[-1] == "deep sleep"
+
+# every second of a gap is in exactly one state
+for gap in (0.2, 3, 9.99, 14, 100, 5000):
+    seconds = power_states(gap, 10, 15, 180)
+    assert abs(sum(seconds) - gap) < 1e-9 and min(seconds) >= 0
+assert power_states(5000, 10, 15, 180)[STATES.index("display off")] == 165
+
+# never used: deep sleep current all day; the charge per state adds up to the mean current
+sim_battery_life.PROFILES["drawer"] = (0, 1, 1)
+charge, seconds, presses, latency, boots = simulate_chunk(((10, 15, 180), "drawer", 10, 0))
+assert presses == 0 and abs(sum(charge) / seconds - CURRENT_MA["deep sleep"]) < 1e-12
+charge, seconds, presses, latency, boots = simulate_chunk(((10, 15, 180), "daily", 20, 0))
+assert presses > 100 and 0 < boots < presses and latency >= boots * sim_battery_life.BOOT_TIME
+
+# the same timelines for every setting: a shorter deep sleep timer always saves power but wakes from deep sleep
+#   more often; the process pool gives exactly the serial results
+grid = [(10, 15, 60), (10, 15, 180), (10, 15, 600)]
+serial = run("daily", 150, grid)
+with ProcessPoolExecutor(2) as executor:
+    pooled = run("daily", 150, grid, executor)
+assert pooled == serial
+ma = [serial[timers][0] for timers in grid]
+from_deep = [serial[timers][3] for timers in grid]
+assert ma[0] < ma[1] < ma[2] and from_deep[0] > from_deep[1] > from_deep[2], (ma, from_deep)
+assert best(serial, 10.0) == grid[0] and best(serial, serial[grid[2]][2]) == grid[2] and best(serial, 0.0) is None
+
+print(f"sim_battery_life OK (daily use, current timers: {serial[grid[1]][0]:.3f} mA, {serial[grid[1]][1]:.0f} days)")
@@ -19,6 +19,9 @@ import vectorio
 from adafruit_display_text import label
 import adafruit_max1704x
 
+# Project modules (from the root folder)
+from state_record import StateRecord
+
 # does importing wifi let us shut it off? (didn't make an obvious battery difference, though...)
 # import wifi
 # wifi.radio.enabled = False
@@ -61,9 +64,10 @@ animation_running = False  # is a die roll currently animating?
 animation_time = 0.5
 
 # if we just woke up from a deep sleep and reboot, load some config values from backup RAM / sleep memory
-if alarm.wake_alarm:
-    sleep_mode = alarm.sleep_memory[0]
-    dice_index = alarm.sleep_memory[1]
+state = StateRecord()
+if alarm.wake_alarm and state.load(alarm.sleep_memory):
+    sleep_mode = state.mode
+    dice_index = state.dice_index
 
 # Battery monitor
 monitor = adafruit_max1704x.MAX17048(board.I2C())
@@ -357,8 +361,9 @@ last_button_time = time.monotonic()
 
 def deep_sleep():
     # save a few key status values to backup RAM ('sleep memory') to reload after deep sleep reboot
-    alarm.sleep_memory[0] = sleep_mode
-    alarm.sleep_memory[1] = dice_index
+    state.mode = sleep_mode
+    state.dice_index = dice_index
+    state.save(alarm.sleep_memory)
     button_D0.deinit()
     pin_alarm = alarm.pin.PinAlarm(pin=board.D0, value=False, pull=True)
     alarm.exit_and_deep_sleep_until_alarms(pin_alarm)
@@ -0,0 +1,50 @@
+# Host-side (CPython) test of the sleep memory state record (state_record.py): round trip, and rejection of
+# empty, corrupt and out-of-date records
+# Run from the repository root: python tests/test_state_record.py
+
+import os
+import struct
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import state_record
+from state_record import StateRecord
+
+memory = bytearray(8192)
+assert not StateRecord().load(memory)  # (all zeros, as after a cold boot)
+
+record = StateRecord()
+record.dice_index = 4
+record.dice_count = 3
+record.mode = 2
+record.last_result = "99"
+record.rotation = 36
+record.battery_centipct = 8123
+record.charge_rate_centipct = -250
+record.monotonic_ms = 123456789
+record.rtc_time = 1_700_000_000
+record.wakes = 7
+record.rolls = 1234
+record.boot_ms = 456
+record.save(memory, 16)
+
+restored = StateRecord()
+assert restored.load(memory, 16)
+assert restored.__dict__ == record.__dict__, restored.__dict__
+
+# any single flipped bit is caught
+for i in range(16, 16 + state_record.SIZE):
+    for bit in range(8):
+        memory[i] ^= 1 << bit
+        assert not StateRecord().load(memory, 16), (i, bit)
+        memory[i] ^= 1 << bit
+assert StateRecord().load(memory, 16)
+
+# a record written by another layout version is rejected, even with a valid checksum
+old = bytearray(memory[16:16 + state_record.SIZE])
+old[2] = state_record.VERSION + 1
+struct.pack_into("<H", old, state_record.SIZE - 2, state_record.checksum(old, state_record.SIZE - 2))
+memory[16:16 + state_record.SIZE] = old
+assert not StateRecord().load(memory, 16)
+
+print(f"state_record OK ({state_record.SIZE} bytes)")